@@ -0,0 +1,295 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# AST en arreglos paralelos ("arena"). Cada nodo es un índice: su clase,
+# primer hijo, siguiente hermano, línea, columna, tipo y valor se guardan en
+# un array por campo, así que un programa con millones de nodos no crea
+# millones de objetos. Las acciones de parser.py construyen el arena
+# directamente a través de ArenaBuilder, y NodeView permite que TypeChecker
+# y write_ast lo recorran como si fueran objetos ASTNode.
+import copy
+from array import array
+import ast_nodes
+from ast_nodes import ASTNode, Declare, Comma, literal_value, iter_ast_lines
+from gcl_types import STRING
+
+# Código (un byte) de cada clase de nodo, en orden de definición.
+KINDS = tuple(cls for cls in vars(ast_nodes).values()
+              if isinstance(cls, type) and issubclass(cls, ASTNode))
+CODES = {cls: code for code, cls in enumerate(KINDS)}
+
+# Índice que indica "ningún nodo" o "sin valor" (línea/columna None).
+NONE = -1
+
+
+class Arena:
+    def __init__(self):
+        self.kinds = array('B')
+        self.first_child = array('i')
+        self.last_child = array('i')
+        self.next_sibling = array('i')
+        self.lines = array('i')
+        self.cols = array('i')
+        self.type_ids = array('I')
+        self.value_ids = array('i')
+        # Tipos y valores (nombres, literales, strings) se guardan una sola
+        # vez y los nodos los referencian por índice.
+        self.types = [None]
+        self._type_ids = {None: 0}
+        self.values = []
+        self._value_ids = {}
+        # Campos poco frecuentes: posiciones extra de Declare, comas de cada
+        # lista, la tabla de símbolos de cada Block y lo que asigna
+        # resolver.resolve. {índice: {campo: valor}}
+        self.extra = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def add(self, cls, lineno=None, col_offset=None, value=None, type=None):
+        """Agrega un nodo sin hijos y devuelve su índice."""
+        index = len(self.kinds)
+        self.kinds.append(CODES[cls])
+        self.first_child.append(NONE)
+        self.last_child.append(NONE)
+        self.next_sibling.append(NONE)
+        self.lines.append(NONE if lineno is None else lineno)
+        self.cols.append(NONE if col_offset is None else col_offset)
+        self.type_ids.append(self.type_id(type))
+        self.value_ids.append(NONE if value is None else self.value_id(value))
+        return index
+
+    def add_child(self, parent, child):
+        last = self.last_child[parent]
+        if last == NONE:
+            self.first_child[parent] = child
+        else:
+            self.next_sibling[last] = child
+        self.last_child[parent] = child
+
+    def children(self, index):
+        """Genera los índices de los hijos de `index`, en orden."""
+        child = self.first_child[index]
+        while child != NONE:
+            yield child
+            child = self.next_sibling[child]
+
+    def type_id(self, type):
+        type_id = self._type_ids.get(type)
+        if type_id is None:
+            type_id = self._type_ids[type] = len(self.types)
+            self.types.append(type)
+        return type_id
+
+    def value_id(self, value):
+        # La clave incluye la clase: 1 y True son iguales como claves de dict.
+        key = (value.__class__, value)
+        value_id = self._value_ids.get(key)
+        if value_id is None:
+            value_id = self._value_ids[key] = len(self.values)
+            self.values.append(value)
+        return value_id
+
+    def view(self, index):
+        return NodeView(self, index)
+
+
+# Builder con la misma interfaz que ast_nodes.NodeBuilder, pero los nodos
+# son índices dentro de un Arena.
+class ArenaBuilder:
+    def __init__(self, arena=None):
+        self.arena = arena if arena is not None else Arena()
+
+    def node(self, cls, lineno=None, col_offset=None, *children):
+        arena = self.arena
+        index = arena.add(cls, lineno, col_offset)
+        for child in children:
+            arena.add_child(index, child)
+        return index
+
+    def ident(self, name, lineno, col_offset):
+        return self.arena.add(ast_nodes.Ident, lineno, col_offset, name)
+
+    def literal(self, value, lineno, col_offset):
+        value, type = literal_value(value)
+        return self.arena.add(ast_nodes.Literal, lineno, col_offset, value, type)
+
+    def string(self, value, lineno, col_offset):
+        return self.arena.add(ast_nodes.String, lineno, col_offset, value, STRING)
+
+    def declare(self, names, var_type, lineno, col_offset, end_lineno=None, end_col_offset=None,
+                bound_lineno=None, bound_col_offset=None):
+        index = self.arena.add(Declare, lineno, col_offset, tuple(names))
+        self.arena.extra[index] = {'var_type': var_type,
+                                   'end_lineno': end_lineno, 'end_col_offset': end_col_offset,
+                                   'bound_lineno': bound_lineno, 'bound_col_offset': bound_col_offset}
+        return index
+
+    def comma(self, left, right, lineno, col_offset):
+        # Igual que NodeBuilder.comma: a, b, c es un solo nodo Comma.
+        arena = self.arena
+        if KINDS[arena.kinds[left]] is not Comma:
+            list_index = arena.add(Comma)
+            arena.add_child(list_index, left)
+            arena.extra[list_index] = {'separators': array('i')}
+            left = list_index
+        arena.add_child(left, right)
+        arena.extra[left]['separators'].extend((lineno, col_offset))
+        arena.lines[left] = lineno
+        arena.cols[left] = col_offset
+        return left
+
+    def add_child(self, parent, child):
+        self.arena.add_child(parent, child)
+
+    def kind(self, node):
+        return KINDS[self.arena.kinds[node]]
+
+    def statement(self, node, p):
+        pass
+
+
+# Hijos de un nodo del arena como secuencia de solo lectura. Las vistas se
+# crean a medida que se recorren, no todas juntas.
+class ChildList:
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    def __iter__(self):
+        arena = self.arena
+        for child in arena.children(self.index):
+            yield NodeView(arena, child)
+
+    def __reversed__(self):
+        arena = self.arena
+        indices = array('i', arena.children(self.index))
+        for child in reversed(indices):
+            yield NodeView(arena, child)
+
+    def __len__(self):
+        return sum(1 for _ in self.arena.children(self.index))
+
+    def __bool__(self):
+        return self.arena.first_child[self.index] != NONE
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        for position, child in enumerate(self.arena.children(self.index)):
+            if position == i:
+                return NodeView(self.arena, child)
+        raise IndexError('índice de hijo fuera de rango')
+
+
+# Propiedad para un campo guardado en Arena.extra.
+def _extra_field(name):
+    def get(self):
+        return self.arena.extra.get(self.index, {}).get(name)
+
+    def set(self, value):
+        self.arena.extra.setdefault(self.index, {})[name] = value
+
+    return property(get, set)
+
+
+# Vista de un nodo del arena con los atributos de un ASTNode. Las vistas se
+# crean al recorrer el árbol y se descartan enseguida: los datos viven en los
+# arreglos. `__class__` devuelve la clase del nodo, así que isinstance y el
+# despacho por nombre de clase del type checker funcionan igual, y asignarlo
+# (Plus -> Concat) cambia el código guardado.
+class NodeView:
+    __slots__ = ('arena', 'index')
+
+    def __init__(self, arena, index):
+        self.arena = arena
+        self.index = index
+
+    @property
+    def __class__(self):
+        return KINDS[self.arena.kinds[self.index]]
+
+    @__class__.setter
+    def __class__(self, cls):
+        self.arena.kinds[self.index] = CODES[cls]
+
+    @property
+    def children(self):
+        return ChildList(self.arena, self.index)
+
+    def add_child(self, node):
+        self.arena.add_child(self.index, node.index)
+
+    @property
+    def type(self):
+        return self.arena.types[self.arena.type_ids[self.index]]
+
+    @type.setter
+    def type(self, value):
+        self.arena.type_ids[self.index] = self.arena.type_id(value)
+
+    @property
+    def lineno(self):
+        lineno = self.arena.lines[self.index]
+        return None if lineno == NONE else lineno
+
+    @lineno.setter
+    def lineno(self, value):
+        self.arena.lines[self.index] = NONE if value is None else value
+
+    @property
+    def col_offset(self):
+        col = self.arena.cols[self.index]
+        return None if col == NONE else col
+
+    @col_offset.setter
+    def col_offset(self, value):
+        self.arena.cols[self.index] = NONE if value is None else value
+
+    # Ident.name, Literal.value, String.value y Declare.names
+    @property
+    def value(self):
+        value_id = self.arena.value_ids[self.index]
+        return None if value_id == NONE else self.arena.values[value_id]
+
+    name = value
+    names = value
+
+    symbol_table = _extra_field('symbol_table')
+    depth = _extra_field('depth')
+    slot = _extra_field('slot')
+    frame_size = _extra_field('frame_size')
+    frame_offset = _extra_field('frame_offset')
+    separators = _extra_field('separators')
+    error_index = _extra_field('error_index')
+    var_type = _extra_field('var_type')
+    end_lineno = _extra_field('end_lineno')
+    end_col_offset = _extra_field('end_col_offset')
+    bound_lineno = _extra_field('bound_lineno')
+    bound_col_offset = _extra_field('bound_col_offset')
+
+    def __eq__(self, other):
+        return (isinstance(other, NodeView) and other.arena is self.arena
+                and other.index == self.index)
+
+    def __hash__(self):
+        return hash((id(self.arena), self.index))
+
+    def __str__(self, level=0):
+        return ''.join(iter_ast_lines(self, level))
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__} #{self.index}>'
+
+
+# Parsea con `parser` construyendo un arena en lugar de objetos y devuelve la
+# vista de la raíz (o None). Se usa una copia del parser para no cambiar el
+# builder del parser compartido.
+def parse_to_arena(parser, lexer, arena=None):
+    builder = ArenaBuilder(arena)
+    parser = copy.copy(parser)
+    parser.builder = builder
+    root = parser.parse(lexer=lexer)
+    if root is None:
+        return None
+    return builder.arena.view(root)
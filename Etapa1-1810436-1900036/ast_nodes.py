@@ -1,188 +1,319 @@
+from array import array
+from gcl_types import INT, BOOL, STRING, UNKNOWN, TYPE_ERROR, list_type_name
+
+# Todos los nodos usan __slots__: no tienen __dict__ por instancia, lo que
+# reduce bastante la memoria del AST. Las subclases sin campos propios
+# declaran `__slots__ = ()`; así comparten la misma estructura y el type
+# checker puede cambiarles la clase (Plus -> Concat, App -> WriteFunction).
 class ASTNode:
+    __slots__ = ('children', 'type', 'lineno', 'col_offset')
+
     def __init__(self, lineno=None, col_offset=None,):# Añadimos argumentos opcionales
         super().__init__()
-        self.children = []  # Lista de hijos del nodo
+        # Lista de hijos del nodo. Las hojas comparten la tupla vacía y la
+        # lista se crea al agregar el primer hijo.
+        self.children = ()
         self.type = None    # Tipo del nodo, por defecto None
         self.lineno = lineno # Los guardamos
         self.col_offset = col_offset # Los guardamos
 
     def add_child(self, node):
-        self.children.append(node)
+        if self.children:
+            self.children.append(node)
+        else:
+            self.children = [node]
 
     def __str__(self, level=0):
-        prefix = '-' * level
-        node_name = self.__class__.__name__
-        
-        # Casos especiales
-        if isinstance(self, Ident):
-            node_name = f"Ident: {self.name}"
-        elif isinstance(self, Literal):
-            node_name = f"Literal: {str(self.value).lower()}"
-        elif isinstance(self, String):
-            # Suponiendo que self.value contiene las comillas del lexer '"First: "'
-            node_name = f"String: {self.value}"
-        elif isinstance(self, Comma):
-            node_name = "Comma"
-        
-        #Solo mostrar type para nodos específicos
-        show_type = not isinstance(self, (Sequencing, Asig, Guard, Then, Print,String,TwoPoints))
-        type_info = f" | type: {self.type}" if self.type is not None and show_type else ""
-        
-        result = f"{prefix}{node_name}{type_info}\n"
-
-        for child in self.children:
-            if isinstance(child, ASTNode):
-                result += child.__str__(level + 1)
-        
-        return result
+        return ''.join(iter_ast_lines(self, level))
 
 class Block(ASTNode):
-    def __str__(self, level=0):
-        prefix = '-' * level
-        result = f"{prefix}Block\n"
-        
-        # Imprimimos la tabla de símbolos directamente aquí para controlar el formato.
-        if hasattr(self, 'symbol_table') and self.symbol_table:
-            result += f"{prefix}-Symbols Table\n"
-            for name, symbol_info in self.symbol_table.symbols.items():
-                # Extraemos solo el tipo, que es el primer elemento.
-                type_info = symbol_info[0]
-                result += f"{prefix}--variable: {name} | type: {type_info}\n"
-
-        
-        # Imprimir los hijos (sentencias)
-        for child in self.children:
-            result += child.__str__(level + 1)
-            
-        return result
+    __slots__ = ('symbol_table', 'depth', 'frame_size', 'frame_offset')
+
+    def __init__(self, lineno=None, col_offset=None):
+        super().__init__(lineno, col_offset)
+        self.symbol_table = None # La asigna el type checker
+        # Los asigna resolver.resolve: nivel de anidamiento, cantidad de
+        # variables declaradas y posición de la primera en el marco aplanado.
+        self.depth = None
+        self.frame_size = None
+        self.frame_offset = None
 
+# Declaración de variables: los nombres declarados y su tipo (gcl_types).
 class Declare(ASTNode):
-    def __init__(self, lineno=None, col_offset=None, end_lineno=None, end_col_offset=None,bound_lineno=None, bound_col_offset=None):
+    __slots__ = ('names', 'var_type', 'end_lineno', 'end_col_offset', 'bound_lineno', 'bound_col_offset')
+
+    def __init__(self, names, var_type, lineno=None, col_offset=None, end_lineno=None, end_col_offset=None,bound_lineno=None, bound_col_offset=None):
         super().__init__(lineno, col_offset)
+        self.names = names
+        self.var_type = var_type
         self.end_lineno = end_lineno
         self.end_col_offset = end_col_offset
         self.bound_lineno = bound_lineno
         self.bound_col_offset = bound_col_offset
 
-    def __str__(self, level=0):
-        return ""
+class Sequencing(ASTNode): __slots__ = ()
 
-class Sequencing(ASTNode):
-    def __str__(self, level=0):
-        prefix = '-' * level
-        result = ""
-        
-        # Solo mostrar "Sequencing" si no es el nodo raíz
-        if level > 0:
-            result += f"{prefix}Sequencing\n"
-        
-        for child in self.children:
-            result += child.__str__(level + 1)
-        return result
-
-class Asig(ASTNode): pass
+class Asig(ASTNode): __slots__ = ()
 class Ident(ASTNode):
+    __slots__ = ('name', 'depth', 'slot')
+
     def __init__(self, name, lineno, col_offset):
         super().__init__(lineno, col_offset)  # Pasamos la ubicación al constructor base
         self.name = name  # Guardamos el nombre del identificador
-    def __str__(self, level=0):
-        # La representación en string no necesita cambiar
-        prefix = '-' * level
-        node_name = f"Ident: {self.name}"
-        type_info = f" | type: {self.type}" if self.type is not None else ""
-        return f"{prefix}{node_name}{type_info}\n"
+        # Los asigna resolver.resolve: nivel del bloque que declara la
+        # variable y su posición en el marco de ese bloque.
+        self.depth = None
+        self.slot = None
+
+# Valor y tipo de un literal: 'true'/'false' pasan a bool, los números son int.
+def literal_value(value):
+    if isinstance(value, str) and value.lower() in ['true', 'false']:
+        return value.lower() == 'true', BOOL
+    return value, INT if isinstance(value, int) else UNKNOWN
 
 class Literal(ASTNode):
+     __slots__ = ('value',)
+
      def __init__(self, value, lineno=None, col_offset=None): 
         super().__init__(lineno, col_offset)
-
-        if isinstance(value, str) and value.lower() in ['true', 'false']:
-            self.value = value.lower() == 'true'
-            self.type = "bool"
-        else:
-            self.value = value
-            self.type = "int" if isinstance(value, int) else "unknown"
+        self.value, self.type = literal_value(value)
 
 class String(ASTNode):
+    __slots__ = ('value',)
+
     def __init__(self, value):
         super().__init__()
         self.value = value
-        self.type = "String"
+        self.type = STRING
 
 # Operaciones
-class Plus(ASTNode): pass
-class Minus(ASTNode): pass
-class Mult(ASTNode): pass
-class Equal(ASTNode): pass
-class NotEqual(ASTNode): pass
-class Less(ASTNode): pass
-class Greater(ASTNode): pass
-class Leq(ASTNode): pass
-class Geq(ASTNode): pass
-class And(ASTNode): pass
-class Or(ASTNode): pass
-class Not(ASTNode): pass
-class Comma(ASTNode): pass
-class TwoPoints(ASTNode): pass
-class App(ASTNode): pass
-class Concat(ASTNode): pass 
-class ReadFunction(ASTNode): pass
-class WriteFunction(ASTNode): pass
+class Plus(ASTNode): __slots__ = ()
+class Minus(ASTNode): __slots__ = ()
+class Mult(ASTNode): __slots__ = ()
+class Equal(ASTNode): __slots__ = ()
+class NotEqual(ASTNode): __slots__ = ()
+class Less(ASTNode): __slots__ = ()
+class Greater(ASTNode): __slots__ = ()
+class Leq(ASTNode): __slots__ = ()
+class Geq(ASTNode): __slots__ = ()
+class And(ASTNode): __slots__ = ()
+class Or(ASTNode): __slots__ = ()
+class Not(ASTNode): __slots__ = ()
+# Lista a, b, c, ...: un solo nodo con todos los elementos como hijos, en
+# lugar de una cadena de Comma binarios anidados a la izquierda. El i-ésimo
+# Comma de esa cadena es el prefijo hasta el elemento i.
+# `separators` guarda línea y columna de cada coma, en orden
+# ([línea0, col0, línea1, col1, ...]). lineno/col_offset son los de la última
+# coma, como en el Comma externo de la cadena. `error_index` lo asigna el type
+# checker: índice del primer elemento que no es una lista de enteros, o None.
+class Comma(ASTNode):
+    __slots__ = ('separators', 'error_index')
+
+    def __init__(self, lineno=None, col_offset=None):
+        super().__init__(lineno, col_offset)
+        self.separators = array('i')
+        self.error_index = None
+
+    def add_element(self, element, lineno, col_offset):
+        """Agrega `element` después de la coma en (lineno, col_offset)."""
+        self.add_child(element)
+        self.separators.extend((lineno, col_offset))
+        self.lineno = lineno
+        self.col_offset = col_offset
+
+class TwoPoints(ASTNode): __slots__ = ()
+class App(ASTNode): __slots__ = ()
+class Concat(ASTNode): __slots__ = () 
+class ReadFunction(ASTNode): __slots__ = ()
+class WriteFunction(ASTNode): __slots__ = ()
 
 # Sentencias
-class While(ASTNode): pass
-class Then(ASTNode): pass # Usado para cuerpos de if/while
+class While(ASTNode): __slots__ = ()
+class Then(ASTNode): __slots__ = () # Usado para cuerpos de if/while
 
-class If(ASTNode):
-    # La impresión se personaliza para que coincida con el formato Guard/Then
-    def __str__(self, level=0):
+class If(ASTNode): __slots__ = ()
+
+class Guard(ASTNode): __slots__ = ()
+
+class Print(ASTNode): __slots__ = ()
+class skip(ASTNode): __slots__ = ()
+class Return(ASTNode): __slots__ = ()
+
+
+# --- Construcción del AST --------------------------------------------------
+
+# Las acciones de la gramática crean los nodos a través de un builder
+# (p.parser.builder). Este crea objetos ASTNode; ast_arena.ArenaBuilder tiene
+# la misma interfaz pero guarda los nodos en arreglos paralelos.
+class NodeBuilder:
+    def node(self, cls, lineno=None, col_offset=None, *children):
+        node = cls(lineno, col_offset)
+        for child in children:
+            node.add_child(child)
+        return node
+
+    def ident(self, name, lineno, col_offset):
+        return Ident(name, lineno, col_offset)
+
+    def literal(self, value, lineno, col_offset):
+        return Literal(value, lineno, col_offset)
+
+    def string(self, value, lineno, col_offset):
+        node = String(value)
+        node.lineno = lineno
+        node.col_offset = col_offset
+        return node
+
+    def declare(self, names, var_type, lineno, col_offset, end_lineno=None, end_col_offset=None,
+                bound_lineno=None, bound_col_offset=None):
+        return Declare(names, var_type, lineno, col_offset, end_lineno, end_col_offset,
+                       bound_lineno, bound_col_offset)
+
+    def comma(self, left, right, lineno, col_offset):
+        # a, b, c se arma en un solo nodo: si la izquierda ya es una lista
+        # (a, b), el elemento se agrega a ella.
+        if left.__class__ is not Comma:
+            left = self.node(Comma, lineno, col_offset, left)
+        left.add_element(right, lineno, col_offset)
+        return left
+
+    def add_child(self, parent, child):
+        parent.add_child(child)
+
+    def kind(self, node):
+        """Clase del nodo (las acciones la usan en lugar de isinstance)."""
+        return node.__class__
+
+    def statement(self, node, p):
+        """
+        Se llama con cada sentencia reconocida (`p` es la producción, con
+        p.lexspan(1) su posición). Aquí no hace nada; incremental.py la usa
+        para saber dónde está cada sentencia.
+        """
+
+# --- Impresión del AST decorado ---------------------------------------------
+
+# Nodos que se imprimen sin su tipo.
+_HIDDEN_TYPE = (Sequencing, Asig, Guard, Then, Print, String, TwoPoints)
+
+def iter_ast_lines(node, level=0):
+    """
+    Genera, línea por línea, la impresión del AST decorado a partir de `node`.
+    Usa una pila explícita en lugar de recursión, así que no hay límite de
+    profundidad. En la pila hay pares (nodo, nivel) o líneas ya armadas.
+    """
+    stack = [(node, level)]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, str):
+            yield item
+            continue
+        node, level = item
         prefix = '-' * level
-        result = f"{prefix}If\n"
-
-        clauses = self.children
-        if not clauses:
-            return result
-
-        num_clauses = len(clauses)
-
-        # Imprimir los N-1 'Guard' anidados
-        for i in range(num_clauses - 1):
-            guard_prefix = '-' * (level + 1 + i)
-            result += f"{guard_prefix}Guard\n"
-
-        # Imprimir todos los bloques 'Then' con la indentación especial
-        for i, clause in enumerate(clauses):
-            # Calcular el nivel de indentación para este 'Then'
-            then_level = 0
-            if i == 0:
-                #El primer 'Then' está en el nivel más profundo
-                then_level = level + 1 + (num_clauses - 1)
-            elif i == 1:
-                #El segundo 'Then' está AL MISMO NIVEL que el primero
-                then_level = level + 1 + (num_clauses - 1)
+
+        if isinstance(node, Block):
+            yield f"{prefix}Block\n"
+            # La tabla de símbolos se imprime antes de las sentencias.
+            if getattr(node, 'symbol_table', None):
+                yield f"{prefix}-Symbols Table\n"
+                for name, symbol_info in node.symbol_table.symbols.items():
+                    # Extraemos solo el tipo, que es el primer elemento.
+                    yield f"{prefix}--variable: {name} | type: {symbol_info[0]}\n"
+        elif isinstance(node, Declare):
+            continue
+        elif isinstance(node, Sequencing):
+            # Solo mostrar "Sequencing" si no es el nodo raíz
+            if level > 0:
+                yield f"{prefix}Sequencing\n"
+        elif isinstance(node, skip):
+            yield f"{prefix}skip\n"
+            continue
+        elif isinstance(node, If):
+            yield f"{prefix}If\n"
+            _push_if_clauses(stack, node.children, level)
+            continue
+        elif isinstance(node, Comma):
+            elements = list(node.children)
+            yield from _comma_lines(node, elements, level)
+            _push_comma_elements(stack, elements, level)
+            continue
+        else:
+            # Casos especiales
+            if isinstance(node, Ident):
+                node_name = f"Ident: {node.name}"
+            elif isinstance(node, Literal):
+                node_name = f"Literal: {str(node.value).lower()}"
+            elif isinstance(node, String):
+                node_name = f"String: {node.value}"
             else:
-                #Los siguientes van subiendo un nivel cada vez
-                then_level = level + 1 + (num_clauses - i)
-            
-            # Construir el bloque 'Then'
-            then_prefix = '-' * then_level
-            result += f"{then_prefix}Then\n"
-            
-            condition = clause.children[0]
-            body = clause.children[1]
-            
-            # Agregar el contenido del 'Then' con un nivel más de indentación
-            result += condition.__str__(then_level + 1)
-            result += body.__str__(then_level + 1)
-            
-        return result
-
-
-class Guard(ASTNode):
-    pass
-
-class Print(ASTNode): pass
-class skip(ASTNode):
-    def __str__(self, level=0):
-        return f"{'-' * level}skip\n"
-class Return(ASTNode): pass
\ No newline at end of file
+                node_name = node.__class__.__name__
+
+            # Solo mostrar type para nodos específicos
+            if node.type is not None and not isinstance(node, _HIDDEN_TYPE):
+                yield f"{prefix}{node_name} | type: {node.type}\n"
+            else:
+                yield f"{prefix}{node_name}\n"
+            if isinstance(node, Ident):
+                continue
+
+        # Los hijos se apilan al revés para que salgan en orden.
+        stack.extend((child, level + 1) for child in reversed(node.children)
+                     if isinstance(child, ASTNode))
+
+# Las N cláusulas de un If se imprimen con el formato Guard/Then: primero
+# N-1 'Guard' anidados y luego un 'Then' por cláusula con su condición y su
+# cuerpo. El primer y el segundo 'Then' van al nivel más profundo y los
+# siguientes van subiendo un nivel cada vez.
+def _push_if_clauses(stack, clauses, level):
+    num_clauses = len(clauses)
+    pending = [f"{'-' * (level + 1 + i)}Guard\n" for i in range(num_clauses - 1)]
+    for i, clause in enumerate(clauses):
+        if i <= 1:
+            then_level = level + 1 + (num_clauses - 1)
+        else:
+            then_level = level + 1 + (num_clauses - i)
+        pending.append(f"{'-' * then_level}Then\n")
+        pending.append((clause.children[0], then_level + 1)) # Condición
+        pending.append((clause.children[1], then_level + 1)) # Cuerpo
+    stack.extend(reversed(pending))
+
+# Una lista de N elementos se imprime como la cadena de Comma binarios del
+# parser original: N-1 líneas 'Comma', de la última coma a la primera, cada
+# una un nivel más adentro y con el tipo de su prefijo. Luego los dos primeros
+# elementos al nivel más profundo y los siguientes subiendo un nivel cada vez.
+def _comma_lines(node, elements, level):
+    count = len(elements)
+    if node.type is None:
+        for depth in range(level, level + count - 1):
+            yield f"{'-' * depth}Comma\n"
+        return
+    # Los prefijos desde el primer elemento erróneo tienen TYPE_ERROR; el
+    # resto, "function with length=" la cantidad de enteros que contienen.
+    valid = count if node.error_index is None else node.error_index
+    length = sum(_list_length(element) for element in elements[:valid])
+    for i in range(count - 1, 0, -1):
+        depth = level + count - 1 - i
+        if i >= valid:
+            yield f"{'-' * depth}Comma | type: {TYPE_ERROR}\n"
+        else:
+            yield f"{'-' * depth}Comma | type: {list_type_name(length)}\n"
+            length -= _list_length(elements[i])
+
+def _list_length(element):
+    # Una lista entre paréntesis cuenta con todos sus elementos.
+    return element.type.length if isinstance(element, Comma) else 1
+
+def _push_comma_elements(stack, elements, level):
+    count = len(elements)
+    stack.extend((elements[i], level + count - i) for i in range(count - 1, 0, -1))
+    stack.append((elements[0], level + count - 1))
+
+def write_ast(node, out, level=0):
+    """Escribe el AST decorado en el archivo `out`, en bloques de líneas."""
+    lines = []
+    for line in iter_ast_lines(node, level):
+        lines.append(line)
+        if len(lines) >= 4096:
+            out.write(''.join(lines))
+            lines.clear()
+    out.write(''.join(lines))
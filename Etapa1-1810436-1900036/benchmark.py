@@ -0,0 +1,1303 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Benchmarks del front-end. Uso: python benchmark.py <escenario> [opciones]
+import argparse
+import io
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Programa mínimo usado para medir el arranque.
+SMALL_PROGRAM = '{\n  int a;\n  a := 1;\n  print a\n}\n'
+
+
+# Ejecuta `code` en un intérprete nuevo y devuelve el tiempo de pared.
+def _time_subprocess(code, env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, '-c', code], cwd=HERE, env=env, check=True,
+                   stdout=subprocess.DEVNULL)
+    return time.perf_counter() - start
+
+
+# Programa grande con `n` asignaciones, una por línea.
+def gen_assignments(n):
+    lines = ['{', '  int a, b;', '  a := 0;']
+    lines.extend(f'  a := a + {i % 97} * b;' for i in range(n))
+    lines.append('  print a')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Programa con `n` cadenas sin cerrar, una por línea (caso denso en errores).
+def gen_unterminated_strings(n):
+    lines = ['{']
+    lines.extend(f'  print "sin cerrar {i} \\q' for i in range(n))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Cuerpo de un while con `n` asignaciones de expresiones largas (muchos nodos
+# de expresión por sentencia), para medir el costo de visitar cada nodo.
+def gen_expressions(n):
+    lines = ['{', '  int a, b; bool c;', '  while a < 1 -->']
+    for i in range(n):
+        lines.append(f'    a := (a + {i}) * (b - 3) + -a * 2 - b;')
+        lines.append(f'    c := a <= b and !(a <> {i}) or a >= 2 and b == a;')
+    lines.append('    skip')
+    lines.append('  end')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Formas de programa con una lista de `n` elementos, para medir que el
+# parser construya cada lista en tiempo lineal.
+def gen_block_statements(n):
+    return '{\n  int a;\n' + '  a := 1;\n' * n + '  skip\n}\n'
+
+
+def gen_declaration_names(n):
+    return '{\n  int ' + ', '.join(f'v{i}' for i in range(n)) + ';\n  skip\n}\n'
+
+
+def gen_while_body(n):
+    return '{\n  int a;\n  while a < 1 -->\n' + '    a := 1;\n' * n + '    skip\n  end\n}\n'
+
+
+def gen_if_guards(n):
+    guards = '\n  [] '.join(f'a == {i} --> skip' for i in range(n))
+    return '{\n  int a;\n  if ' + guards + '\n  fi\n}\n'
+
+
+# Programas con una construcción anidada `n` niveles, para el type checker.
+def gen_nested(shape, n):
+    if shape == 'blocks':
+        body = '{\n' * n + 'a := 1\n' + '}\n' * n
+    elif shape == 'while':
+        body = 'while b -->\n' * n + 'skip\n' + 'end\n' * n
+    elif shape == 'if':
+        body = 'if b --> ' * n + 'skip' + ' fi' * n
+    elif shape == 'not':
+        body = 'b := ' + '!' * n + 'b'
+    elif shape == 'plus':
+        body = 'a := ' + ' + '.join(['a'] * n)
+    elif shape == 'parens':
+        body = 'a := ' + '(1 - ' * n + 'a' + ')' * n
+    else:
+        return gen_block_statements(n)
+    return '{\n  int a; bool b;\n' + body + '\n}\n'
+
+
+# `n` bloques anidados; cada uno usa una variable declarada en el más externo.
+def gen_nested_lookups(n):
+    return '{\n  int a;\n' + '{\n  a := a + 1;\n' * n + 'skip\n' + '}\n' * n + '}\n'
+
+
+# Programa de `n` asignaciones donde una de cada 10 tiene un error de tipo
+# (la primera, en la línea 4).
+def gen_context_errors(n):
+    lines = ['{', '  int a, b; bool c;']
+    for i in range(n):
+        if i % 10 == 0:
+            lines.append(f'  a := c + {i};')
+        else:
+            lines.append(f'  a := a + {i} * b;')
+    lines.append('  print a')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Programa de `n` sentencias donde una de cada 10 tiene un error de sintaxis,
+# alternando entre el bloque principal y un bloque dentro de un while. Con
+# `skip_bad` se omiten las sentencias erróneas: es el AST que debe quedar
+# después de recuperarse.
+def gen_syntax_errors(n, skip_bad=False):
+    lines = ['{', '  int a, b;']
+    for i in range(n):
+        if i % 10 != 0:
+            lines.append(f'  a := a + {i};')
+        elif i % 20 == 0:
+            lines.append('' if skip_bad else '  a := a + ;')
+        else:
+            bad = '' if skip_bad else '; b := b * * 2'
+            lines.append(f'  while a < {i} --> {{ a := a + 1{bad} }} end;')
+    lines.append('  print a')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Asignación de una lista de `n` enteros; `bad` pone `true` en esa posición.
+def gen_list_literal(n, bad=None):
+    elements = ['true' if i == bad else str(i) for i in range(n)]
+    return '{\n  function[..%d] f;\n  f := %s\n}\n' % (n - 1, ', '.join(elements))
+
+
+# Lexea `data` completo con un lexer nuevo y devuelve (tokens, errores, s).
+def _lex_all(data):
+    from lexer import build_lexer
+    lexer = build_lexer()
+    lexer.errors = []
+    start = time.perf_counter()
+    lexer.input(data)
+    count = 0
+    while lexer.token():
+        count += 1
+    return count, len(lexer.errors), time.perf_counter() - start
+
+
+# Programa variado que usa todos los tokens, con errores léxicos mezclados
+# si `with_errors` es verdadero.
+def gen_mixed(n, with_errors=False):
+    lines = ['{', '  int a, b; bool c;', '  function[..4] f;']
+    for i in range(n):
+        lines.append(f'  a := -{i} + b * (a - 3); c := a <= b and !(a <> b) or a >= 2;'
+                     f' // comentario {i}')
+        lines.append(f'  if a < b --> print "x\\"y\\\\z\\n" + a [] a > b --> skip fi;'
+                     f' f := f(1:a); b := f.2;')
+        lines.append(f'\twhile a == {i} --> a := a + 1 end; {{ int d; d := {i} }};')
+        if with_errors and i % 3 == 0:
+            lines.append(f'  a := 3 $ 4; print "sin cerrar \\q {i}; b := b ~ 1;')
+    lines.append('  print a')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Programa para editar: `n` grupos de bloques anidados con declaraciones,
+# cuerpos de while e if y algunos errores de contexto (variables no
+# declaradas, declaraciones repetidas).
+def gen_editing(n):
+    lines = ['{', '  int a, b; bool c;', '  a := 0;']
+    for i in range(n):
+        lines.append(f'  while a < {i} -->')
+        lines.append(f'    a := a + {i % 7};')
+        lines.append('    if c --> print a [] !c --> b := b * 2 fi')
+        lines.append('  end;')
+        lines.append(f'  {{ int d{i}, e; d{i} := a;')
+        lines.append(f'    {{ bool e; e := c or a > {i}; print e }};')
+        if i % 5 == 4:
+            lines.append(f'    u{i} := 1; print u{i} + 1;')
+        if i % 7 == 6:
+            lines.append('    { int x; int x; x := 1 };')
+        lines.append('    b := e + 1')
+        lines.append('  };')
+    lines.append('  print a')
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+# Programas con muchas iteraciones, para los evaluadores: un doble while con
+# lecturas y escrituras de una función (`n` vueltas del while externo) y una
+# criba de primos hasta `n`.
+def gen_loops(n):
+    return f'''{{
+  int i, j, s, t, n; bool b; function[..99] f;
+  n := {n};
+  while i < n -->
+    j := 0;
+    while j < 100 -->
+      f := f(j:f.j + i * j);
+      s := s + f.j - j;
+      b := s > 1000 and !b or j == i;
+      j := j + 1
+    end;
+    if b --> t := t + 1 [] !b --> t := t - 1 fi;
+    i := i + 1
+  end;
+  print "s=" + s + " t=" + t + " b=" + b;
+  print f.99
+}}
+'''
+
+
+def gen_sieve(n):
+    return f'''{{
+  int i, k, count; function[..{n}] p;
+  p := 1;
+  i := 2;
+  while i <= {n} -->
+    if p.i == 1 -->
+      count := count + 1;
+      k := i * i;
+      while k <= {n} --> p := p(k:0); k := k + i end
+    [] p.i <> 1 --> skip
+    fi;
+    i := i + 1
+  end;
+  print count
+}}
+'''
+
+
+# Programa aleatorio sin errores de contexto para comparar evaluadores: while
+# acotados (cada uno con su contador), if con guardias que pueden quedar todas
+# en falso, lecturas y modificaciones de funciones con índices que pueden
+# salirse del dominio, bloques que ocultan variables y print de todos los
+# tipos.
+def gen_random_program(rng, statements=20):
+    ints, bools, functions = ['a', 'b', 'c'], ['p', 'q'], ['f', 'g']
+
+    def int_expr(depth):
+        choice = rng.randrange(7 if depth < 3 else 3)
+        if choice == 0:
+            return str(rng.randrange(7))
+        if choice == 1:
+            return rng.choice(ints)
+        if choice in (2, 3):
+            # Casi siempre dentro del dominio 0..4
+            if rng.random() < 0.9:
+                return f'{rng.choice(functions)}.{rng.randrange(5)}'
+            index = rng.choice([str(rng.randrange(-1, 6)), rng.choice(ints), f'({int_expr(depth + 1)})'])
+            return f'{rng.choice(functions)}.{index}'
+        if choice == 4:
+            return f'-{int_expr(depth + 1)}'
+        if choice == 5:
+            # Solo por constantes: los valores no crecen sin límite en los while
+            return f'({int_expr(depth + 1)} * {rng.randrange(4)})'
+        return f'({int_expr(depth + 1)} {rng.choice("+-")} {int_expr(depth + 1)})'
+
+    def bool_expr(depth):
+        choice = rng.randrange(6 if depth < 3 else 2)
+        if choice == 0:
+            return rng.choice(['true', 'false'])
+        if choice == 1:
+            return rng.choice(bools)
+        if choice == 2:
+            return f'({int_expr(depth + 1)} {rng.choice(["<", ">", "<=", ">=", "==", "<>"])} {int_expr(depth + 1)})'
+        if choice == 3:
+            return f'!{bool_expr(depth + 1)}'
+        if choice == 4:
+            return f'({bool_expr(depth + 1)} {rng.choice(["and", "or"])} {bool_expr(depth + 1)})'
+        return f'({rng.choice(functions)} == {rng.choice(functions)})'
+
+    def statement(depth):
+        choice = rng.randrange(11 if depth < 3 else 6)
+        if choice == 0:
+            return f'{rng.choice(ints)} := {int_expr(0)}'
+        if choice == 1:
+            return f'{rng.choice(bools)} := {bool_expr(0)}'
+        if choice == 2:
+            name = rng.choice(functions)
+            source = rng.choice([name, rng.choice(functions)])
+            key = lambda: str(rng.randrange(5)) if rng.random() < 0.9 else int_expr(1)
+            return rng.choice([f'{name} := {source}({key()}:{int_expr(1)})',
+                               f'{name} := {source}', f'{name} := {rng.randrange(5)}',
+                               f'{name} := ' + ', '.join(str(rng.randrange(9)) for _ in range(5)),
+                               f'{name} := {source}({key()}:{int_expr(1)})({key()}:1)'])
+        if choice == 3:
+            return 'print ' + rng.choice([int_expr(0), bool_expr(0), rng.choice(functions),
+                                          f'"v\\n" + {int_expr(1)} + " " + {bool_expr(1)}'])
+        if choice == 4:
+            return f'{rng.choice(ints)} := {rng.choice(ints)} + {rng.randrange(1, 4)}'
+        if choice == 5:
+            return 'skip'
+        if choice in (6, 7):
+            conditions = [bool_expr(0) for _ in range(rng.randrange(1, 4))]
+            if rng.random() < 0.9:
+                conditions.append('true')
+            guards = ' [] '.join(f'{condition} --> {body(depth + 1)}' for condition in conditions)
+            return f'if {guards} fi'
+        if choice == 8:
+            counter = f'i{depth}'
+            return (f'{counter} := 0; while {counter} < {rng.randrange(4)} --> '
+                    f'{body(depth + 1)}; {counter} := {counter} + 1 end')
+        if choice == 9:
+            return f'{{ int a; bool q; a := {int_expr(0)}; {body(depth + 1)} }}'
+        return f'{{ {body(depth + 1)} }}'
+
+    def body(depth):
+        return '; '.join(statement(depth) for _ in range(rng.randrange(1, 4)))
+
+    lines = ['{', '  int a, b, c, i0, i1, i2, i3; bool p, q; function[..4] f, g;']
+    lines.append(';\n'.join('  ' + statement(0) for _ in range(statements)))
+    lines.append('}')
+    return '\n'.join(lines) + '\n'
+
+
+def _lex_all_with(lexer, data):
+    lexer.errors = []
+    lexer.input(data)
+    count = 0
+    for _ in iter(lexer.token, None):
+        count += 1
+    return count
+
+
+def _token_stream(lexer, data):
+    lexer.errors = []
+    lexer.input(data)
+    lexer.lineno = 1
+    tokens = [(t.type, t.value, t.lineno, lexer.find_column(t.lexpos), t.lexpos) for t in iter(lexer.token, None)]
+    return tokens, list(lexer.errors)
+
+
+def _report(label, samples):
+    print(f'{label:<28} median {statistics.median(samples) * 1000:8.1f} ms'
+          f'   min {min(samples) * 1000:8.1f} ms')
+
+
+# Arranque: tiempo de lanzar python, construir lexer/parser y analizar un
+# programa pequeño, con la caché de tablas vacía (como antes) y caliente.
+def bench_startup(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'small.imperat')
+        with open(source, 'w') as file:
+            file.write(SMALL_PROGRAM)
+        run_parse = f'import sys; sys.argv = ["parse.py", {source!r}]; import parse; parse.main()'
+
+        cold, warm, imports = [], [], []
+        for i in range(args.repeat):
+            env = dict(os.environ, IMPERAT_CACHE_DIR=os.path.join(tmp, f'cold{i}'))
+            cold.append(_time_subprocess(run_parse, env))
+
+        env = dict(os.environ, IMPERAT_CACHE_DIR=os.path.join(tmp, 'warm'))
+        _time_subprocess(run_parse, env)
+        for _ in range(args.repeat):
+            warm.append(_time_subprocess(run_parse, env))
+            imports.append(_time_subprocess('import parse', env))
+
+    _report('import parse (lazy)', imports)
+    _report('parse.py, cold table cache', cold)
+    _report('parse.py, warm table cache', warm)
+    print(f'speedup: {statistics.median(cold) / statistics.median(warm):.2f}x')
+
+
+# Archivos con miles de cadenas sin cerrar: el tiempo por error debe
+# mantenerse constante al crecer el archivo.
+def bench_lex_errors(args):
+    for n in (1000, 2000, 4000, 8000, 16000):
+        data = gen_unterminated_strings(n)
+        _, errors, elapsed = _lex_all(data)
+        print(f'{n:>6} unterminated strings  {len(data):>8} chars  {errors:>6} errors'
+              f'  {elapsed * 1000:8.1f} ms  {elapsed / n * 1e6:6.2f} us/string')
+
+
+# Parseo de programas grandes: cada nodo calcula su columna.
+def bench_columns(args):
+    from parser import build_parser
+    from lexer import build_lexer
+    parser = build_parser()
+    for n in (5000, 10000, 20000, 40000):
+        data = gen_assignments(n)
+        lexer = build_lexer()
+        lexer.input(data)
+        start = time.perf_counter()
+        parser.parse(lexer=lexer)
+        elapsed = time.perf_counter() - start
+        print(f'{n:>6} statements  {elapsed * 1000:8.1f} ms  {elapsed / n * 1e6:6.2f} us/statement')
+
+
+# Parsea un programa generado en un proceso nuevo (para que el heap de una
+# medición no afecte a la siguiente) e imprime el tiempo del parseo.
+_PARSE_PROBE = """
+import gc, sys, time, benchmark
+from lexer import build_lexer
+from parser import build_parser
+parser = build_parser()
+data = getattr(benchmark, sys.argv[1])(int(sys.argv[2]))
+lexer = build_lexer()
+lexer.input(data)
+gc.disable()
+start = time.perf_counter()
+parser.parse(lexer=lexer)
+print(time.perf_counter() - start)
+"""
+
+
+# Escalamiento del parser con listas de 10k, 100k y 1M elementos. El tiempo
+# por elemento debe mantenerse aproximadamente constante. El recolector de
+# basura se apaga mientras se mide: sus pasadas completas recorren todo el
+# heap y agregan un costo que no depende de la gramática.
+def bench_parse_scaling(args):
+    shapes = [('statements', 'gen_block_statements'), ('declared names', 'gen_declaration_names'),
+              ('while body items', 'gen_while_body'), ('if guards', 'gen_if_guards')]
+    for label, generator in shapes:
+        for n in (10000, 100000, 1000000):
+            result = subprocess.run([sys.executable, '-c', _PARSE_PROBE, generator, str(n)],
+                                    cwd=HERE, check=True, capture_output=True, text=True)
+            elapsed = float(result.stdout)
+            print(f'{label:<17} {n:>8}  {elapsed:8.2f} s  {elapsed / n * 1e6:6.2f} us/item')
+
+
+# Parsea y chequea una lista de n elementos en un proceso nuevo e imprime los
+# dos tiempos.
+_LIST_PROBE = """
+import gc, sys, time, benchmark
+from lexer import build_lexer
+from parser import build_parser
+from type_checker import TypeChecker
+parser = build_parser()
+n = int(sys.argv[1])
+lexer = build_lexer()
+lexer.input(benchmark.gen_list_literal(n))
+gc.disable()
+start = time.perf_counter()
+ast = parser.parse(lexer=lexer)
+parsed = time.perf_counter()
+errors = TypeChecker().check_program(ast)
+checked = time.perf_counter()
+assert errors == [], errors
+print(parsed - start, checked - parsed)
+"""
+
+
+# Listas literales (a := 1, 2, ..., n) de 10k, 100k y 1M elementos: son un
+# solo nodo Comma, así que parsear y chequear deben costar lo mismo por
+# elemento en todos los tamaños. Las posiciones de los errores se prueban en
+# tests/test_type_checker.py.
+def bench_list_literals(args):
+    for n in (10000, 100000, 1000000):
+        result = subprocess.run([sys.executable, '-c', _LIST_PROBE, str(n)],
+                                cwd=HERE, check=True, capture_output=True, text=True)
+        parse_time, check_time = map(float, result.stdout.split())
+        print(f'{n:>8} elements  parse {parse_time:6.2f} s {parse_time / n * 1e6:6.2f} us/item'
+              f'  check {check_time * 1000:8.1f} ms {check_time / n * 1e9:6.0f} ns/item')
+
+
+# Type checker sobre programas anidados 100k niveles (bloques, while, if,
+# `!`, sumas, paréntesis) y sobre 100k sentencias seguidas, que forman una
+# cadena de Sequencing igual de profunda. Que no haya errores se prueba en
+# tests/test_type_checker.py.
+def bench_deep_check(args):
+    from lexer import build_lexer
+    from parser import build_parser
+    from type_checker import TypeChecker
+    parser = build_parser()
+    n = 100000
+    for shape in ('blocks', 'while', 'if', 'not', 'plus', 'parens', 'statements'):
+        lexer = build_lexer()
+        lexer.input(gen_nested(shape, n))
+        ast = parser.parse(lexer=lexer)
+        start = time.perf_counter()
+        TypeChecker().check_program(ast)
+        elapsed = time.perf_counter() - start
+        print(f'{shape:<11} depth {n}  check {elapsed * 1000:8.1f} ms')
+
+
+# Búsqueda de identificadores con bloques anidados: SymbolTable recorre los
+# ámbitos padre (costo proporcional a la profundidad) y ScopedSymbolTable
+# mira el tope de la pila de cada nombre. Se comprueba además que las dos
+# dejen el mismo AST decorado, con la misma tabla impresa en cada Block.
+def bench_symbols(args):
+    from lexer import build_lexer
+    from parser import build_parser
+    from type_checker import TypeChecker
+    from symbol_table import SymbolTable, ScopedSymbolTable
+    parser = build_parser()
+    tables = (('chained', SymbolTable), ('scoped', ScopedSymbolTable))
+
+    shadowing = ('{\n  int a, b;\n  a := 1;\n'
+                 '  { bool a; a := true; { int a; a := b + 1 }; a := !a };\n'
+                 '  { function[..2] a; a := 1, 2, 3 };\n  a := a + b\n}\n')
+    for data in (gen_mixed(200), gen_nested_lookups(50), shadowing,
+                 '{\n  int a; bool a;\n  skip\n}\n', '{\n  { int a }; a := 1\n}\n'):
+        outputs = []
+        for _, table_class in tables:
+            lexer = build_lexer()
+            lexer.input(data)
+            ast = parser.parse(lexer=lexer)
+            errors = TypeChecker(table_class()).check_program(ast)
+            outputs.append((errors, str(ast)))
+        if outputs[0] != outputs[1]:
+            raise SystemExit('las tablas de símbolos dan otro resultado')
+    print('same decorated AST with both symbol tables')
+
+    for n in (1000, 2000, 4000, 8000):
+        lexer = build_lexer()
+        lexer.input(gen_nested_lookups(n))
+        ast = parser.parse(lexer=lexer)
+        for label, table_class in tables:
+            start = time.perf_counter()
+            TypeChecker(table_class()).check_program(ast)
+            elapsed = time.perf_counter() - start
+            print(f'{label:<8} depth {n:>6}  {elapsed * 1000:9.1f} ms  {elapsed / n * 1e6:7.2f} us/level')
+
+
+# Recorre el AST resuelto y comprueba que cada Ident apunte a la variable que
+# el type checker encontró: misma posición en la tabla de símbolos del bloque
+# de ese nivel y mismo tipo. Devuelve la cantidad de Ident revisados.
+def _check_resolution(ast, flatten):
+    from ast_nodes import Block, Ident
+    count = 0
+    blocks = []
+    stack = [(ast, 0)]
+    while stack:
+        node, level = stack.pop()
+        if isinstance(node, Block):
+            del blocks[level:]
+            blocks.append(node)
+            level += 1
+        elif isinstance(node, Ident):
+            block = blocks[node.depth]
+            slot = node.slot - block.frame_offset if flatten else node.slot
+            names = list(block.symbol_table.symbols)
+            if names[slot] != node.name or block.symbol_table.symbols[node.name][0] is not node.type:
+                raise SystemExit(f'{node.name} (línea {node.lineno}) resuelto a otra variable')
+            count += 1
+        stack.extend((child, level) for child in reversed(node.children))
+    return count
+
+
+# Pasada de resolución (resolver.resolve) sobre programas chequeados, con
+# objetos y con arena, con marcos por bloque y aplanados.
+def bench_resolve(args):
+    from ast_arena import parse_to_arena
+    from lexer import build_lexer
+    from parser import build_parser
+    from resolver import resolve
+    from type_checker import TypeChecker
+    parser = build_parser()
+    data = gen_mixed(args.size // 40)
+    for label, parse in (('objects', lambda lexer: parser.parse(lexer=lexer)),
+                         ('arena', lambda lexer: parse_to_arena(parser, lexer))):
+        lexer = build_lexer()
+        lexer.input(data)
+        ast = parse(lexer)
+        TypeChecker().check_program(ast)
+        nodes = _count_nodes(ast)
+        for flatten in (False, True):
+            start = time.perf_counter()
+            size = resolve(ast, flatten)
+            elapsed = time.perf_counter() - start
+            idents = _check_resolution(ast, flatten)
+            print(f'{label:<8} flatten={flatten!s:<5} {nodes} nodes  {elapsed * 1000:8.1f} ms'
+                  f'  {elapsed / nodes * 1e9:6.0f} ns/node  {idents} idents  frame {size}')
+
+
+# Políticas de errores del type checker sobre un programa grande con un error
+# cada 10 sentencias: 'fail-fast' se detiene en el primero, 'first' recorre
+# todo y se queda con el primero, 'all' los junta todos. El primer error debe
+# ser el mismo con las tres.
+def bench_diagnostics(args):
+    from diagnostics import POLICIES
+    from lexer import build_lexer
+    from parser import build_parser
+    from type_checker import TypeChecker
+    parser = build_parser()
+    n = args.size // 4
+    lexer = build_lexer()
+    lexer.input(gen_context_errors(n))
+    ast = parser.parse(lexer=lexer)
+    first_errors = set()
+    for policy in POLICIES:
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            errors = TypeChecker(policy=policy).check_program(ast)
+            samples.append(time.perf_counter() - start)
+        first_errors.add(str(errors[0]))
+        print(f'{policy:<10} {n} statements  best {min(samples) * 1000:8.1f} ms  {len(errors)} errors')
+    if len(first_errors) != 1:
+        raise SystemExit(f'las políticas reportan otro primer error: {first_errors}')
+    print(f'same first error: {first_errors.pop()}')
+
+
+# Recuperación de errores de sintaxis: tiempo de parsear hasta el primer
+# error y de recuperarse de todos (los errores y el AST recuperado se
+# prueban en tests/test_recovery.py).
+def bench_syntax_recovery(args):
+    from lexer import build_lexer
+    from parser import build_parser, parse_program, ParseError
+    parser = build_parser()
+    n = args.size // 4
+    data = gen_syntax_errors(n)
+    samples = []
+    for _ in range(args.repeat):
+        lexer = build_lexer()
+        lexer.input(data)
+        start = time.perf_counter()
+        try:
+            parse_program(lexer, parser)
+        except ParseError as e:
+            first_error = str(e)
+        samples.append(time.perf_counter() - start)
+    print(f'stop-first {n} statements  best {min(samples) * 1000:8.1f} ms  {first_error}')
+
+    samples = []
+    for _ in range(args.repeat):
+        lexer = build_lexer()
+        lexer.input(data)
+        start = time.perf_counter()
+        ast, errors = parse_program(lexer, parser, recover=True)
+        samples.append(time.perf_counter() - start)
+    print(f'recover    {n} statements  best {min(samples) * 1000:8.1f} ms  {len(errors)} errors')
+
+
+# Programas chicos de todos los tipos de resultado, con las opciones de
+# compile_source con que se compilan en el escenario threads (y en
+# tests/test_compiler.py).
+def thread_jobs():
+    from diagnostics import COLLECT_ALL
+    return [
+        (SMALL_PROGRAM, {}),
+        (gen_expressions(20), {}),
+        (gen_expressions(20), {'arena': True}),
+        (gen_while_body(50), {}),
+        (gen_if_guards(20), {'arena': True}),
+        (gen_list_literal(30), {}),
+        (gen_list_literal(30, bad=7), {}),
+        (gen_nested('blocks', 30), {}),
+        (gen_context_errors(40), {}),
+        (gen_context_errors(40), {'errors': COLLECT_ALL}),
+        (gen_context_errors(40), {'errors': COLLECT_ALL, 'arena': True}),
+        (gen_syntax_errors(40), {}),
+        (gen_syntax_errors(40), {'recover': True}),
+        (gen_mixed(20, with_errors=True), {}),
+        (gen_mixed(20), {}),
+    ]
+
+
+def _outcome(result):
+    return result.status, result.message, str(result.ast) if result.ok else None
+
+
+# Compilación concurrente: tiempo de compilar los mismos programas uno por
+# uno y desde pools de hilos (que den lo mismo se prueba en
+# tests/test_compiler.py). Se acorta el intervalo de cambio de hilo para que
+# se intercalen lo más posible. Como contraste, se cuentan los resultados
+# distintos con el lexer y el parser compartidos (compile_with), que no es
+# seguro entre hilos.
+def bench_threads(args):
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from compiler import compile_source, compile_with
+    from lexer import get_lexer
+    from parser import get_parser
+    programs = thread_jobs()
+    jobs = list(range(len(programs))) * max(1, args.size // 10000)
+    random.Random(0).shuffle(jobs)
+
+    def run_isolated(i):
+        text, options = programs[i]
+        return _outcome(compile_source(text, **options))
+
+    def run_shared(i):
+        text, options = programs[i]
+        try:
+            return _outcome(compile_with(text, get_lexer(), get_parser()))
+        except Exception as e:
+            return ('exception', repr(e), None)
+
+    start = time.perf_counter()
+    for i in jobs:
+        run_isolated(i)
+    sequential = time.perf_counter() - start
+    print(f'sequential   {len(jobs)} compilations  {sequential * 1000:8.1f} ms')
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        for threads in (2, 8, 32):
+            with ThreadPoolExecutor(threads) as pool:
+                start = time.perf_counter()
+                list(pool.map(run_isolated, jobs))
+                elapsed = time.perf_counter() - start
+            print(f'{threads:2d} threads   {len(jobs)} compilations  {elapsed * 1000:8.1f} ms')
+
+        # Sin opciones: lo que da compile_with con un lexer y parser propios.
+        shared_expected = [_outcome(compile_source(text)) for text, _ in programs]
+        with ThreadPoolExecutor(8) as pool:
+            outcomes = list(pool.map(run_shared, jobs))
+        wrong = sum(outcome != shared_expected[i] for i, outcome in zip(jobs, outcomes))
+        print(f'shared lexer/parser, 8 threads: {wrong} of {len(jobs)} wrong results')
+    finally:
+        sys.setswitchinterval(interval)
+
+
+# Compilación incremental (incremental.Session): latencia de una edición en
+# un programa grande contra la de compilarlo de nuevo. Que el resultado sea
+# el de compilar el texto completo se prueba en tests/test_incremental.py.
+def bench_incremental(args):
+    from compiler import compile_source
+    from incremental import Session
+    text = gen_editing(max(10, args.size // 20))
+    lines = text.count('\n')
+    samples = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        compile_source(text)
+        samples.append(time.perf_counter() - start)
+    _report(f'full compile, {lines} lines', samples)
+    start = time.perf_counter()
+    session = Session(text)
+    print(f'session start                {(time.perf_counter() - start) * 1000:8.1f} ms')
+    middle = text.index('a := a + ', len(text) // 2) + len('a := a + ')
+    middle_block = text.index('d', text.index('{ int d', len(text) // 2) + 6)
+    cases = [
+        ('digit', middle, middle + 1, '9'),
+        ('type error', middle, middle + 1, 'c'),
+        ('newline', middle, middle, '\n'),
+        ('declaration', middle_block + 1, middle_block + 1, 'x'),
+    ]
+    count = max(20, args.repeat * 20)
+    for label, begin, end, new in cases:
+        old = session.text[begin:end]
+        samples = []
+        reparsed = 0
+        full_runs = session.full_runs
+        for _ in range(count):
+            start = time.perf_counter()
+            session.edit(begin, end, new)
+            samples.append(time.perf_counter() - start)
+            reparsed = max(reparsed, session.reparsed)
+            session.edit(begin, begin + len(new), old)
+        samples.sort()
+        print(f'edit: {label:<12} median {statistics.median(samples) * 1000:8.2f} ms'
+              f'   p99 {samples[max(0, int(len(samples) * 0.99) - 1)] * 1000:8.2f} ms'
+              f'   reparsed <= {reparsed} chars  full runs {session.full_runs - full_runs}')
+    start = time.perf_counter()
+    session.update_positions()
+    print(f'update_positions             {(time.perf_counter() - start) * 1000:8.1f} ms')
+
+
+# Salida y error de ejecución (o None) de correr `run`, que recibe la salida.
+def _run_outcome(run):
+    from evaluator import ExecutionError
+    out = io.StringIO()
+    try:
+        run(out)
+    except ExecutionError as e:
+        return out.getvalue(), str(e.args[0])
+    return out.getvalue(), None
+
+
+# Evaluador por clausuras (evaluator.compile_program) contra el intérprete
+# recursivo de referencia: tiempo en programas con muchas iteraciones. Que
+# den la misma salida se prueba en tests/test_backends.py.
+def bench_run(args):
+    from compiler import compile_source
+    from evaluator import compile_program, Interpreter
+    for label, text in (('loops', gen_loops(max(1, args.size // 1000))),
+                        ('sieve', gen_sieve(max(10, args.size // 20)))):
+        result = compile_source(text)
+        timings = {}
+        for name, run in (('interpreter', lambda out: Interpreter(out).run(result.ast)),
+                          ('closures', lambda out: compile_program(result.ast).run(out))):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _run_outcome(run)
+                samples.append(time.perf_counter() - start)
+            timings[name] = statistics.median(samples)
+            _report(f'{label}: {name}', samples)
+        start = time.perf_counter()
+        compile_program(result.ast)
+        print(f'{label}: compile_program        {(time.perf_counter() - start) * 1000:8.2f} ms'
+              f'   speedup {timings["interpreter"] / timings["closures"]:.1f}x')
+
+
+# Backends de ejecución: nombre -> función que prepara el AST chequeado y
+# devuelve run(out).
+def _backends():
+    import vm
+    import codegen
+    from evaluator import compile_program, Interpreter
+
+    def bytecode(ast):
+        code = vm.compile_ast(ast)
+        return lambda out: vm.execute(code, out)
+    return {
+        'interpreter': lambda ast: lambda out: Interpreter(out).run(ast),
+        'closures': lambda ast: compile_program(ast).run,
+        'vm': bytecode,
+        'python': lambda ast: codegen.compile_ast(ast).run,
+    }
+
+
+# Máquina de pila (vm.py) contra los demás backends: tiempo de ejecución en
+# programas con muchas iteraciones y tiempo de `python vm.py` con y sin el
+# .imperatc. Que den la misma salida y el manejo del .imperatc se prueban en
+# tests/test_backends.py y tests/test_vm.py.
+def bench_vm(args):
+    from compiler import compile_source
+    backends = _backends()
+    for label, text in (('loops', gen_loops(max(1, args.size // 1000))),
+                        ('sieve', gen_sieve(max(10, args.size // 20)))):
+        result = compile_source(text)
+        for name, prepare in backends.items():
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _run_outcome(prepare(result.ast))
+                samples.append(time.perf_counter() - start)
+            _report(f'{label}: {name}', samples)
+
+    # Un programa donde pesa el front-end: el .imperatc evita lexear,
+    # parsear y chequear.
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'prog.imperat')
+        with open(path, 'w') as file:
+            file.write(gen_assignments(max(10, args.size // 20)))
+        runs = (('parse.py --run', ['parse.py', '--run', path]),
+                ('vm.py --no-cache', ['vm.py', '--no-cache', path]),
+                ('vm.py (writes cache)', ['vm.py', path]),
+                ('vm.py (cached)', ['vm.py', path]))
+        for label, command in runs:
+            samples = []
+            for _ in range(args.repeat if label.endswith('(cached)') else 1):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, *command], cwd=HERE, check=True,
+                               stdout=subprocess.DEVNULL)
+                samples.append(time.perf_counter() - start)
+            _report(label, samples)
+
+
+# Código de Python generado (codegen.py) contra los demás backends: tiempo
+# de ejecución y costo de la traducción (generar y compilar contra armar las
+# clausuras). Que den la misma salida se prueba en tests/test_backends.py.
+def bench_codegen(args):
+    import codegen
+    from compiler import compile_source
+    from evaluator import compile_program
+    backends = _backends()
+    del backends['interpreter']
+    for label, text in (('loops', gen_loops(max(1, args.size // 1000))),
+                        ('sieve', gen_sieve(max(10, args.size // 20)))):
+        result = compile_source(text)
+        for name, prepare in backends.items():
+            run = prepare(result.ast)
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                _run_outcome(run)
+                samples.append(time.perf_counter() - start)
+            _report(f'{label}: {name}', samples)
+
+    result = compile_source(gen_assignments(max(10, args.size // 20)))
+    for label, prepare in (('translate: closures', compile_program),
+                           ('translate: python', codegen.compile_ast)):
+        samples = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            prepare(result.ast)
+            samples.append(time.perf_counter() - start)
+        _report(label, samples)
+
+
+# Servidor de compilación contra un proceso por archivo: latencia de un
+# pedido a la vez (ida y vuelta por el socket) y throughput con muchos pedidos
+# en una sola conexión. Al final, las métricas que reporta el servidor.
+def bench_server(args):
+    import json
+    import signal
+    import socket
+    from server import send_requests
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'server.sock')
+        small = os.path.join(tmp, 'small.imperat')
+        with open(small, 'w') as file:
+            file.write(SMALL_PROGRAM)
+        spawn = []
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, 'parse.py', small], cwd=HERE, check=True,
+                           stdout=subprocess.DEVNULL)
+            spawn.append(time.perf_counter() - start)
+        _report('parse.py process per file', spawn)
+
+        process = subprocess.Popen([sys.executable, 'server.py', '--socket', socket_path, '-j', '2'],
+                                   cwd=HERE)
+        try:
+            while not os.path.exists(socket_path):
+                if process.poll() is not None:
+                    raise SystemExit('el servidor terminó al arrancar')
+                time.sleep(0.05)
+            for label, text in (('small program', SMALL_PROGRAM),
+                                ('1000 assignments', gen_assignments(1000))):
+                with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+                    conn.connect(socket_path)
+                    replies = conn.makefile('rb')
+                    samples = []
+                    line = json.dumps({'source': text}).encode('utf-8') + b'\n'
+                    for _ in range(args.repeat * 20):
+                        start = time.perf_counter()
+                        conn.sendall(line)
+                        if json.loads(replies.readline())['status'] != 'ok':
+                            raise SystemExit('el servidor no compiló el programa')
+                        samples.append(time.perf_counter() - start)
+                _report(f'server round trip, {label}', samples)
+
+            count = max(100, args.size // 100)
+            start = time.perf_counter()
+            responses = send_requests([{'source': SMALL_PROGRAM}] * count, socket_path)
+            elapsed = time.perf_counter() - start
+            if any(response['status'] != 'ok' for response in responses):
+                raise SystemExit('el servidor no compiló el programa')
+            print(f'pipelined: {count} requests in {elapsed * 1000:.1f} ms '
+                  f'({count / elapsed:.0f} requests/s)')
+            metrics = send_requests([{'op': 'metrics'}], socket_path)[0]['metrics']
+            print('server metrics:', json.dumps(metrics))
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+
+# Resultados de un batch sin el tiempo de cada archivo, para compararlos.
+def _batch_results(paths, **options):
+    import io
+    import json
+    from parse import run_batch
+    out = io.StringIO()
+    start = time.perf_counter()
+    run_batch(paths, out=out, **options)
+    elapsed = time.perf_counter() - start
+    results = [json.loads(line) for line in out.getvalue().splitlines()]
+    for result in results:
+        del result['time']
+    return results, elapsed
+
+
+# Caché de resultados: un batch sin caché, con la caché vacía y con la caché
+# llena; varios procesos a la vez sobre una caché chica que obliga a
+# desalojar (los resultados y los contadores se prueban en
+# tests/test_result_cache.py); y un archivo grande con
+# parse.py en un proceso nuevo, con y sin acierto. El archivo grande es el
+# cuerpo de un while: la impresión de un bloque largo crece con el cuadrado
+# de sus sentencias y el acierto mediría solo la copia de la salida.
+def bench_result_cache(args):
+    from result_cache import ResultCache
+    count = max(20, args.size // 1000)
+    with tempfile.TemporaryDirectory() as tmp:
+        programs = os.path.join(tmp, 'programs')
+        os.makedirs(programs)
+        for i in range(count):
+            if i % 4 == 0:
+                text = gen_context_errors(20 + i)
+            elif i % 4 == 1:
+                text = gen_syntax_errors(20 + i)
+            else:
+                text = gen_expressions(5 + i % 40)
+            with open(os.path.join(programs, f'p{i:04d}.imperat'), 'w') as file:
+                file.write(text)
+
+        _, elapsed = _batch_results([programs], jobs=1)
+        print(f'batch, no cache       {count} files  {elapsed * 1000:8.1f} ms')
+        cache = ResultCache(os.path.join(tmp, 'cache'))
+        for label in ('cold cache', 'warm cache'):
+            _, elapsed = _batch_results([programs], jobs=1, cache=(cache.directory, cache.max_bytes))
+            print(f'batch, {label:<14} {count} files  {elapsed * 1000:8.1f} ms')
+        stats = cache.stats()
+        print('stats:', stats)
+
+        # Entra un tercio de los resultados. Una pasada por todos los archivos
+        # desaloja (en LRU un recorrido cíclico más grande que la caché nunca
+        # acierta); después un grupo chico que entra se repite y acierta.
+        small = ResultCache(os.path.join(tmp, 'small'), max_bytes=stats['bytes'] // 3)
+        hot = sorted(os.path.join(programs, name) for name in os.listdir(programs))[:count // 8]
+        rounds = [[programs], hot, hot]
+        start = time.perf_counter()
+        for paths in rounds:
+            _batch_results(paths, jobs=4, cache=(small.directory, small.max_bytes))
+        elapsed = time.perf_counter() - start
+        print(f'4 processes, {small.max_bytes} byte cache  {len(rounds)} rounds  {elapsed * 1000:8.1f} ms')
+        print('stats:', small.stats())
+
+        big = os.path.join(tmp, 'big.imperat')
+        with open(big, 'w') as file:
+            file.write(gen_expressions(args.size // 20))
+        run = [sys.executable, 'parse.py', big]
+        cached = run + ['--cache', '--cache-dir', cache.directory]
+        subprocess.run(cached, cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+        for label, command in (('parse.py, no cache', run), ('parse.py --cache, hit', cached)):
+            samples = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                subprocess.run(command, cwd=HERE, check=True, stdout=subprocess.DEVNULL)
+                samples.append(time.perf_counter() - start)
+            _report(label, samples)
+
+
+# Impresión del AST: programas grandes escritos a /dev/null y un AST muy
+# profundo (una cadena de `!`) que no cabe en la pila de Python. Se usa el
+# cuerpo de un while, que es un único Sequencing plano: en un bloque las
+# sentencias forman una cadena de Sequencing y la salida misma crece con el
+# cuadrado de la profundidad. Los AST se imprimen sin decorar.
+def bench_print(args):
+    from ast_nodes import write_ast, Not, Ident
+    from parser import build_parser
+    from lexer import build_lexer
+    parser = build_parser()
+    with open(os.devnull, 'w') as out:
+        for n in (10000, 40000, 160000):
+            lexer = build_lexer()
+            lexer.input(gen_while_body(n))
+            ast = parser.parse(lexer=lexer)
+            start = time.perf_counter()
+            write_ast(ast, out)
+            elapsed = time.perf_counter() - start
+            print(f'{n:>7} statements  {elapsed * 1000:8.1f} ms  {elapsed / n * 1e6:6.2f} us/statement')
+
+        depth = sys.getrecursionlimit() * 20
+        node = Ident('a', 1, 1)
+        for _ in range(depth):
+            parent = Not()
+            parent.add_child(node)
+            node = parent
+        start = time.perf_counter()
+        write_ast(node, out)
+        print(f'{depth:>7} nested nodes {(time.perf_counter() - start) * 1000:8.1f} ms')
+
+
+# Cuenta los nodos de un AST sin recursión.
+def _count_nodes(ast):
+    from ast_nodes import ASTNode
+    count = 0
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        count += 1
+        stack.extend(child for child in node.children if isinstance(child, ASTNode))
+    return count
+
+
+# Memoria del AST: bytes por nodo (incluye las listas de hijos y los valores)
+# al parsear programas generados, medida con tracemalloc.
+def bench_ast_memory(args):
+    import tracemalloc
+    from parser import build_parser
+    from lexer import build_lexer
+    parser = build_parser()
+    for label, data in (('assignments', gen_assignments(args.size // 4)),
+                        ('mixed', gen_mixed(args.size // 40))):
+        lexer = build_lexer()
+        lexer.input(data)
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        ast = parser.parse(lexer=lexer)
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        nodes = _count_nodes(ast)
+        print(f'{label:<12} {nodes:>9} nodes  {used / 2 ** 20:8.1f} MiB  {used / nodes:6.1f} bytes/node')
+
+
+# AST de objetos vs. AST en arena (ast_arena.py) sobre el mismo programa.
+# Primero se mide la memoria con tracemalloc (después de parsear y el pico
+# durante el chequeo de tipos) y luego, sin tracemalloc, los tiempos. La
+# salida impresa debe ser idéntica.
+def bench_arena(args):
+    import hashlib
+    import tracemalloc
+    from ast_arena import parse_to_arena
+    from ast_nodes import write_ast
+    from parser import build_parser
+    from lexer import build_lexer
+    from type_checker import TypeChecker
+
+    # Hash de la salida impresa, sin guardarla completa en memoria.
+    class HashWriter:
+        def __init__(self):
+            self.digest = hashlib.sha1()
+
+        def write(self, text):
+            self.digest.update(text.encode('utf-8'))
+
+    parser = build_parser()
+    data = gen_while_body(args.size)
+    digests = {}
+    for label, parse in (('objects', lambda lexer: parser.parse(lexer=lexer)),
+                         ('arena', lambda lexer: parse_to_arena(parser, lexer))):
+        lexer = build_lexer()
+        lexer.input(data)
+        tracemalloc.start()
+        ast = parse(lexer)
+        parsed = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        TypeChecker().check_program(ast)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        nodes = _count_nodes(ast)
+        del ast
+
+        lexer.input(data)
+        start = time.perf_counter()
+        ast = parse(lexer)
+        parse_time = time.perf_counter() - start
+        start = time.perf_counter()
+        TypeChecker().check_program(ast)
+        check_time = time.perf_counter() - start
+        writer = HashWriter()
+        write_ast(ast, writer)
+        digests[label] = writer.digest.hexdigest()
+        del ast
+        print(f'{label:<8} {nodes:>9} nodes  {parsed / nodes:6.1f} bytes/node'
+              f'  check peak {peak / 2 ** 20:7.1f} MiB  parse {parse_time:6.2f} s'
+              f'  check {check_time:6.2f} s')
+    if digests['objects'] != digests['arena']:
+        raise SystemExit('el AST en arena imprime otra salida')
+    print('same decorated AST output')
+
+
+# Costo del type checker por nodo visitado en programas con muchas
+# expresiones. El tiempo incluye recorrer el árbol y despachar cada nodo.
+def bench_dispatch(args):
+    from parser import build_parser
+    from lexer import build_lexer
+    from type_checker import TypeChecker
+    parser = build_parser()
+    lexer = build_lexer()
+    lexer.input(gen_expressions(args.size // 10))
+    ast = parser.parse(lexer=lexer)
+    nodes = _count_nodes(ast)
+    samples = []
+    for _ in range(args.repeat):
+        # El chequeo cambia el AST (tipos, Plus -> Concat), pero volver a
+        # chequearlo recorre los mismos nodos.
+        start = time.perf_counter()
+        TypeChecker().check_program(ast)
+        samples.append(time.perf_counter() - start)
+    best = min(samples)
+    print(f'{nodes} nodes  best {best * 1000:8.1f} ms  {best / nodes * 1e9:6.0f} ns/node')
+
+
+# Código que lexea un archivo en un proceso nuevo e imprime el pico de RSS.
+_RSS_PROBE = """
+import resource, sys, time
+from lexer import build_lexer, stream_tokens
+mode, filename = sys.argv[1], sys.argv[2]
+start = time.perf_counter()
+count = 0
+if mode == 'read':
+    lexer = build_lexer()
+    with open(filename) as file:
+        lexer.input(file.read())
+    for _ in lexer:
+        count += 1
+else:
+    for _ in stream_tokens(filename):
+        count += 1
+print(count, time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+# Lexeo de un archivo grande leyéndolo completo vs. mapeado en memoria.
+def bench_mmap(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        filename = os.path.join(tmp, 'big.imperat')
+        # El archivo se genera en otro proceso: ru_maxrss se hereda al hacer
+        # fork, así que este proceso debe mantenerse pequeño.
+        with open(filename, 'w') as file:
+            subprocess.run([sys.executable, '-c', 'import sys, benchmark; '
+                            f'sys.stdout.write(benchmark.gen_assignments({args.size}))'],
+                           cwd=HERE, check=True, stdout=file)
+        size_mb = os.path.getsize(filename) / 2 ** 20
+        print(f'input: {args.size} statements, {size_mb:.1f} MiB')
+        for mode in ('read', 'mmap'):
+            result = subprocess.run([sys.executable, '-c', _RSS_PROBE, mode, filename],
+                                    cwd=HERE, check=True, capture_output=True, text=True)
+            count, elapsed, rss_kb = result.stdout.split()
+            print(f'{mode:<5} {count:>10} tokens  {float(elapsed):7.2f} s'
+                  f'  peak RSS {int(rss_kb) / 1024:8.1f} MiB')
+
+
+# Compara el lexer de PLY con el de fast_lexer.py: los tokens y errores
+# deben ser idénticos. Después mide tokens por segundo de cada motor.
+def bench_lexers(args):
+    from lexer import build_lexer
+    inputs = [gen_mixed(50), gen_mixed(50, with_errors=True),
+              gen_unterminated_strings(200), gen_assignments(500), '', '\n\n', '"', 'a\r\nb']
+    for data in inputs:
+        expected = _token_stream(build_lexer('ply'), data)
+        actual = _token_stream(build_lexer('fast'), data)
+        if expected != actual:
+            raise SystemExit(f'los lexers difieren en una entrada de {len(data)} caracteres')
+    print(f'differential check: {len(inputs)} inputs, identical tokens and errors')
+
+    data = gen_mixed(args.size // 10)
+    for engine in ('ply', 'fast'):
+        samples = []
+        for _ in range(args.repeat):
+            lexer = build_lexer(engine)
+            start = time.perf_counter()
+            count = _lex_all_with(lexer, data)
+            samples.append(time.perf_counter() - start)
+        best = min(samples)
+        print(f'{engine:<5} {count:>9} tokens  {best * 1000:8.1f} ms  {count / best / 1e6:6.2f} M tokens/s')
+
+
+# Memoria por token: lista de LexToken de PLY vs. TokenBuffer, medida con
+# tracemalloc. También verifica que el parser dé el mismo AST con ambos.
+def bench_token_memory(args):
+    import tracemalloc
+    from lexer import build_lexer
+    from parser import build_parser
+    from token_buffer import buffer_tokens
+    data = gen_mixed(args.size // 10)
+
+    lexer = build_lexer()
+    lexer.input(data)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    token_list = list(iter(lexer.token, None))
+    list_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    count = len(token_list)
+    del token_list
+
+    lexer = build_lexer()
+    lexer.input(data)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    buffer = buffer_tokens(lexer, data)
+    # line_starts ya existía en el lexer, no se cuenta como parte del buffer
+    buffer_bytes = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(f'{count} tokens')
+    print(f'LexToken list   {list_bytes / count:7.1f} bytes/token')
+    print(f'TokenBuffer     {buffer_bytes / count:7.1f} bytes/token'
+          f'   ({list_bytes / buffer_bytes:.1f}x less)')
+
+    parser = build_parser()
+    small = gen_mixed(20)
+    lexer = build_lexer()
+    lexer.input(small)
+    expected = str(parser.parse(lexer=lexer))
+    lexer.input(small)
+    actual = str(parser.parse(lexer=buffer_tokens(lexer, small).reader()))
+    if expected != actual:
+        raise SystemExit('el parser da otro AST al leer del TokenBuffer')
+    print('parser check: same AST from lexer and from TokenBuffer')
+
+
+SCENARIOS = {
+    'dispatch': bench_dispatch,
+    'arena': bench_arena,
+    'ast-memory': bench_ast_memory,
+    'print': bench_print,
+    'parse-scaling': bench_parse_scaling,
+    'list-literals': bench_list_literals,
+    'deep-check': bench_deep_check,
+    'symbols': bench_symbols,
+    'resolve': bench_resolve,
+    'diagnostics': bench_diagnostics,
+    'syntax-recovery': bench_syntax_recovery,
+    'threads': bench_threads,
+    'incremental': bench_incremental,
+    'run': bench_run,
+    'vm': bench_vm,
+    'codegen': bench_codegen,
+    'server': bench_server,
+    'result-cache': bench_result_cache,
+    'token-memory': bench_token_memory,
+    'lexers': bench_lexers,
+    'mmap': bench_mmap,
+    'columns': bench_columns,
+    'lex-errors': bench_lex_errors,
+    'startup': bench_startup,
+}
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Benchmarks del front-end de GCL')
+    arg_parser.add_argument('scenario', choices=sorted(SCENARIOS))
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    arg_parser.add_argument('--size', type=int, default=200000,
+                            help='tamaño del programa generado (sentencias)')
+    args = arg_parser.parse_args()
+    SCENARIOS[args.scenario](args)
+
+
+if __name__ == '__main__':
+    main()
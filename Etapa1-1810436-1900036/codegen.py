@@ -0,0 +1,452 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Tercer backend de ejecución: el AST chequeado se traduce a código fuente de
+# Python, que se compila con compile() a un objeto código y se ejecuta como
+# una función. Misma semántica que evaluator.py (los errores de ejecución
+# son los mismos ExecutionError).
+#
+# Traducción:
+#   - Cada variable es una variable local de la función, <nombre>_<slot>
+#     (posiciones de resolver.resolve con flatten=True); al entrar a un bloque
+#     se les asigna su valor inicial.
+#   - while es un while de Python; if es una cadena if/elif cuyo else lanza el
+#     error de ninguna guardia verdadera.
+#   - Una variable function[..N] es una lista de N+1 elementos; f.i y f(i:v)
+#     chequean el dominio antes de indexar (un índice negativo no debe
+#     indexar desde el final).
+#   - return termina la función.
+# Las llamadas que lanzan errores de ejecución llevan la línea y la columna
+# del .imperat, y cada sentencia generada tiene un comentario con su
+# posición en el .imperat, así que el código volcado (--dump) se puede leer
+# junto al fuente.
+#
+# Python limita el anidamiento del código que compila (por ejemplo, 20
+# ciclos anidados) y la traducción es recursiva; un programa que se pasa de
+# esos límites se ejecuta con el bytecode de vm.py, que no tiene límite de
+# profundidad.
+#
+# Uso: python codegen.py [--dump] [--fast-lexer] <archivo.imperat>
+import argparse
+import sys
+from itertools import islice
+from ast_nodes import (Declare, Ident, Literal, String, Plus, Minus, Mult, Equal, NotEqual,
+                       Less, Greater, Leq, Geq, And, Or, Not, Comma, TwoPoints, Concat,
+                       WriteFunction)
+from gcl_types import BOOL, STRING, FunctionType
+from resolver import resolve
+import vm
+from evaluator import (ExecutionError, out_of_domain, no_true_guard, too_deep,
+                       string_value, text, function_pairs, flat_statements, _operands)
+
+_OPERATORS = {Plus: '+', Mult: '*', Equal: '==', NotEqual: '!=', Less: '<', Greater: '>',
+              Leq: '<=', Geq: '>=', And: 'and', Or: 'or'}
+
+_INDENT = '    '
+
+# Encabezado de la función generada. Las funciones auxiliares se pasan como
+# valores por defecto para que sean variables locales.
+_HEADER = ('def program(_write, _index=_index, _set=_set, _text=_text,'
+           ' _out_of_domain=_out_of_domain, _no_true_guard=_no_true_guard):')
+
+
+# --- Funciones auxiliares del código generado -------------------------------
+
+def _index(index, size, lineno, col_offset):
+    """Devuelve `index` si está en 0..size-1; si no, lanza el error."""
+    if 0 <= index < size:
+        return index
+    raise out_of_domain(index, size, lineno, col_offset)
+
+def _set(function, index, value):
+    function[index] = value
+    return function
+
+_HELPERS = {'_index': _index, '_set': _set, '_text': text,
+            '_out_of_domain': out_of_domain, '_no_true_guard': no_true_guard}
+
+
+# --- Generación --------------------------------------------------------------
+
+def _name(name, slot):
+    return f'{name}_{slot}'
+
+# Variables declaradas en un bloque: (nombre local, tipo), en orden de slot.
+def _declared(block):
+    variables = []
+    seen = set()
+    for child in block.children:
+        if child.__class__ is not Declare:
+            continue
+        for name in child.names:
+            if name not in seen:
+                seen.add(name)
+                variables.append((_name(name, block.frame_offset + len(variables)), child.var_type))
+    return variables
+
+
+class _Generator:
+    def __init__(self):
+        self.lines = []  # (sangría, texto, nodo con la posición o None)
+        self.depth = 1
+        self.temps = 0
+
+    def emit(self, line, node=None):
+        self.lines.append((self.depth, line, node))
+
+    def temp(self):
+        self.temps += 1
+        return f'_t{self.temps}'
+
+    def statement(self, node):
+        getattr(self, f'statement_{node.__class__.__name__.lower()}')(node)
+
+    def expression(self, node):
+        return getattr(self, f'expression_{node.__class__.__name__.lower()}')(node)
+
+    # Cuerpo sangrado de un while, una guardia o un else.
+    def suite(self, nodes):
+        self.depth += 1
+        start = len(self.lines)
+        for item in flat_statements(nodes):
+            self.statement(item)
+        if len(self.lines) == start:
+            self.emit('pass')
+        self.depth -= 1
+
+    def source(self):
+        lines = [_HEADER]
+        for depth, line, node in self.lines:
+            line = _INDENT * depth + line
+            if node is not None and node.lineno is not None:
+                line += f'  # {node.lineno}:{node.col_offset}'
+            lines.append(line)
+        return '\n'.join(lines) + '\n'
+
+    # --- Sentencias ---
+
+    def statement_block(self, node):
+        for name, var_type in _declared(node):
+            if isinstance(var_type, FunctionType):
+                self.emit(f'{name} = [0] * {var_type.bound + 1}')
+            else:
+                self.emit(f'{name} = {False if var_type is BOOL else 0}')
+        for item in flat_statements([child for child in node.children
+                                     if child.__class__ is not Declare]):
+            self.statement(item)
+
+    def statement_asig(self, node):
+        target, expr = node.children
+        name = _name(target.name, target.slot)
+        if isinstance(target.type, FunctionType):
+            self._assign_function(node, name, target, expr)
+            return
+        # x := x + c y x := x - c
+        if expr.__class__ in (Plus, Minus) and len(expr.children) == 2:
+            left, right = expr.children
+            if left.__class__ is Ident and left.slot == target.slot and right.__class__ is Literal:
+                self.emit(f'{name} {"+" if expr.__class__ is Plus else "-"}= {right.value!r}', node)
+                return
+        self.emit(f'{name} = {self.expression(expr)}', node)
+
+    # Como en evaluator, cada variable función tiene su propia lista: así
+    # f := f(i:v) la modifica en su lugar.
+    def _assign_function(self, node, name, target, expr):
+        size = target.type.bound + 1
+        cls = expr.__class__
+        if cls is Literal:
+            self.emit(f'{name} = [{expr.value!r}] * {size}', node)
+            return
+        if cls is Ident:
+            self.emit(f'{name} = {_name(expr.name, expr.slot)}[:]', node)
+            return
+        if cls is WriteFunction:
+            func, args = expr.children
+            pairs = function_pairs(args)
+            if func.__class__ is Ident and func.slot == target.slot and len(pairs) == 1:
+                pair = pairs[0]
+                key, value = pair.children
+                if key.__class__ is Literal and 0 <= key.value < size:
+                    self.emit(f'{name}[{key.value!r}] = {self.expression(value)}', node)
+                    return
+                # La clave se evalúa y se chequea antes que el valor.
+                if key.__class__ is Ident:
+                    index = _name(key.name, key.slot)
+                else:
+                    index = self.temp()
+                    self.emit(f'{index} = {self.expression(key)}', node)
+                self.emit(f'if not 0 <= {index} < {size}: '
+                          f'raise _out_of_domain({index}, {size}, {pair.lineno}, {pair.col_offset})')
+                self.emit(f'{name}[{index}] = {self.expression(value)}', node)
+                return
+        self.emit(f'{name} = {self.expression(expr)}', node)  # Siempre una lista nueva
+
+    def statement_if(self, node):
+        keyword = 'if'
+        for guard in node.children:
+            self.emit(f'{keyword} {self.expression(guard.children[0])}:', guard)
+            self.suite(islice(guard.children, 1, None))
+            keyword = 'elif'
+        first = node.children[0]
+        self.emit('else:')
+        self.depth += 1
+        self.emit(f'raise _no_true_guard({first.lineno}, {first.col_offset})')
+        self.depth -= 1
+
+    def statement_while(self, node):
+        then = node.children[0]
+        self.emit(f'while {self.expression(then.children[0])}:', node)
+        self.suite(islice(then.children, 1, None))
+
+    def statement_print(self, node):
+        parts = self.text_parts(node.children[0])
+        parts.append('\n')
+        self.emit(f'_write({self.join(parts)})', node)
+
+    def statement_return(self, node):
+        self.emit(self.expression(node.children[0]), node)
+        self.emit('return')
+
+    def statement_sequencing(self, node):
+        for item in flat_statements([node]):
+            self.statement(item)
+
+    def statement_skip(self, node):
+        pass
+
+    # --- Expresiones ---
+    # Devuelven el texto de una expresión de Python, entre paréntesis si no
+    # es atómica.
+
+    def expression_ident(self, node):
+        return _name(node.name, node.slot)
+
+    def expression_literal(self, node):
+        value = node.value
+        return repr(value) if value.__class__ is bool or value >= 0 else f'({value!r})'
+
+    def expression_string(self, node):
+        return repr(string_value(node.value))
+
+    # Cadenas de operaciones asociativas (a + b + c, a and b and c) sin
+    # paréntesis intermedios: Python limita cuántos puede anidar.
+    def _chain(self, node):
+        operator = f' {_OPERATORS[node.__class__]} '
+        return f'({operator.join(self.expression(operand) for operand in _operands(node))})'
+
+    expression_plus = expression_mult = expression_and = expression_or = _chain
+
+    def _binary(self, node):
+        left, right = node.children
+        return f'({self.expression(left)} {_OPERATORS[node.__class__]} {self.expression(right)})'
+
+    expression_equal = expression_notequal = _binary
+    expression_less = expression_greater = expression_leq = expression_geq = _binary
+
+    def expression_minus(self, node):
+        if len(node.children) == 2:
+            # a - b - c se anida a la izquierda
+            operands = []
+            while node.__class__ is Minus and len(node.children) == 2:
+                operands.append(node.children[1])
+                node = node.children[0]
+            operands.append(node)
+            return f'({" - ".join(self.expression(operand) for operand in reversed(operands))})'
+        negations = 0
+        while node.__class__ is Minus and len(node.children) == 1:
+            negations += 1
+            node = node.children[0]
+        operand = self.expression(node)
+        return operand if negations % 2 == 0 else f'(-{operand})'
+
+    def expression_not(self, node):
+        negations = 0
+        while node.__class__ is Not:
+            negations += 1
+            node = node.children[0]
+        operand = self.expression(node)
+        return operand if negations % 2 == 0 else f'(not {operand})'
+
+    def expression_comma(self, node):
+        elements = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Comma:
+                stack.extend(reversed(item.children))
+            else:
+                elements.append(item)
+        return f'[{", ".join(self.expression(element) for element in elements)}]'
+
+    def expression_twopoints(self, node):
+        key, value = node.children
+        return f'[{self.expression(key)}, {self.expression(value)}]'
+
+    def expression_readfunction(self, node):
+        func, index = node.children
+        size = func.type.bound + 1
+        check = f'{size}, {node.lineno}, {node.col_offset})'
+        if func.__class__ is not Ident:
+            return f'{self.expression(func)}[_index({self.expression(index)}, {check}]'
+        name = _name(func.name, func.slot)
+        if index.__class__ is Literal:
+            if 0 <= index.value < size:
+                return f'{name}[{index.value!r}]'
+            return f'_index({self.expression(index)}, {check}'
+        if index.__class__ is Ident:
+            position = bound = _name(index.name, index.slot)
+        else:
+            position = self.temp()
+            bound = f'({position} := {self.expression(index)})'
+        return f'({name}[{position}] if 0 <= {bound} < {size} else _index({position}, {check})'
+
+    def expression_writefunction(self, node):
+        func, args = node.children
+        size = func.type.bound + 1 if isinstance(func.type, FunctionType) else func.type.length
+        # Solo una variable hay que copiarla: las demás expresiones ya
+        # devuelven una lista nueva. Los argumentos de _set se evalúan en
+        # orden: la función, la clave (y su chequeo) y el valor.
+        function = self.expression(func)
+        if func.__class__ is Ident:
+            function += '[:]'
+        for pair in function_pairs(args):
+            key, value = (self.expression(child) for child in pair.children)
+            function = (f'_set({function}, _index({key}, {size}, {pair.lineno}, {pair.col_offset}),'
+                        f' {value})')
+        return function
+
+    def expression_concat(self, node):
+        return self.join(self.text_parts(node))
+
+    # Partes del texto de `node`: str para las constantes (convertidas a
+    # texto al generar, como en evaluator) y código para las demás.
+    def text_parts(self, node):
+        parts = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Concat:
+                stack.extend(reversed(item.children))
+            elif item.__class__ in (Literal, String):
+                parts.append(text(item.value) if item.__class__ is Literal
+                             else string_value(item.value))
+            else:
+                parts.append(_Code(self.as_text(item)))
+        return parts
+
+    def join(self, parts):
+        merged = []
+        for part in parts:
+            if merged and part.__class__ is str and merged[-1].__class__ is str:
+                merged[-1] += part
+            else:
+                merged.append(part)
+        codes = [part.code if part.__class__ is _Code else repr(part) for part in merged]
+        if len(codes) == 1:
+            return codes[0]
+        if len(codes) == 2:
+            return f'({codes[0]} + {codes[1]})'
+        return f"''.join(({', '.join(codes)}))"
+
+    # Código del valor de `node` como texto.
+    def as_text(self, node):
+        value = self.expression(node)
+        if node.type is STRING:
+            return value
+        if node.type is BOOL:
+            return f"('true' if {value} else 'false')"
+        if node.__class__ in (Comma, TwoPoints, WriteFunction) or isinstance(node.type, FunctionType):
+            return f'_text({value})'
+        return f'str({value})'
+
+
+# Parte no constante de un texto.
+class _Code:
+    __slots__ = ('code',)
+
+    def __init__(self, code):
+        self.code = code
+
+
+# --- Programas ---------------------------------------------------------------
+
+# Programa compilado: el código fuente generado y la función que lo ejecuta.
+class Program:
+    __slots__ = ('source', 'function')
+
+    def __init__(self, source, function):
+        self.source = source
+        self.function = function
+
+    def run(self, out=None):
+        """Ejecuta el programa; print escribe en `out` (por defecto sys.stdout)."""
+        self.function((out if out is not None else sys.stdout).write)
+
+
+def _generate(ast):
+    resolve(ast, flatten=True)
+    generator = _Generator()
+    generator.statement(ast)
+    return generator.source()
+
+def generate(ast):
+    """Código fuente de Python del AST decorado de un programa sin errores."""
+    try:
+        return _generate(ast)
+    except RecursionError:
+        raise too_deep() from None
+
+def compile_ast(ast, filename='<imperat>'):
+    """
+    Genera y compila el AST decorado de un programa sin errores a un Program
+    (o a un vm.Code si es más profundo de lo que admiten la traducción o el
+    compilador de Python).
+    """
+    try:
+        source = _generate(ast)
+        code = compile(source, filename, 'exec')
+    except (SyntaxError, RecursionError, MemoryError):
+        return vm.compile_ast(ast)
+    namespace = dict(_HELPERS)
+    exec(code, namespace)
+    return Program(source, namespace['program'])
+
+def run_program(ast, out=None):
+    """Compila y ejecuta el programa `ast`. Lanza ExecutionError."""
+    compile_ast(ast).run(out)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        usage="python codegen.py [--dump] [--fast-lexer] <filename.imperat>")
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--dump', action='store_true',
+                            help='imprime el código de Python generado en lugar de ejecutarlo')
+    arg_parser.add_argument('--fast-lexer', action='store_true',
+                            help='usa el lexer de fast_lexer.py en lugar del de PLY')
+    args = arg_parser.parse_args()
+
+    if not args.file.endswith('.imperat'):
+        print("Error: El archivo debe tener extensión .imperat")
+        sys.exit(1)
+    try:
+        with open(args.file, 'r') as file:
+            data = file.read()
+    except OSError:
+        print(f"Error: No se pudo abrir el archivo {args.file}")
+        sys.exit(1)
+    from compiler import compile_source
+    result = compile_source(data, engine='fast' if args.fast_lexer else 'ply')
+    if not result.ok:
+        print(result.message)
+        sys.exit(1)
+    try:
+        if args.dump:
+            sys.stdout.write(generate(result.ast))
+            return
+        compile_ast(result.ast, args.file).run()
+    except ExecutionError as e:
+        sys.stdout.flush()
+        print(e.args[0])
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
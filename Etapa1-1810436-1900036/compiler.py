@@ -0,0 +1,120 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Compilación de un programa como una llamada que devuelve un valor: el
+# estado (lexical, syntax, context, ok), los errores como Diagnostic y el AST
+# decorado. compile_source no comparte estado mutable entre llamadas: cada
+# una usa un clon del lexer y una copia del parser (las tablas LALR y la
+# expresión del lexer sí se comparten, pero solo se leen), así que se puede
+# llamar desde varios hilos a la vez.
+from lexer import get_lexer
+from parser import get_parser, parse_program, ParseError
+from type_checker import TypeChecker
+from diagnostics import Diagnostic, FAIL_FAST
+from ast_nodes import NodeBuilder
+from ast_arena import ArenaBuilder
+
+OK = 'ok'
+LEXICAL = 'lexical'
+SYNTAX = 'syntax'
+CONTEXT = 'context'
+ERROR = 'error'
+
+
+# Resultado de compilar un programa. Si `status` es 'ok', `ast` es el AST
+# decorado y no hay diagnósticos; si no, `diagnostics` tiene los errores que
+# se reportan y `message` es el texto que imprime parse.py. `tokens` es la
+# cantidad de tokens que leyó el parser (solo si se pidió contarlos).
+class Result:
+    __slots__ = ('status', 'ast', 'diagnostics', 'tokens')
+
+    def __init__(self, status, ast=None, diagnostics=(), tokens=None):
+        self.status = status
+        self.ast = ast
+        self.diagnostics = list(diagnostics)
+        self.tokens = tokens
+
+    @property
+    def ok(self):
+        return self.status == OK
+
+    @property
+    def message(self):
+        return '\n'.join(str(diagnostic) for diagnostic in self.diagnostics)
+
+    def __repr__(self):
+        return f'<Result {self.status} {len(self.diagnostics)} diagnostics>'
+
+
+def _failure(status, template, lineno=None, col_offset=None, **fields):
+    return Result(status, diagnostics=[Diagnostic(template, lineno, col_offset, **fields)])
+
+
+def compile_with(data, lexer, parser, builder=None, errors=FAIL_FAST, recover=False,
+                 count_tokens=False):
+    """
+    Compila `data` con `lexer` y `parser`. El lexer queda usado por esta
+    llamada; el parser solo si `builder` es None (si no, se parsea con una
+    copia). `errors` es la política del type checker y `recover` la del
+    parser (ver parser.parse_program). Con `count_tokens` el resultado
+    tiene la cantidad de tokens en `tokens`.
+    """
+    if not data:
+        return _failure(ERROR, "Error: El archivo está vacío")
+
+    try:
+        # Análisis léxico
+        lexer.errors = []
+        lexer.input(data)
+        lexer.lineno = 1
+
+        # Verificar errores léxicos
+        if lexer.errors:
+            line, col, error = sorted(set(lexer.errors), key=lambda x: (x[0], x[1]))[0]
+            return _failure(LEXICAL, "Lexical Error: {error} in row {line}, column {col}",
+                            line, col, error=error)
+
+        # Análisis sintáctico
+        tokenfunc = None
+        tokens = None
+        if count_tokens:
+            tokens = 0
+            read = lexer.token
+
+            def tokenfunc():
+                nonlocal tokens
+                token = read()
+                if token is not None:
+                    tokens += 1
+                return token
+
+        try:
+            ast, syntax_errors = parse_program(lexer, parser, recover, builder, tokenfunc)
+        except ParseError as e:
+            return Result(SYNTAX, diagnostics=[e.args[0]], tokens=tokens)
+        if syntax_errors:
+            return Result(SYNTAX, diagnostics=syntax_errors, tokens=tokens)
+        if ast is None:
+            result = _failure(SYNTAX, "Error: No se pudo generar el AST (posible error de sintaxis)")
+            result.tokens = tokens
+            return result
+        if isinstance(builder, ArenaBuilder):
+            ast = builder.arena.view(ast)
+
+        # Análisis de contexto
+        context_errors = TypeChecker(policy=errors).check_program(ast)
+        if context_errors:
+            return Result(CONTEXT, ast, context_errors, tokens)
+        return Result(OK, ast, tokens=tokens)
+
+    except Exception as e:
+        return _failure(ERROR, "Error inesperado: {error}", error=e)
+
+
+def compile_source(text, errors=FAIL_FAST, recover=False, arena=False, engine='ply',
+                   count_tokens=False):
+    """
+    Compila el programa `text` y devuelve un Result. Cada llamada usa su
+    propio lexer y su propio parser, así que es segura entre hilos.
+    """
+    lexer = get_lexer(engine).clone()
+    builder = ArenaBuilder() if arena else NodeBuilder()
+    return compile_with(text, lexer, get_parser(), builder, errors, recover, count_tokens)
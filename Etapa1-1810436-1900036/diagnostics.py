@@ -0,0 +1,47 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Errores de contexto del type checker.
+#
+# Políticas (qué hace TypeChecker al encontrar un error):
+#   'first'     guarda solo el primero y termina de recorrer el AST.
+#   'fail-fast' se detiene en el primer error.
+#   'all'       recorre todo el programa y guarda todos los errores. Los que
+#               son consecuencia de otro (una expresión que usa un operando
+#               con error, los demás usos de una variable no declarada) no se
+#               reportan.
+FIRST = 'first'
+FAIL_FAST = 'fail-fast'
+COLLECT_ALL = 'all'
+POLICIES = (FIRST, FAIL_FAST, COLLECT_ALL)
+
+
+# Un error con su posición. El mensaje se arma recién cuando se lee (str() o
+# .message): `template` usa {line} y {col} para la posición y los nombres de
+# `fields` para el resto. Se compara igual que su mensaje, también con str.
+class Diagnostic:
+    __slots__ = ('template', 'lineno', 'col_offset', 'fields')
+
+    def __init__(self, template, lineno=None, col_offset=None, **fields):
+        self.template = template
+        self.lineno = lineno
+        self.col_offset = col_offset
+        self.fields = fields
+
+    @property
+    def message(self):
+        return self.template.format(line=self.lineno, col=self.col_offset, **self.fields)
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f'<Diagnostic {self.lineno}:{self.col_offset} {self.message!r}>'
+
+    def __eq__(self, other):
+        if isinstance(other, Diagnostic):
+            other = other.message
+        if isinstance(other, str):
+            return self.message == other
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.message)
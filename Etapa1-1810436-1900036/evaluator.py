@@ -0,0 +1,754 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Ejecución de programas ya chequeados (Result.ok).
+#
+# compile_program recorre el AST decorado una sola vez y traduce cada nodo a
+# una clausura de Python: las expresiones reciben el marco de variables (una
+# lista) y devuelven su valor, las sentencias lo modifican. Las variables se
+# acceden por su posición en el marco (resolver.resolve con flatten=True), la
+# operación de cada nodo se elige al compilar según su clase y su tipo, y las
+# formas más comunes (variable op constante, x := x + c, f := f(i:v)) tienen
+# su propia clausura. Interpreter es un intérprete recursivo directo sobre el
+# AST, que busca las variables por nombre; sirve de referencia (benchmark.py
+# compara las salidas y los tiempos de los dos).
+#
+# Semántica:
+#   - Al entrar a un bloque sus variables valen 0 (int), false (bool) o N+1
+#     ceros (function[..N]).
+#   - if ejecuta la primera guardia verdadera, en orden; si ninguna lo es, es
+#     un error de ejecución. while repite mientras su guardia sea verdadera.
+#   - and y or evalúan de izquierda a derecha y cortan apenas saben el valor.
+#   - Las funciones son valores: f(i:v, ...) es una copia de f con esos
+#     valores (clave, chequeo del dominio y valor de cada par, en orden).
+#     f.i y f(i:v) con i fuera de 0..N son errores de ejecución. a, b, c es la
+#     función 0:a, 1:b, 2:c (las listas entre paréntesis se aplanan) y asignar
+#     un entero a una función le da ese valor en todo el dominio.
+#   - print escribe el valor y un salto de línea: los bool como true/false y
+#     las funciones como 0:v0, 1:v1, ...
+#   - return evalúa su expresión y termina el programa.
+import re
+import sys
+from itertools import islice
+from operator import itemgetter
+from ast_nodes import (Declare, Sequencing, Ident, Literal, String, Plus, Minus, Mult,
+                       Equal, NotEqual, Less, Greater, Leq, Geq, And, Not, Comma, TwoPoints,
+                       Concat, WriteFunction, skip)
+from gcl_types import BOOL, STRING, FunctionType
+from diagnostics import Diagnostic
+from resolver import resolve
+
+_OUT_OF_DOMAIN = "Runtime error: index {index} is out of the domain 0..{bound} at line {line} and column {col}"
+_NO_TRUE_GUARD = "Runtime error: no guard is true at line {line} and column {col}"
+_TOO_DEEP = "Runtime error: the program is nested too deeply to run"
+
+
+# Error de ejecución. args[0] es el Diagnostic.
+class ExecutionError(Exception):
+    pass
+
+# La lanza return para terminar el programa.
+class _Return(Exception):
+    pass
+
+def out_of_domain(index, size, lineno, col_offset):
+    return ExecutionError(Diagnostic(_OUT_OF_DOMAIN, lineno, col_offset, index=index, bound=size - 1))
+
+def no_true_guard(lineno, col_offset):
+    return ExecutionError(Diagnostic(_NO_TRUE_GUARD, lineno, col_offset))
+
+def too_deep():
+    return ExecutionError(Diagnostic(_TOO_DEEP))
+
+
+# --- Valores -----------------------------------------------------------------
+
+_ESCAPE = re.compile(r'\\(.)')
+
+def string_value(text):
+    """Contenido de un String del AST (entre comillas y con escapes)."""
+    return _ESCAPE.sub(lambda m: '\n' if m.group(1) == 'n' else m.group(1), text[1:-1])
+
+def text(value):
+    """Texto de un valor, como lo escriben print y la concatenación."""
+    if value is True:
+        return 'true'
+    if value is False:
+        return 'false'
+    if value.__class__ is list:
+        return ', '.join(f'{index}:{item}' for index, item in enumerate(value))
+    return str(value)
+
+# Valores iniciales de las variables de un bloque: (plantilla del marco,
+# [(slot, tamaño)] de las funciones, que necesitan una lista nueva).
+def block_defaults(block, offset):
+    values = []
+    functions = []
+    seen = set()
+    for child in block.children:
+        if child.__class__ is not Declare:
+            continue
+        for name in child.names:
+            if name in seen:
+                continue
+            seen.add(name)
+            if isinstance(child.var_type, FunctionType):
+                functions.append((offset + len(values), child.var_type.bound + 1))
+                values.append(None)
+            else:
+                values.append(False if child.var_type is BOOL else 0)
+    return values, functions
+
+# Pares clave:valor de los argumentos de una modificación f(...), en orden.
+def function_pairs(args):
+    pairs = []
+    stack = [args]
+    while stack:
+        node = stack.pop()
+        if node.__class__ is TwoPoints:
+            pairs.append(node)
+        else:
+            stack.extend(reversed(node.children))
+    return pairs
+
+# Sentencias de una secuencia (aplanada), en orden y sin los skip. `nodes`
+# puede ser cualquier iterable (los hijos de un nodo del arena no admiten
+# rebanadas).
+def flat_statements(nodes):
+    items = []
+    stack = list(nodes)
+    stack.reverse()
+    while stack:
+        node = stack.pop()
+        if node.__class__ is Sequencing:
+            stack.extend(reversed(node.children))
+        elif node.__class__ is not skip:
+            items.append(node)
+    return items
+
+# Operandos de una cadena de operaciones iguales (a + b + c, a and b and c),
+# de izquierda a derecha.
+def _operands(node):
+    cls = node.__class__
+    operands = []
+    stack = [node]
+    while stack:
+        item = stack.pop()
+        if item.__class__ is cls and len(item.children) == 2:
+            stack.extend(reversed(item.children))
+        else:
+            operands.append(item)
+    return operands
+
+
+# --- Compilación a clausuras -------------------------------------------------
+
+# Clausuras de cada operador binario, según la forma de sus operandos:
+# (general, expresión op constante, variable op constante, variable op variable).
+_BINARY = {
+    Plus: (lambda l, r: lambda f: l(f) + r(f), lambda l, c: lambda f: l(f) + c,
+           lambda s, c: lambda f: f[s] + c, lambda s, t: lambda f: f[s] + f[t]),
+    Minus: (lambda l, r: lambda f: l(f) - r(f), lambda l, c: lambda f: l(f) - c,
+            lambda s, c: lambda f: f[s] - c, lambda s, t: lambda f: f[s] - f[t]),
+    Mult: (lambda l, r: lambda f: l(f) * r(f), lambda l, c: lambda f: l(f) * c,
+           lambda s, c: lambda f: f[s] * c, lambda s, t: lambda f: f[s] * f[t]),
+    Equal: (lambda l, r: lambda f: l(f) == r(f), lambda l, c: lambda f: l(f) == c,
+            lambda s, c: lambda f: f[s] == c, lambda s, t: lambda f: f[s] == f[t]),
+    NotEqual: (lambda l, r: lambda f: l(f) != r(f), lambda l, c: lambda f: l(f) != c,
+               lambda s, c: lambda f: f[s] != c, lambda s, t: lambda f: f[s] != f[t]),
+    Less: (lambda l, r: lambda f: l(f) < r(f), lambda l, c: lambda f: l(f) < c,
+           lambda s, c: lambda f: f[s] < c, lambda s, t: lambda f: f[s] < f[t]),
+    Greater: (lambda l, r: lambda f: l(f) > r(f), lambda l, c: lambda f: l(f) > c,
+              lambda s, c: lambda f: f[s] > c, lambda s, t: lambda f: f[s] > f[t]),
+    Leq: (lambda l, r: lambda f: l(f) <= r(f), lambda l, c: lambda f: l(f) <= c,
+          lambda s, c: lambda f: f[s] <= c, lambda s, t: lambda f: f[s] <= f[t]),
+    Geq: (lambda l, r: lambda f: l(f) >= r(f), lambda l, c: lambda f: l(f) >= c,
+          lambda s, c: lambda f: f[s] >= c, lambda s, t: lambda f: f[s] >= f[t]),
+}
+
+
+def _nothing(frame):
+    pass
+
+# Una sola clausura que ejecuta `items` en orden.
+def _sequence(items):
+    if not items:
+        return _nothing
+    if len(items) == 1:
+        return items[0]
+    if len(items) == 2:
+        first, second = items
+
+        def run(frame):
+            first(frame)
+            second(frame)
+        return run
+    items = tuple(items)
+
+    def run(frame):
+        for item in items:
+            item(frame)
+    return run
+
+
+class _Compiler:
+    # `output` es una lista de un elemento con la función que escribe la
+    # salida de print; Program.run la cambia antes de cada ejecución.
+    def __init__(self, output):
+        self.output = output
+
+    def statement(self, node):
+        return getattr(self, f'statement_{node.__class__.__name__.lower()}')(node)
+
+    def expression(self, node):
+        return getattr(self, f'expression_{node.__class__.__name__.lower()}')(node)
+
+    def body(self, nodes):
+        return _sequence([self.statement(node) for node in flat_statements(nodes)])
+
+    # --- Sentencias ---
+
+    def statement_block(self, node):
+        offset = node.frame_offset
+        values, functions = block_defaults(node, offset)
+        body = self.body([child for child in node.children if child.__class__ is not Declare])
+        if not values:
+            return body
+        end = offset + len(values)
+
+        def run(frame):
+            frame[offset:end] = values
+            for slot, size in functions:
+                frame[slot] = [0] * size
+            body(frame)
+        return run
+
+    def statement_asig(self, node):
+        target, expr = node.children
+        slot = target.slot
+        if isinstance(target.type, FunctionType):
+            return self._assign_function(slot, target.type.bound + 1, expr)
+        # x := x + c y x := x - c
+        if expr.__class__ in (Plus, Minus) and len(expr.children) == 2:
+            left, right = expr.children
+            if left.__class__ is Ident and left.slot == slot and right.__class__ is Literal:
+                step = right.value if expr.__class__ is Plus else -right.value
+
+                def run(frame):
+                    frame[slot] += step
+                return run
+        value = self.expression(expr)
+
+        def run(frame):
+            frame[slot] = value(frame)
+        return run
+
+    # Cada variable función tiene su propia lista: así f := f(i:v) puede
+    # modificarla en su lugar.
+    def _assign_function(self, slot, size, expr):
+        cls = expr.__class__
+        if cls is Literal:
+            fill = expr.value
+
+            def run(frame):
+                frame[slot] = [fill] * size
+            return run
+        if cls is Ident:
+            source = expr.slot
+
+            def run(frame):
+                frame[slot] = frame[source][:]
+            return run
+        if cls is WriteFunction:
+            func, args = expr.children
+            pairs = function_pairs(args)
+            if func.__class__ is Ident and func.slot == slot and len(pairs) == 1:
+                pair = pairs[0]
+                key = self.expression(pair.children[0])
+                value = self.expression(pair.children[1])
+                lineno, col_offset = pair.lineno, pair.col_offset
+
+                def run(frame):
+                    index = key(frame)
+                    if not 0 <= index < size:
+                        raise out_of_domain(index, size, lineno, col_offset)
+                    frame[slot][index] = value(frame)
+                return run
+        value = self.expression(expr)  # Siempre una lista nueva
+
+        def run(frame):
+            frame[slot] = value(frame)
+        return run
+
+    def statement_if(self, node):
+        guards = [(self.expression(guard.children[0]),
+                   self.body(islice(guard.children, 1, None))) for guard in node.children]
+        lineno, col_offset = node.children[0].lineno, node.children[0].col_offset
+        if len(guards) == 1:
+            (cond, body), = guards
+
+            def run(frame):
+                if cond(frame):
+                    body(frame)
+                else:
+                    raise no_true_guard(lineno, col_offset)
+            return run
+        if len(guards) == 2:
+            (cond1, body1), (cond2, body2) = guards
+
+            def run(frame):
+                if cond1(frame):
+                    body1(frame)
+                elif cond2(frame):
+                    body2(frame)
+                else:
+                    raise no_true_guard(lineno, col_offset)
+            return run
+        guards = tuple(guards)
+
+        def run(frame):
+            for cond, body in guards:
+                if cond(frame):
+                    body(frame)
+                    return
+            raise no_true_guard(lineno, col_offset)
+        return run
+
+    def statement_while(self, node):
+        then = node.children[0]
+        cond = self.expression(then.children[0])
+        items = [self.statement(item) for item in flat_statements(islice(then.children, 1, None))]
+        if len(items) <= 1:
+            body = _sequence(items)
+
+            def run(frame):
+                while cond(frame):
+                    body(frame)
+            return run
+        items = tuple(items)
+
+        def run(frame):
+            while cond(frame):
+                for item in items:
+                    item(frame)
+        return run
+
+    def statement_print(self, node):
+        value = self.as_text(node.children[0])
+        output = self.output
+
+        def run(frame):
+            output[0](value(frame) + '\n')
+        return run
+
+    def statement_return(self, node):
+        value = self.expression(node.children[0])
+
+        def run(frame):
+            value(frame)
+            raise _Return()
+        return run
+
+    def statement_sequencing(self, node):
+        return self.body([node])
+
+    def statement_skip(self, node):
+        return _nothing
+
+    # --- Expresiones ---
+
+    def expression_ident(self, node):
+        return itemgetter(node.slot)
+
+    def expression_literal(self, node):
+        value = node.value
+        return lambda frame: value
+
+    def expression_string(self, node):
+        value = string_value(node.value)
+        return lambda frame: value
+
+    def _binary(self, node):
+        general, constant, variable_constant, variables = _BINARY[node.__class__]
+        left, right = node.children
+        if right.__class__ is Literal:
+            if left.__class__ is Ident:
+                return variable_constant(left.slot, right.value)
+            return constant(self.expression(left), right.value)
+        if left.__class__ is Ident and right.__class__ is Ident:
+            return variables(left.slot, right.slot)
+        return general(self.expression(left), self.expression(right))
+
+    # Cadenas largas (a + b + c + ...) como una sola clausura.
+    def _chain(self, node):
+        operands = _operands(node)
+        if len(operands) == 2:
+            return self._binary(node)
+        first, *rest = [self.expression(operand) for operand in operands]
+        if node.__class__ is Plus:
+            def evaluate(frame):
+                total = first(frame)
+                for operand in rest:
+                    total += operand(frame)
+                return total
+        else:
+            def evaluate(frame):
+                total = first(frame)
+                for operand in rest:
+                    total *= operand(frame)
+                return total
+        return evaluate
+
+    expression_plus = expression_mult = _chain
+    expression_equal = expression_notequal = _binary
+    expression_less = expression_greater = expression_leq = expression_geq = _binary
+
+    def expression_minus(self, node):
+        if len(node.children) == 2:
+            return self._binary(node)
+        # -a, --a, ...: solo importa la paridad
+        negations = 0
+        while node.__class__ is Minus and len(node.children) == 1:
+            negations += 1
+            node = node.children[0]
+        operand = self.expression(node)
+        if negations % 2 == 0:
+            return operand
+        return lambda frame: -operand(frame)
+
+    def expression_not(self, node):
+        negations = 0
+        while node.__class__ is Not:
+            negations += 1
+            node = node.children[0]
+        operand = self.expression(node)
+        if negations % 2 == 0:
+            return operand
+        return lambda frame: not operand(frame)
+
+    def _logical(self, node):
+        operands = tuple(self.expression(operand) for operand in _operands(node))
+        if len(operands) == 2:
+            left, right = operands
+            if node.__class__ is And:
+                return lambda frame: left(frame) and right(frame)
+            return lambda frame: left(frame) or right(frame)
+        if node.__class__ is And:
+            def evaluate(frame):
+                for operand in operands:
+                    if not operand(frame):
+                        return False
+                return True
+        else:
+            def evaluate(frame):
+                for operand in operands:
+                    if operand(frame):
+                        return True
+                return False
+        return evaluate
+
+    expression_and = expression_or = _logical
+
+    def expression_comma(self, node):
+        elements = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Comma:
+                stack.extend(reversed(item.children))
+            else:
+                elements.append(item)
+        if all(element.__class__ is Literal for element in elements):
+            values = [element.value for element in elements]
+            return lambda frame: values[:]
+        elements = tuple(self.expression(element) for element in elements)
+        return lambda frame: [element(frame) for element in elements]
+
+    def expression_twopoints(self, node):
+        key, value = (self.expression(child) for child in node.children)
+        return lambda frame: [key(frame), value(frame)]
+
+    def expression_readfunction(self, node):
+        func, index = node.children
+        size = func.type.bound + 1
+        lineno, col_offset = node.lineno, node.col_offset
+        if func.__class__ is Ident and index.__class__ is Literal:
+            slot, position = func.slot, index.value
+            if 0 <= position < size:
+                return lambda frame: frame[slot][position]
+
+            def evaluate(frame):
+                raise out_of_domain(position, size, lineno, col_offset)
+            return evaluate
+        values = self.expression(func)
+        index = self.expression(index)
+
+        def evaluate(frame):
+            function = values(frame)
+            position = index(frame)
+            if 0 <= position < size:
+                return function[position]
+            raise out_of_domain(position, size, lineno, col_offset)
+        return evaluate
+
+    def expression_writefunction(self, node):
+        func, args = node.children
+        size = func.type.bound + 1 if isinstance(func.type, FunctionType) else func.type.length
+        pairs = tuple((self.expression(pair.children[0]), self.expression(pair.children[1]),
+                       pair.lineno, pair.col_offset) for pair in function_pairs(args))
+        source = self.expression(func)
+        # Solo una variable hay que copiarla: las demás expresiones ya
+        # devuelven una lista nueva.
+        copy = func.__class__ is Ident
+
+        def evaluate(frame):
+            function = source(frame)
+            if copy:
+                function = function[:]
+            for key, value, lineno, col_offset in pairs:
+                position = key(frame)
+                if not 0 <= position < size:
+                    raise out_of_domain(position, size, lineno, col_offset)
+                function[position] = value(frame)
+            return function
+        return evaluate
+
+    def expression_concat(self, node):
+        # La cadena de concatenaciones se une de una vez; las partes
+        # constantes se convierten a texto al compilar.
+        parts = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Concat:
+                stack.extend(reversed(item.children))
+            elif item.__class__ in (Literal, String):
+                constant = text(item.value) if item.__class__ is Literal else string_value(item.value)
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += constant
+                else:
+                    parts.append(constant)
+            else:
+                parts.append(self.as_text(item))
+        if len(parts) == 1 and isinstance(parts[0], str):
+            constant = parts[0]
+            return lambda frame: constant
+        parts = tuple((lambda frame, part=part: part) if isinstance(part, str) else part
+                      for part in parts)
+        return lambda frame: ''.join([part(frame) for part in parts])
+
+    # Clausura que devuelve el valor de `node` como texto.
+    def as_text(self, node):
+        value = self.expression(node)
+        if node.type is STRING:
+            return value
+        if node.type is BOOL:
+            return lambda frame: 'true' if value(frame) else 'false'
+        if node.__class__ in (Comma, TwoPoints, WriteFunction) or isinstance(node.type, FunctionType):
+            return lambda frame: text(value(frame))
+        return lambda frame: str(value(frame))
+
+
+# Programa compilado: la clausura del bloque principal y el tamaño del marco.
+class Program:
+    __slots__ = ('body', 'frame_size', 'output')
+
+    def __init__(self, body, frame_size, output):
+        self.body = body
+        self.frame_size = frame_size
+        self.output = output
+
+    def run(self, out=None):
+        """Ejecuta el programa; print escribe en `out` (por defecto sys.stdout)."""
+        self.output[0] = (out if out is not None else sys.stdout).write
+        try:
+            self.body([None] * self.frame_size)
+        except _Return:
+            pass
+        except RecursionError:
+            raise too_deep() from None
+
+
+def compile_program(ast):
+    """
+    Compila el AST decorado de un programa sin errores a un Program (o a un
+    vm.Code si el AST es más profundo de lo que admiten las clausuras).
+    """
+    frame_size = resolve(ast, flatten=True)
+    output = [sys.stdout.write]
+    try:
+        body = _Compiler(output).statement(ast)
+    except RecursionError:
+        # El compilador de vm.py no usa la pila de Python (vm importa este
+        # módulo, por eso se importa aquí).
+        import vm
+        return vm.compile_ast(ast)
+    return Program(body, frame_size, output)
+
+def run_program(ast, out=None):
+    """Compila y ejecuta el programa `ast`. Lanza ExecutionError."""
+    compile_program(ast).run(out)
+
+
+# --- Intérprete de referencia ------------------------------------------------
+
+# Recorre el AST recursivamente en cada ejecución: busca el método de cada
+# nodo por nombre y las variables en una pila de diccionarios (uno por
+# bloque). Misma semántica que compile_program.
+class Interpreter:
+    def __init__(self, out=None):
+        self.out = out if out is not None else sys.stdout
+        self.scopes = []
+
+    def run(self, ast):
+        try:
+            self.execute(ast)
+        except _Return:
+            pass
+        except RecursionError:
+            raise too_deep() from None
+
+    def execute(self, node):
+        getattr(self, f'execute_{node.__class__.__name__.lower()}')(node)
+
+    def evaluate(self, node):
+        return getattr(self, f'evaluate_{node.__class__.__name__.lower()}')(node)
+
+    def scope_of(self, name):
+        for scope in reversed(self.scopes):
+            if name in scope:
+                return scope
+        raise KeyError(name)
+
+    # --- Sentencias ---
+
+    def execute_block(self, node):
+        scope = {}
+        for child in node.children:
+            if isinstance(child, Declare):
+                for name in child.names:
+                    if isinstance(child.var_type, FunctionType):
+                        scope.setdefault(name, [0] * (child.var_type.bound + 1))
+                    else:
+                        scope.setdefault(name, False if child.var_type is BOOL else 0)
+        self.scopes.append(scope)
+        for child in node.children:
+            if not isinstance(child, Declare):
+                self.execute(child)
+        self.scopes.pop()
+
+    def execute_sequencing(self, node):
+        for child in node.children:
+            self.execute(child)
+
+    def execute_skip(self, node):
+        pass
+
+    def execute_asig(self, node):
+        target, expr = node.children
+        value = self.evaluate(expr)
+        if isinstance(target.type, FunctionType):
+            if isinstance(expr, Literal):
+                value = [value] * (target.type.bound + 1)
+            elif isinstance(expr, Ident):
+                value = list(value)
+        self.scope_of(target.name)[target.name] = value
+
+    def execute_if(self, node):
+        for guard in node.children:
+            if self.evaluate(guard.children[0]):
+                self.execute(guard.children[1])
+                return
+        first = node.children[0]
+        raise no_true_guard(first.lineno, first.col_offset)
+
+    def execute_while(self, node):
+        cond, body = node.children[0].children
+        while self.evaluate(cond):
+            self.execute(body)
+
+    def execute_print(self, node):
+        self.out.write(text(self.evaluate(node.children[0])) + '\n')
+
+    def execute_return(self, node):
+        self.evaluate(node.children[0])
+        raise _Return()
+
+    # --- Expresiones ---
+
+    def evaluate_ident(self, node):
+        return self.scope_of(node.name)[node.name]
+
+    def evaluate_literal(self, node):
+        return node.value
+
+    def evaluate_string(self, node):
+        return string_value(node.value)
+
+    def evaluate_plus(self, node):
+        return self.evaluate(node.children[0]) + self.evaluate(node.children[1])
+
+    def evaluate_minus(self, node):
+        if len(node.children) == 1:
+            return -self.evaluate(node.children[0])
+        return self.evaluate(node.children[0]) - self.evaluate(node.children[1])
+
+    def evaluate_mult(self, node):
+        return self.evaluate(node.children[0]) * self.evaluate(node.children[1])
+
+    def evaluate_equal(self, node):
+        return self.evaluate(node.children[0]) == self.evaluate(node.children[1])
+
+    def evaluate_notequal(self, node):
+        return self.evaluate(node.children[0]) != self.evaluate(node.children[1])
+
+    def evaluate_less(self, node):
+        return self.evaluate(node.children[0]) < self.evaluate(node.children[1])
+
+    def evaluate_greater(self, node):
+        return self.evaluate(node.children[0]) > self.evaluate(node.children[1])
+
+    def evaluate_leq(self, node):
+        return self.evaluate(node.children[0]) <= self.evaluate(node.children[1])
+
+    def evaluate_geq(self, node):
+        return self.evaluate(node.children[0]) >= self.evaluate(node.children[1])
+
+    def evaluate_and(self, node):
+        return self.evaluate(node.children[0]) and self.evaluate(node.children[1])
+
+    def evaluate_or(self, node):
+        return self.evaluate(node.children[0]) or self.evaluate(node.children[1])
+
+    def evaluate_not(self, node):
+        return not self.evaluate(node.children[0])
+
+    def evaluate_concat(self, node):
+        return text(self.evaluate(node.children[0])) + text(self.evaluate(node.children[1]))
+
+    def evaluate_comma(self, node):
+        values = []
+        for child in node.children:
+            value = self.evaluate(child)
+            if isinstance(value, list):
+                values.extend(value)
+            else:
+                values.append(value)
+        return values
+
+    def evaluate_twopoints(self, node):
+        return [self.evaluate(node.children[0]), self.evaluate(node.children[1])]
+
+    def evaluate_readfunction(self, node):
+        function = self.evaluate(node.children[0])
+        index = self.evaluate(node.children[1])
+        if not 0 <= index < len(function):
+            raise out_of_domain(index, len(function), node.lineno, node.col_offset)
+        return function[index]
+
+    def evaluate_writefunction(self, node):
+        function = list(self.evaluate(node.children[0]))
+        for pair in function_pairs(node.children[1]):
+            index = self.evaluate(pair.children[0])
+            if not 0 <= index < len(function):
+                raise out_of_domain(index, len(function), pair.lineno, pair.col_offset)
+            function[index] = self.evaluate(pair.children[1])
+        return function
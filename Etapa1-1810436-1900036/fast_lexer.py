@@ -0,0 +1,143 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Lexer alternativo: una sola expresión regular con todas las reglas de
+# lexer.py y un recorrido con finditer/lastgroup, sin llamar a una función
+# de Python por token. Produce los mismos tokens (tipo, valor, línea,
+# posición) y la misma lista de errores que el lexer de PLY.
+import copy
+import re
+from functools import partial
+from array import array
+import ply.lex as lex
+import lexer as ply_rules
+from lexer import IndexedLexer, _newline_re
+
+
+# Token con los mismos atributos que lex.LexToken, pero con __slots__.
+class Token:
+    __slots__ = ('type', 'value', 'lineno', 'lexpos', 'lexer')
+
+    def __init__(self, type, value, lineno, lexpos, lexer):
+        self.type = type
+        self.value = value
+        self.lineno = lineno
+        self.lexpos = lexpos
+        self.lexer = lexer
+
+    def __str__(self):
+        return f'LexToken({self.type},{self.value!r},{self.lineno},{self.lexpos})'
+
+    __repr__ = __str__
+
+
+# Arma la expresión maestra en el mismo orden que PLY: primero las reglas
+# definidas como función (en orden de definición) y luego las definidas como
+# string, de la expresión más larga a la más corta. Los caracteres ignorados
+# se consumen como prefijo de cada token y cualquier otro carácter que no
+# coincida con ninguna regla queda al final, como error.
+def _master_regex():
+    functions = []
+    strings = []
+    for name, value in vars(ply_rules).items():
+        if not name.startswith('t_') or name in ('t_error', 't_ignore'):
+            continue
+        if callable(value):
+            functions.append((value.__code__.co_firstlineno, name[2:], value.__doc__))
+        else:
+            strings.append((name[2:], value))
+    functions.sort()
+    strings.sort(key=lambda rule: len(rule[1]), reverse=True)
+
+    ignore = re.escape(ply_rules.t_ignore)
+    parts = [f'(?P<{name}>{regex})' for _, name, regex in functions]
+    parts.extend(f'(?P<{name}>{regex})' for name, regex in strings)
+    parts.append(f'(?P<bad_char>[^{ignore}])')
+    return re.compile(f'[{ignore}]*(?:' + '|'.join(parts) + ')', re.VERBOSE)
+
+
+_master = _master_regex()
+
+# Tokens cuyo valor es el propio texto y no necesitan ninguna conversión.
+_SIMPLE = {name: name for name in ply_rules.tokens}
+
+
+class FastLexer:
+    def __init__(self):
+        self.lexdata = ''
+        self.lexpos = 0
+        self.lineno = 1
+        self.input('')
+
+    def input(self, s):
+        self.lexdata = s
+        self.lexpos = 0
+        self.line_starts = array('q', [0])
+        self.line_starts.extend(m.end() for m in _newline_re.finditer(s))
+        self.line_base = 0
+        self.find_beyond = None
+        self._tokens = self._scan()
+        # token() es directamente next() sobre el generador, sin un frame extra
+        self.token = partial(next, self._tokens, None)
+
+    # Mismo cálculo de posiciones que el lexer de PLY con índice de líneas.
+    find_line = IndexedLexer.find_line
+    find_column = IndexedLexer.find_column
+    find_next = IndexedLexer.find_next
+
+    def clone(self):
+        new = copy.copy(self)
+        new.input(self.lexdata)
+        return new
+
+    def __iter__(self):
+        return self._tokens
+
+    def _errors(self):
+        if not hasattr(self, 'errors'):
+            self.errors = []
+        return self.errors
+
+    def _scan(self):
+        data = self.lexdata
+        simple = _SIMPLE
+        reserved = ply_rules.reserved
+        # parse.py fija lexer.lineno después de input(); el generador lo lee
+        # al pedir el primer token y luego lleva la cuenta en una local.
+        lineno = self.lineno
+        for m in _master.finditer(data):
+            kind = m.lastgroup
+            start = m.start(kind)
+            self.lexpos = end = m.end()
+            if kind == 'TkId':
+                value = data[start:end]
+                kind = reserved.get(value, 'TkId')
+                if kind not in simple:
+                    # PLY rechaza los tipos que no están en `tokens` (p.ej. 'else')
+                    code = ply_rules.t_TkId.__code__
+                    raise lex.LexError(
+                        f"{code.co_filename}:{code.co_firstlineno}: Rule 't_TkId' "
+                        f"returned an unknown token type '{kind}'", data[start:])
+                yield Token(kind, value, lineno, start, self)
+            elif kind == 'newline':
+                lineno += end - start
+                self.lineno = lineno
+            elif kind == 'TkNum':
+                yield Token(kind, int(data[start:end]), lineno, start, self)
+            elif kind == 'TkString':
+                # La expresión solo admite los escapes \", \\ y \n, y el lexer
+                # de PLY los conserva tal cual: el valor es el texto interior.
+                yield Token(kind, data[start + 1:end - 1], lineno, start, self)
+            elif kind in simple:
+                yield Token(kind, data[start:end], lineno, start, self)
+            elif kind == 'comment':
+                continue
+            elif kind == 'error_string':
+                # Caso raro: se reutiliza la regla de PLY para reportar
+                # exactamente los mismos errores.
+                self._errors()
+                ply_rules.t_error_string(Token(kind, data[start:end], lineno, start, self))
+                lineno = self.lineno
+            else:
+                char = data[start]
+                if char != '"':
+                    self._errors().append((lineno, self.find_column(start),
+                                           f'Unexpected character "{char}"'))
@@ -0,0 +1,94 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Tipos del lenguaje. Hay un único objeto por tipo (int, bool, String,
+# function[..N], function with length=N), así que dos tipos son iguales solo
+# si son el mismo objeto. str() de cada tipo es el texto que se imprime en el
+# AST decorado y en la tabla de símbolos.
+
+class BasicType:
+    __slots__ = ('name',)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+    def __repr__(self):
+        return f'<tipo {self.name}>'
+
+    # Al deserializar (pickle) se recupera el mismo objeto.
+    def __reduce__(self):
+        return (basic_type, (self.name,))
+
+
+INT = BasicType('int')
+BOOL = BasicType('bool')
+STRING = BasicType('String')
+UNKNOWN = BasicType('unknown')
+# Marca de error: la devuelven los chequeos que fallan y la llevan los nodos
+# donde se detectó el error.
+TYPE_ERROR = BasicType('TYPE_ERROR')
+
+_BASIC_TYPES = {t.name: t for t in (INT, BOOL, STRING, UNKNOWN, TYPE_ERROR)}
+
+
+def basic_type(name):
+    return _BASIC_TYPES[name]
+
+
+# function[..bound]: variable función declarada con dominio 0..bound.
+class FunctionType:
+    __slots__ = ('bound',)
+    _interned = {}
+
+    def __new__(cls, bound):
+        interned = cls._interned.get(bound)
+        if interned is None:
+            candidate = super().__new__(cls)
+            candidate.bound = bound
+            # setdefault es atómico: si otro hilo guardó el suyo antes, se
+            # usa ese y los dos ven el mismo objeto.
+            interned = cls._interned.setdefault(bound, candidate)
+        return interned
+
+    def __str__(self):
+        return f'function[..{self.bound}]'
+
+    def __repr__(self):
+        return f'<tipo {self}>'
+
+    def __reduce__(self):
+        return (FunctionType, (self.bound,))
+
+
+# function with length=N: el tipo de una lista de N elementos (a, b, ...) o
+# de un par clave:valor (N = 2).
+def list_type_name(length):
+    """Texto de ListType(length), sin crear (ni guardar) el objeto."""
+    return f'function with length={length}'
+
+
+class ListType:
+    __slots__ = ('length',)
+    _interned = {}
+
+    def __new__(cls, length):
+        interned = cls._interned.get(length)
+        if interned is None:
+            candidate = super().__new__(cls)
+            candidate.length = length
+            interned = cls._interned.setdefault(length, candidate) # Ver FunctionType
+        return interned
+
+    def __str__(self):
+        return list_type_name(self.length)
+
+    def __repr__(self):
+        return f'<tipo {self}>'
+
+    def __reduce__(self):
+        return (ListType, (self.length,))
+
+
+# Tipos que el checker trata como "función" (antes: "function" in tipo).
+FUNCTION_TYPES = (FunctionType, ListType)
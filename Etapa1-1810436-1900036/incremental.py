@@ -0,0 +1,789 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Compilación incremental de un programa que se está editando. Una Session
+# guarda el AST decorado de la última corrida y, para cada sentencia, el
+# tramo de texto que ocupa (entre el token anterior y el siguiente). Al
+# aplicar una edición se busca la sentencia más interna que la contiene y
+# solo esa se vuelve a lexear, parsear y chequear, en el ámbito de los
+# bloques que la rodean. El resultado es el mismo que el de compilar de nuevo
+# el texto completo (compiler.compile_source): el estado y los diagnósticos
+# siempre, y el AST si no hay errores o con la política 'all'. Con errores y
+# las políticas 'fail-fast' o 'first', el AST no es el de una corrida
+# completa: acá se chequean todas las sentencias (_UnitChecker), así que
+# también se decoran y se reescriben (Plus -> Concat, App -> WriteFunction)
+# los nodos que están después del primer error, a los que la corrida
+# completa no llega.
+#
+# Cuándo se rehace más que la sentencia editada:
+#   - si se editó una declaración, se rehace su bloque (cambian los nombres
+#     visibles en todo el bloque), y lo mismo en un bloque que tiene
+#     declaraciones con errores;
+#   - una variable no declarada se declara con tipo de error en el bloque al
+#     primer uso (TypeChecker._declare_undeclared) y los usos siguientes ya
+#     no se reportan: si la sentencia editada cambia esas declaraciones, se
+#     rehace el bloque;
+#   - si el tramo ya no se puede parsear como una sola sentencia (se borró un
+#     ';', se abrió un comentario que se come el token siguiente...), se
+#     prueba con la sentencia que la contiene, y así hasta el programa entero.
+# Si la corrida anterior no llegó a tener AST (error léxico o de sintaxis),
+# se compila todo el texto.
+#
+# Lo que queda después de la edición no se recorre: los offsets y la línea
+# de cada sentencia son relativos a los de su padre, y cada padre guarda en
+# un árbol de Fenwick cuánto se corrieron sus hijas desde cada índice, así
+# que una edición solo toca el camino hasta la sentencia editada. Las
+# posiciones de los nodos y de los errores (lineno, col_offset) se ponen al
+# día cuando se las necesita; update_positions() pone al día todo el AST.
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from functools import partial
+from types import GeneratorType
+from lexer import get_lexer
+from parser import get_parser, parse_program, ParseError
+from type_checker import TypeChecker
+from symbol_table import ScopedSymbolTable
+from diagnostics import FAIL_FAST, COLLECT_ALL, POLICIES
+from ast_nodes import ASTNode, NodeBuilder, Block, Declare, Asig, Print, skip, Return, If, While, Comma
+from fast_lexer import Token
+from compiler import Result, _failure, OK, LEXICAL, SYNTAX, CONTEXT, ERROR
+
+# Clases de las sentencias (ver p_statement y p_body_stmt_item).
+_STATEMENTS = (Declare, Block, Asig, Print, skip, Return, If, While)
+
+# Ediciones que se anotan en una sentencia antes de poner al día sus nodos.
+_MAX_MOVES = 64
+
+
+# Una sentencia del programa, o el bloque principal (sin padre). Su texto
+# está entre `start` (fin del token anterior) y `end` (inicio del
+# siguiente); `prev_start` es el inicio del token anterior y `next_end` el
+# fin del siguiente, y `line` la línea de `start`. Son relativos al `start`
+# y a la línea del padre, más lo que el padre tenga en `shifts` para su
+# índice (ver _shift_of). Las posiciones de sus nodos y errores estaban al
+# día cuando `start` estaba en la línea `synced_line`, salvo las ediciones
+# anotadas en `moves` (ver Session._record). `children` son las sentencias
+# que contiene, en orden; `holder`.children[`slot`] es donde está su nodo en
+# el AST.
+# `rank` es su orden de chequeo entre sus hermanas (en un bloque las
+# declaraciones van primero) y `errors` los errores que encontró el type
+# checker en ella fuera de sus hijas, como pares (hijas ya chequeadas,
+# Diagnostic). `placeholders` son las variables no declaradas que sus usos
+# declararon en el bloque padre. En los bloques, `placeholder_count` y
+# `declare_errors` cuentan las hijas con esas declaraciones y las
+# declaraciones con errores.
+class _Unit:
+    __slots__ = ('node', 'kind', 'first', 'last', 'parent', 'children', 'index', 'rank',
+                 'holder', 'slot', 'prev_start', 'start', 'end', 'next_end', 'line',
+                 'shifts', 'synced_line', 'moves', 'errors', 'placeholders', 'placeholder_count', 'declare_errors')
+
+    def __init__(self, node, first=None, last=None):
+        self.node = node
+        self.kind = node.__class__
+        # Posición del primer y del último token (luego, sus índices)
+        self.first = first
+        self.last = last
+        self.parent = None
+        self.children = []
+        self.index = 0
+        self.rank = 0
+        self.holder = None
+        self.slot = 0
+        self.prev_start = self.start = self.end = self.next_end = 0
+        self.line = 1
+        self.shifts = None
+        self.synced_line = 1
+        self.moves = []
+        self.errors = []
+        self.placeholders = []
+        self.placeholder_count = 0
+        self.declare_errors = 0
+
+
+# Builder que además guarda cada sentencia con su posición (el parser tiene
+# que correr con tracking=True para que p.lexspan la tenga).
+class _SpanBuilder(NodeBuilder):
+    def __init__(self):
+        self.units = {}   # nodo -> _Unit
+        self.order = []   # en el orden en que se reducen (hijas primero)
+
+    def statement(self, node, p):
+        first, last = p.lexspan(1)
+        unit = _Unit(node, first, last)
+        self.units[node] = unit
+        self.order.append(unit)
+
+
+# Fuente de tokens que anota el inicio, el fin y la línea de cada uno.
+class _TokenRecorder:
+    def __init__(self, lexer):
+        self.lexer = lexer
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('q')
+
+    def __call__(self):
+        token = self.lexer.token()
+        if token is not None:
+            self.starts.append(token.lexpos)
+            self.ends.append(self.lexer.lexpos)
+            self.lines.append(token.lineno)
+        return token
+
+
+# Lexer sobre el tramo text[base:stop] que da posiciones del texto completo:
+# los lexpos se corren en `base` y las columnas de la primera línea empiezan
+# en la de `base`.
+class _RegionLexer:
+    def __init__(self, engine, text, base, stop):
+        self.inner = get_lexer(engine).clone()
+        self.inner.errors = []
+        self.inner.input(text[base:stop])
+        self.inner.lineno = text.count('\n', 0, base) + 1
+        self.base = base
+        self.column = base - text.rfind('\n', 0, base)
+
+    @property
+    def lexpos(self):
+        return self.inner.lexpos + self.base
+
+    @property
+    def lineno(self):
+        return self.inner.lineno
+
+    @property
+    def errors(self):
+        return self.inner.errors
+
+    def token(self):
+        token = self.inner.token()
+        if token is not None:
+            token.lexpos += self.base
+            token.lexer = self
+        return token
+
+    def find_column(self, lexpos):
+        lexpos -= self.base
+        column = self.inner.find_column(lexpos)
+        if bisect_right(self.inner.line_starts, lexpos) == 1:
+            column += self.column - 1
+        return column
+
+
+class _Damaged(Exception):
+    """La edición cambió los tokens que rodean al tramo."""
+
+
+# Tokens para reparsear una sentencia sola: el tramo entre `start` y `end`
+# envuelto en un bloque `{ ... }`, que es un programa. El token anterior y
+# el siguiente se vuelven a lexear para confirmar que siguen siendo los
+# mismos (la edición podría haberse pegado a uno de ellos).
+def _region_tokens(lexer, read, prev_start, start, end, next_end):
+    token = read()
+    if token is None or token.lexpos != prev_start or lexer.lexpos != start:
+        raise _Damaged()
+    yield Token('TkOBlock', '{', token.lineno, start, lexer)
+    while True:
+        token = read()
+        if token is None:
+            raise _Damaged()
+        if token.lexpos >= end:
+            break
+        yield token
+    if token.lexpos != end or lexer.lexpos != next_end:
+        raise _Damaged()
+    yield Token('TkCBlock', '}', token.lineno, end, lexer)
+
+
+# Arma el árbol de sentencias a partir de las que guardó un _SpanBuilder y de
+# los tokens leídos, y devuelve las de más afuera. Los offsets y las líneas
+# quedan absolutos (ver _relativize).
+def _link_units(order, recorder):
+    starts, ends = recorder.starts, recorder.ends
+    pending = []
+    for unit in order:
+        first = unit.first = bisect_left(starts, unit.first)
+        last = unit.last = bisect_left(starts, unit.last)
+        unit.prev_start = starts[first - 1]
+        unit.start = ends[first - 1]
+        unit.end = starts[last + 1]
+        unit.next_end = ends[last + 1]
+        unit.line = recorder.lines[first - 1]
+        # Las hijas se redujeron antes y son las últimas pendientes
+        i = len(pending)
+        while i and pending[i - 1].first >= first:
+            i -= 1
+        unit.children = pending[i:]
+        del pending[i:]
+        for index, child in enumerate(unit.children):
+            child.parent = unit
+            child.index = index
+        pending.append(unit)
+    return pending
+
+
+# Pasa los offsets y las líneas absolutos de `top` y las sentencias que
+# contiene a relativos; `base` y `line` son el inicio y la línea desde donde
+# se cuenta `top`.
+def _relativize(top, base, line):
+    stack = [(top, base, line)]
+    while stack:
+        unit, base, line = stack.pop()
+        start, unit_line = unit.start, unit.line
+        unit.prev_start -= base
+        unit.start -= base
+        unit.end -= base
+        unit.next_end -= base
+        unit.line -= line
+        unit.synced_line = unit_line
+        stack.extend((child, start, unit_line) for child in unit.children)
+
+
+# Cuánto se corrieron el offset y la línea de la hija número `index` de
+# `unit` (suma de prefijo en el árbol de Fenwick).
+def _shift_of(unit, index):
+    shifts = unit.shifts
+    if shifts is None:
+        return 0, 0
+    offsets, lines = shifts
+    offset = line = 0
+    i = index + 1
+    while i:
+        offset += offsets[i]
+        line += lines[i]
+        i -= i & -i
+    return offset, line
+
+# Corre las hijas de `unit` desde la número `index`.
+def _add_shift(unit, index, offset, line):
+    size = len(unit.children)
+    if index >= size:
+        return
+    if unit.shifts is None:
+        unit.shifts = ([0] * (size + 1), [0] * (size + 1))
+    offsets, lines = unit.shifts
+    i = index + 1
+    while i <= size:
+        offsets[i] += offset
+        lines[i] += line
+        i += i & -i
+
+
+# Anota en cada sentencia bajo `node` qué nodo la tiene como hijo.
+def _place(node, units):
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for slot, child in enumerate(node.children):
+            if isinstance(child, ASTNode):
+                unit = units.get(child)
+                if unit is not None:
+                    unit.holder = node
+                    unit.slot = slot
+                stack.append(child)
+
+
+def _enclosing_block(unit):
+    unit = unit.parent
+    while unit.kind is not Block:
+        unit = unit.parent
+    return unit
+
+
+# --- Posiciones después de una edición ---------------------------------------
+
+# Cada edición se anota como (inicio, fin, cambio de largo, línea y columna
+# del fin en el texto viejo, línea y columna del fin en el texto nuevo). Lo
+# que empieza en el fin o después se corre; lo de antes del inicio queda
+# igual (lo de adentro es de la sentencia que se reparsea). Los `moves` de
+# una sentencia son esas ediciones o, si todas sus posiciones están en
+# líneas posteriores a la edición, solo la cantidad de líneas que se corren.
+def _move(line, col, moves):
+    for move in moves:
+        if move.__class__ is int:
+            line += move
+            continue
+        _, _, _, old_line, old_col, new_line, new_col = move
+        if line > old_line:
+            line += new_line - old_line
+        elif line == old_line and col >= old_col:
+            line, col = new_line, col + new_col - old_col
+    return line, col
+
+def _move_node(node, moves):
+    if node.lineno is not None:
+        node.lineno, node.col_offset = _move(node.lineno, node.col_offset or 0, moves)
+    if node.__class__ is Declare:
+        if node.end_lineno is not None:
+            node.end_lineno, node.end_col_offset = _move(node.end_lineno, node.end_col_offset, moves)
+        if node.bound_lineno is not None:
+            node.bound_lineno, node.bound_col_offset = _move(node.bound_lineno,
+                                                             node.bound_col_offset, moves)
+    elif node.__class__ is Comma:
+        separators = node.separators
+        for i in range(0, len(separators), 2):
+            separators[i], separators[i + 1] = _move(separators[i], separators[i + 1], moves)
+
+def _move_diagnostic(diagnostic, moves):
+    line, col = diagnostic.lineno, diagnostic.col_offset or 0
+    if line is None:
+        return
+    # Línea de la declaración anterior ("is already declared"): está en el
+    # mismo bloque, y un bloque con ese error se rehace entero si se edita
+    # algo adentro, así que se corre igual que el error.
+    original = diagnostic.fields.get('original_line')
+    for move in moves:
+        if original is not None:
+            if move.__class__ is int:
+                original += move
+            else:
+                old_line, old_col, new_line = move[3], move[4], move[5]
+                if line > old_line or line == old_line and col >= old_col:
+                    original = new_line if original == old_line else original + new_line - old_line
+        line, col = _move(line, col, (move,))
+    diagnostic.lineno = line
+    if diagnostic.col_offset is not None:
+        diagnostic.col_offset = col
+    if original is not None:
+        diagnostic.fields['original_line'] = original
+
+
+# --- Type checker por sentencias ---------------------------------------------
+
+# TypeChecker que anota en cada sentencia (las de `units`) su orden, sus
+# errores y las variables no declaradas que declaró en su bloque. Usa la
+# política 'all': así se conocen los errores de todas las sentencias, y el
+# primero es el mismo que el de las otras políticas.
+class _UnitChecker(TypeChecker):
+    def __init__(self, units, symbol_table=None, rank=0, root=None):
+        super().__init__(symbol_table, policy=COLLECT_ALL)
+        self.units = units
+        self.rank = rank
+        # Sentencias abiertas: [unidad, hijas ya chequeadas]
+        self.open = [[root, 0]] if root is not None else []
+        # No declaradas que fueron a un ámbito de afuera de lo chequeado
+        self.outer_placeholders = []
+
+    def check_unit(self, unit):
+        """Chequea la sentencia `unit` y devuelve las variables no declaradas
+        que declaró en el ámbito de afuera."""
+        self.check_program(unit.node)
+        return self.outer_placeholders
+
+    def _resolve_handler(self, node_class):
+        handler = super()._resolve_handler(node_class)
+        if issubclass(node_class, _STATEMENTS):
+            handler = _unit_handler(handler)
+            type(self)._handlers[node_class] = handler
+        return handler
+
+    def _open(self, unit):
+        open = self.open
+        unit.rank = open[-1][1] if open else self.rank
+        unit.errors = []
+        unit.placeholders = []
+        open.append([unit, 0])
+
+    def _close(self):
+        open = self.open
+        open.pop()
+        if open:
+            open[-1][1] += 1
+
+    def _finish(self, generator):
+        value = yield generator
+        self._close()
+        return value
+
+    def add_error(self, template, lineno=None, col_offset=None, **fields):
+        result = super().add_error(template, lineno, col_offset, **fields)
+        unit, done = self.open[-1]
+        unit.errors.append((done, self.errors[-1]))
+        return result
+
+    def _declare_undeclared(self, name, lineno, col_offset):
+        super()._declare_undeclared(name, lineno, col_offset)
+        # Se declara en el ámbito del bloque abierto más interno; se anota en
+        # la hija de ese bloque que está abierta.
+        open = self.open
+        for i in range(len(open) - 1, -1, -1):
+            if open[i][0].kind is Block:
+                open[i + 1][0].placeholders.append(name)
+                return
+        self.outer_placeholders.append(name)
+
+def _unit_handler(handler):
+    def check(self, node):
+        unit = self.units.get(node)
+        if unit is None:
+            return handler(self, node)
+        self._open(unit)
+        value = handler(self, node)
+        if value.__class__ is GeneratorType:
+            return self._finish(value)
+        self._close()
+        return value
+    return check
+
+
+# --- Sesión -----------------------------------------------------------------
+
+class Session:
+    """
+    Programa en edición. `result` es el Result del texto actual; edit()
+    aplica una edición y devuelve el nuevo. Con errores y una política que
+    no sea 'all', result.ast está chequeado también después del primer
+    error (ver el comentario del módulo). `full_runs` y `partial_runs`
+    cuentan las compilaciones completas y las incrementales, y `reparsed` es
+    cuántos caracteres se volvieron a lexear en la última edición.
+    """
+
+    def __init__(self, text, errors=FAIL_FAST, engine='ply'):
+        if errors not in POLICIES:
+            raise ValueError(f"Política de errores desconocida: {errors}")
+        self.text = text
+        self.errors = errors
+        self.engine = engine
+        self.full_runs = 0
+        self.partial_runs = 0
+        self.result = self._full_run()
+
+    def edit(self, start, end, text):
+        """
+        Reemplaza el texto entre los offsets `start` y `end` por `text` y
+        devuelve el Result del programa editado.
+        """
+        old = self.text
+        if not 0 <= start <= end <= len(old):
+            raise ValueError(f'Edición fuera del texto: {start}..{end}')
+        self.text = old[:start] + text + old[end:]
+        if self.root is None:
+            self.result = self._full_run()
+        else:
+            path = self._containing(start, end)
+            self._shift(path, self._describe(old, start, end, len(text), path[-1]))
+            self.result = self._update(path[-1][0])
+        return self.result
+
+    def update_positions(self):
+        """
+        Pone al día las posiciones (lineno, col_offset...) de todos los nodos
+        del AST. edit() solo actualiza las de lo que vuelve a chequear.
+        """
+        if self.root is None:
+            return
+        stack = [(self.root, self.root.line)]
+        while stack:
+            unit, line = stack.pop()
+            self._sync(unit, line)
+            for index, child in enumerate(unit.children):
+                stack.append((child, line + child.line + _shift_of(unit, index)[1]))
+
+    # --- Compilación completa ---
+
+    def _full_run(self):
+        self.full_runs += 1
+        self.root = None
+        self.error_index = [] # (clave, Diagnostic, unidad), ordenados
+        text = self.text
+        self.reparsed = len(text)
+        if not text:
+            return _failure(ERROR, "Error: El archivo está vacío")
+        try:
+            lexer = get_lexer(self.engine).clone()
+            lexer.errors = []
+            lexer.input(text)
+            lexer.lineno = 1
+            if lexer.errors:
+                line, col, error = sorted(set(lexer.errors), key=lambda x: (x[0], x[1]))[0]
+                return _failure(LEXICAL, "Lexical Error: {error} in row {line}, column {col}",
+                                line, col, error=error)
+            builder = _SpanBuilder()
+            recorder = _TokenRecorder(lexer)
+            try:
+                ast, _ = parse_program(lexer, get_parser(), builder=builder, tokenfunc=recorder,
+                                       tracking=True)
+            except ParseError as e:
+                return Result(SYNTAX, diagnostics=[e.args[0]])
+            if ast is None:
+                return _failure(SYNTAX, "Error: No se pudo generar el AST (posible error de sintaxis)")
+
+            root = _Unit(ast)
+            _UnitChecker(builder.units, root=root).check_program(ast)
+            root.children = _link_units(builder.order, recorder)
+            for index, child in enumerate(root.children):
+                child.parent = root
+                child.index = index
+                _relativize(child, root.start, root.line)
+            _place(ast, builder.units)
+            self._tally([root, *builder.units.values()])
+            self.root = root
+            return self._report()
+        except Exception as e:
+            self.root = None
+            return _failure(ERROR, "Error inesperado: {error}", error=e)
+
+    # --- Edición ---
+
+    # La edición como (inicio, fin, cambio de largo, línea y columna del fin
+    # en el texto viejo, línea y columna del fin en el texto nuevo). Las
+    # líneas se cuentan desde el inicio de la sentencia que la contiene.
+    def _describe(self, old, start, end, length, containing):
+        new = self.text
+        new_end = start + length
+        _, base, line = containing
+        line += old.count('\n', base, end)
+        new_line = line - old.count('\n', start, end) + new.count('\n', start, new_end)
+        return (start, end, length - (end - start), line, end - old.rfind('\n', 0, end),
+                new_line, new_end - new.rfind('\n', 0, new_end))
+
+    # Sentencias cuyo tramo contiene a [start, end], desde el bloque
+    # principal hasta la más interna, como (unidad, inicio, línea).
+    def _containing(self, start, end):
+        unit = self.root
+        base, line = unit.start, unit.line
+        path = [(unit, base, line)]
+        while True:
+            children = unit.children
+            lo, hi = 0, len(children)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if base + children[mid].start + _shift_of(unit, mid)[0] <= start:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            if lo == 0:
+                return path
+            child = children[lo - 1]
+            offset, lines = _shift_of(unit, lo - 1)
+            if end > base + child.end + offset:
+                return path
+            base, line = base + child.start + offset, line + child.line + lines
+            unit = child
+            path.append((unit, base, line))
+
+    # Aplica `edit` a los offsets y las líneas. La edición está adentro de
+    # las sentencias de `path`: crece su fin y se corren las hermanas que
+    # vienen después (con todo lo que contienen). Sus nodos pueden quedar
+    # antes o después de la edición, así que se les anota.
+    def _shift(self, path, edit):
+        _, _, delta, old_line, _, new_line, _ = edit
+        for depth, (unit, _, line) in enumerate(path):
+            if depth:
+                unit.end += delta
+                unit.next_end += delta
+            self._record(unit, line, line, edit)
+            if depth + 1 < len(path):
+                index = path[depth + 1][0].index + 1
+                self._record_same_line(unit, index, line, edit)
+                _add_shift(unit, index, delta, new_line - old_line)
+
+    # Lo que empieza después de la edición en su misma línea también cambia
+    # de columna: se anota la edición en esas sentencias (las hijas de `unit`
+    # desde `index` que empiezan en esa línea, y las de adentro de ellas).
+    def _record_same_line(self, unit, index, line, edit):
+        old_line, new_line = edit[3], edit[5]
+        stack = [(unit, index, line)]
+        while stack:
+            unit, index, line = stack.pop()
+            children = unit.children
+            while index < len(children):
+                child = children[index]
+                if line + child.line + _shift_of(unit, index)[1] != old_line:
+                    break
+                self._record(child, old_line, new_line, edit)
+                stack.append((child, 0, old_line))
+                index += 1
+
+    # Anota `edit` en `unit`, que empezaba en la línea `before` y después de
+    # la edición empieza en `after`.
+    def _record(self, unit, before, after, edit):
+        moves = unit.moves
+        if before != unit.synced_line:
+            moves.append(before - unit.synced_line)
+        moves.append(edit)
+        unit.synced_line = after
+        if len(moves) > _MAX_MOVES:
+            self._sync(unit, after)
+
+    # Inicio y línea de `unit` en el texto actual.
+    @staticmethod
+    def _absolute(unit):
+        start = line = 0
+        while unit.parent is not None:
+            offset, lines = _shift_of(unit.parent, unit.index)
+            start += unit.start + offset
+            line += unit.line + lines
+            unit = unit.parent
+        return start + unit.start, line + unit.line
+
+    # Sentencia que hay que rehacer si se editó `unit` (ver el comentario
+    # del principio). Puede ser el bloque principal: compilar todo.
+    def _check_unit_for(self, unit):
+        if unit.kind is Declare:
+            unit = unit.parent
+        target = unit
+        child, parent = unit, unit.parent
+        while parent is not None:
+            if parent.kind is Block:
+                if parent.declare_errors:
+                    target = parent
+                elif parent.placeholder_count:
+                    target = child
+            child, parent = parent, parent.parent
+        return target
+
+    def _update(self, unit):
+        self.reparsed = 0
+        unit = self._check_unit_for(unit)
+        while unit is not self.root:
+            replacement = self._reparse(unit)
+            if replacement is None:
+                unit = self._check_unit_for(unit.parent)
+                continue
+            new, units = replacement
+            try:
+                checker = _UnitChecker(units, self._environment(unit), unit.rank)
+                placeholders = checker.check_unit(new)
+            except Exception:
+                break
+            if placeholders != unit.placeholders:
+                unit = self._check_unit_for(_enclosing_block(unit))
+                continue
+            new.placeholders = placeholders
+            self._splice(unit, new, units)
+            self.partial_runs += 1
+            return self._report()
+        return self._full_run()
+
+    # Lexea y parsea el tramo de `unit` en el texto actual. Devuelve la
+    # sentencia nueva y el diccionario nodo -> _Unit de las que contiene, o
+    # None si el tramo ya no es una sola sentencia del mismo tipo.
+    def _reparse(self, unit):
+        base = self._absolute(unit)[0] - unit.start
+        prev_start, start = base + unit.prev_start, base + unit.start
+        end, next_end = base + unit.end, base + unit.next_end
+        self.reparsed += next_end - prev_start
+        try:
+            lexer = _RegionLexer(self.engine, self.text, prev_start, next_end)
+            recorder = _TokenRecorder(lexer)
+            builder = _SpanBuilder()
+            tokens = _region_tokens(lexer, recorder, prev_start, start, end, next_end)
+            parse_program(lexer, get_parser(), builder=builder,
+                          tokenfunc=partial(next, tokens, None), tracking=True)
+        except Exception:
+            return None
+        if lexer.errors:
+            return None # Se deja que los reporte la compilación completa
+        top = _link_units(builder.order, recorder)
+        if len(top) != 1:
+            return None
+        new = top[0]
+        # En un bloque las declaraciones van antes que las demás sentencias, y
+        # en el cuerpo de un if o un while no puede haber declaraciones.
+        if new.start != start or new.end != end or (new.kind is Declare) != (unit.kind is Declare):
+            return None
+        _place(new.node, builder.units)
+        return new, builder.units
+
+    # Ámbitos visibles desde `unit`: lo declarado en cada bloque que la
+    # contiene, sin las variables no declaradas que declararon las
+    # sentencias que se chequean después.
+    def _environment(self, unit):
+        blocks = []
+        child, parent = unit, unit.parent
+        while parent is not None:
+            if parent.kind is Block:
+                blocks.append((parent, child))
+            child, parent = parent, parent.parent
+        table = ScopedSymbolTable()
+        for block, child in reversed(blocks):
+            table = table.enter_scope()
+            later = ()
+            if block.placeholder_count:
+                later = {name for sibling in block.children if sibling.rank >= child.rank
+                         for name in sibling.placeholders}
+            for name, info in block.node.symbol_table.symbols.items():
+                if name not in later:
+                    table.declare(name, *info)
+        return table
+
+    def _splice(self, old, new, units):
+        holder = old.holder
+        holder.children[old.slot] = new.node
+        new.holder, new.slot = holder, old.slot
+        parent = old.parent
+        parent.children[old.index] = new
+        new.parent, new.index = parent, old.index
+        start, line = self._absolute(parent)
+        offset, lines = _shift_of(parent, old.index)
+        _relativize(new, start + offset, line + lines)
+        index = self.error_index
+        stack = [old]
+        while stack:
+            unit = stack.pop()
+            if unit.errors:
+                path = self._path(unit)
+                for i, (done, _) in enumerate(unit.errors):
+                    del index[bisect_left(index, (path + (done, 0, i),))]
+            stack.extend(unit.children)
+        self._tally(units.values())
+
+    # Agrega los errores de `units` al índice y cuenta lo de cada bloque.
+    def _tally(self, units):
+        index = self.error_index
+        for unit in units:
+            if unit.errors:
+                path = self._path(unit)
+                for i, (done, diagnostic) in enumerate(unit.errors):
+                    insort(index, (path + (done, 0, i), diagnostic, unit))
+            if unit.kind is Block:
+                unit.placeholder_count = sum(1 for child in unit.children if child.placeholders)
+                unit.declare_errors = sum(1 for child in unit.children
+                                          if child.kind is Declare and child.errors)
+
+    # --- Resultado ---
+
+    def _report(self):
+        index = self.error_index
+        if not index:
+            return Result(OK, self.root.node)
+        if self.errors != COLLECT_ALL:
+            index = index[:1]
+        for _, _, unit in index:
+            self._sync(unit)
+        return Result(CONTEXT, self.root.node, [diagnostic for _, diagnostic, _ in index])
+
+    # Clave con que se ordenan los errores, como los encontraría el type
+    # checker: el camino de órdenes de chequeo desde la raíz, (rank, 1) por
+    # cada nivel. Un error propio de la sentencia lleva (hijas ya chequeadas,
+    # 0, i): va antes que los de la hija que se chequea después.
+    @staticmethod
+    def _path(unit):
+        ranks = []
+        while unit.parent is not None:
+            ranks.append(1)
+            ranks.append(unit.rank)
+            unit = unit.parent
+        return tuple(reversed(ranks))
+
+    # Pone al día las posiciones de los nodos propios de `unit` (sin los de
+    # las sentencias hijas) y las de sus errores; `line` es la línea donde
+    # empieza ahora.
+    def _sync(self, unit, line=None):
+        if line is None:
+            line = self._absolute(unit)[1]
+        moves = unit.moves
+        if line != unit.synced_line:
+            moves.append(line - unit.synced_line)
+        if not moves:
+            return
+        nested = {child.node for child in unit.children}
+        stack = [unit.node]
+        while stack:
+            node = stack.pop()
+            _move_node(node, moves)
+            stack.extend(child for child in node.children
+                         if isinstance(child, ASTNode) and child not in nested)
+        for _, diagnostic in unit.errors:
+            _move_diagnostic(diagnostic, moves)
+        unit.moves = []
+        unit.synced_line = line
@@ -1,6 +1,14 @@
 # Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036 
+import mmap
+import os
+import re
 import sys
+import threading
+import types
+from array import array
+from bisect import bisect_right
 import ply.lex as lex
+import table_cache
 
 # Definición de los tokens
 tokens = [
@@ -106,7 +114,7 @@ def t_TkString(t):
             elif raw[i] == '"': result += '\\"'
             elif raw[i] == '\\': result += '\\\\'
             else:
-                col = find_column(t.lexer.lexdata, t.lexpos + i)
+                col = t.lexer.find_column(t.lexpos + i)
                 if not hasattr(t.lexer, 'errors'):
                     t.lexer.errors = []
                 t.lexer.errors.append((t.lineno, col, 'Unexpected character "\\"'))
@@ -125,7 +133,7 @@ def t_error_string(t):
         t.lexer.errors = []
 
     # Error: comilla inicial
-    col_start = find_column(t.lexer.lexdata, t.lexpos)
+    col_start = t.lexer.find_column(t.lexpos)
     t.lexer.errors.append((t.lineno, col_start, 'Unexpected character "\""'))
 
     # Buscar '\' inválida después de salto de línea literal
@@ -139,28 +147,25 @@ def t_error_string(t):
     
     # Error: barra inválida
     if pos_backslash:
-        line_bs = t.lexer.lexdata.count('\n', 0, pos_backslash) + 1
-        col_bs = find_column(t.lexer.lexdata, pos_backslash)
+        line_bs = t.lexer.find_line(pos_backslash)
+        col_bs = t.lexer.find_column(pos_backslash)
         t.lexer.errors.append((line_bs, col_bs, 'Unexpected character "\\"'))
 
     # Revisar si hay una barra problemática
     for i in range(1, len(t.value)):
         if t.value[i] == '\\':
             if i + 1 >= len(t.value) or t.value[i + 1] not in ['"', '\\', 'n']:
-                col_backslash = find_column(t.lexer.lexdata, t.lexpos + i)
+                col_backslash = t.lexer.find_column(t.lexpos + i)
                 t.lexer.errors.append((t.lineno, col_backslash, 'Unexpected character "\\"'))
                 break
 
     # Avanzar línea si contiene salto literal
     # Aumenta primero las líneas por saltos literales
     t.lexer.lineno += t.value.count('\n')
-# Luego busca la comilla de cierre
-    after = t.lexer.lexdata[t.lexpos + len(t.value):]
-    quote_pos = after.find('"')
-    if quote_pos != -1:
-        abs_pos = t.lexpos + len(t.value) + quote_pos
-        quote_line = t.lexer.lexdata.count('\n', 0, abs_pos) + 1
-        quote_col = find_column(t.lexer.lexdata, abs_pos)
+# Luego busca la comilla de cierre (sin copiar el resto del archivo)
+    quote = t.lexer.find_next('"', t.lexpos + len(t.value))
+    if quote is not None:
+        quote_line, quote_col = quote
         t.lexer.errors.append((quote_line, quote_col, 'Unexpected character "\""'))
 
 t_ignore = ' \t'
@@ -181,32 +186,271 @@ def t_error(t):
     if t.value[0] == '"':
         t.lexer.skip(1)
         return
-    col = find_column(t.lexer.lexdata, t.lexpos)
+    col = t.lexer.find_column(t.lexpos)
     t.lexer.errors.append((t.lineno, col, f'Unexpected character "{t.value[0]}"'))
     t.lexer.skip(1)
 
-# Función para encontrar la columna de un token
-def find_column(input_str, lexpos):
-    last_cr = input_str.rfind('\n', 0, lexpos)
-    return lexpos + 1 if last_cr < 0 else (lexpos - last_cr)
+_newline_re = re.compile('\n')
+
+# Lexer de PLY con un índice de inicios de línea. El índice se construye una
+# sola vez en input() y las líneas/columnas se calculan con búsqueda binaria.
+class IndexedLexer(lex.Lexer):
+    def input(self, s):
+        super().input(s)
+        self.line_starts = array('q', [0])
+        self.line_starts.extend(m.end() for m in _newline_re.finditer(s))
+        # Usados por MappedLexer cuando `s` es solo una ventana del archivo:
+        # líneas que hay antes de la ventana y búsqueda fuera de ella.
+        self.line_base = 0
+        self.find_beyond = None
+
+    def find_line(self, lexpos):
+        """Número de línea (desde 1) de la posición `lexpos`."""
+        return bisect_right(self.line_starts, lexpos) + self.line_base
+
+    def find_column(self, lexpos):
+        """Columna (desde 1) de la posición `lexpos`."""
+        return lexpos - self.line_starts[bisect_right(self.line_starts, lexpos) - 1] + 1
+
+    def find_next(self, char, lexpos):
+        """
+        Busca `char` a partir de `lexpos` y devuelve su (línea, columna),
+        o None si no aparece.
+        """
+        pos = self.lexdata.find(char, lexpos)
+        if pos < 0:
+            return self.find_beyond(char) if self.find_beyond else None
+        return self.find_line(pos), self.find_column(pos)
+
+# Convierte saltos de línea \r\n y \r en \n, igual que open() en modo texto.
+def _universal_newlines(text):
+    if '\r' in text:
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+    return text
+
+# Lexer para archivos muy grandes. El archivo se mapea en memoria y se lexea
+# por ventanas de líneas completas (ningún token cruza un salto de línea),
+# así que nunca hay una copia del archivo entero como str. Las posiciones
+# de los tokens (lexpos) son globales y find_column/find_line funcionan
+# sobre todo el archivo.
+class MappedLexer:
+    def __init__(self, window=1 << 20, lexer=None):
+        self.window = window
+        self.inner = (lexer or get_lexer()).clone()
+        self.errors = []
+        self.line_starts = array('q', [0])
+        self._map = None
+
+    # La "entrada" de este lexer es la ruta del archivo.
+    def input(self, filename):
+        self.close()
+        self.filename = filename
+        self.line_starts = array('q', [0])
+        self._window_end = 0    # bytes del archivo ya cargados
+        self._char_base = 0     # caracteres antes de la ventana actual
+        with open(filename, 'rb') as file:
+            self._size = os.fstat(file.fileno()).st_size
+            if self._size:
+                self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.inner.input('')
+        self.inner.lineno = 1
+
+    @property
+    def lineno(self):
+        return self.inner.lineno
+
+    @lineno.setter
+    def lineno(self, value):
+        self.inner.lineno = value
+
+    # Posición global justo después del último token devuelto.
+    @property
+    def lexpos(self):
+        return self.inner.lexpos + self._char_base
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    # Carga la siguiente ventana; devuelve False al llegar al final.
+    def _next_window(self):
+        start = self._window_end
+        if self._map is None or start >= self._size:
+            self.close()
+            return False
+        end = min(start + self.window, self._size)
+        if end < self._size:
+            newline = self._map.rfind(b'\n', start, end)
+            if newline < 0:
+                newline = self._map.find(b'\n', end)
+            end = self._size if newline < 0 else newline + 1
+        chunk = _universal_newlines(self._map[start:end].decode('utf-8'))
+
+        self._char_base += len(self.inner.lexdata)
+        self._window_end = end
+        lineno = self.inner.lineno
+        self.inner.input(chunk)
+        self.inner.lineno = lineno
+        self.inner.errors = self.errors
+        self.inner.line_base = len(self.line_starts) - 1
+        self.inner.find_beyond = self._find_beyond
+        base = self._char_base
+        self.line_starts.extend(pos + base for pos in self.inner.line_starts[1:])
+        return True
+
+    # Busca `char` después de la ventana actual (lo usa t_error_string para
+    # encontrar la comilla de cierre) y devuelve su (línea, columna).
+    def _find_beyond(self, char):
+        pos = self._map.find(char.encode('utf-8'), self._window_end)
+        if pos < 0:
+            return None
+        segment = _universal_newlines(self._map[self._window_end:pos].decode('utf-8'))
+        line = len(self.line_starts) + segment.count('\n')
+        return line, len(segment) - segment.rfind('\n')
+
+    def token(self):
+        while True:
+            tok = self.inner.token()
+            if tok is not None:
+                tok.lexpos += self._char_base
+                tok.lexer = self
+                return tok
+            if not self._next_window():
+                return None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        tok = self.token()
+        if tok is None:
+            raise StopIteration
+        return tok
+
+    def find_line(self, lexpos):
+        """Número de línea (desde 1) de la posición global `lexpos`."""
+        return bisect_right(self.line_starts, lexpos)
+
+    def find_column(self, lexpos):
+        """Columna (desde 1) de la posición global `lexpos`."""
+        return lexpos - self.line_starts[bisect_right(self.line_starts, lexpos) - 1] + 1
+
+# Generador de tokens de un archivo mapeado en memoria.
+def stream_tokens(filename, window=1 << 20):
+    mapped = MappedLexer(window)
+    mapped.input(filename)
+    yield from mapped
+
+# Hash de las reglas del lexer: cambia si se modifica cualquier token,
+# expresión regular o el orden de las funciones t_.
+def _rules_hash():
+    rules = []
+    for name, value in sorted(globals().items()):
+        if not name.startswith('t_'):
+            continue
+        if callable(value):
+            rules.append((value.__code__.co_firstlineno, name, value.__doc__))
+        else:
+            rules.append((0, name, value))
+    rules.sort(key=lambda rule: (rule[0], rule[1]))
+    return table_cache.definitions_hash(lex.__version__, tokens, rules)
+
+# PLY siempre crea un lex.Lexer; se cambia su clase por la versión con índice.
+def _indexed(new_lexer):
+    new_lexer.__class__ = IndexedLexer
+    return new_lexer
+
+# Construye un lexer nuevo. La expresión maestra se lee de la caché en disco
+# si existe una tabla con el mismo hash; si no, se genera y se guarda.
+def _build_ply_lexer():
+    directory = table_cache.cache_dir()
+    if directory is None:
+        return _indexed(lex.lex())
+
+    tabname = f'lextab_{_rules_hash()}'
+    path = os.path.join(directory, tabname + '.py')
+    if os.path.exists(path):
+        lextab = types.ModuleType(tabname)
+        with open(path) as file:
+            exec(compile(file.read(), path, 'exec'), lextab.__dict__)
+        new_lexer = lex.lex(optimize=1, lextab=lextab)
+        # optimize=1 solo se usa para leer la tabla; se mantiene la
+        # validación de tipos de token que hace PLY en modo normal.
+        new_lexer.lexoptimize = 0
+        return _indexed(new_lexer)
+
+    new_lexer = lex.lex()
+    tmp_path = table_cache.temp_path(directory, '.py')
+    try:
+        new_lexer.writetab(os.path.basename(tmp_path)[:-3], directory)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return _indexed(new_lexer)
+
+# Motores disponibles: 'ply' (las reglas t_ de este archivo, vía PLY) y
+# 'fast' (fast_lexer.py: las mismas reglas en una sola expresión regular).
+ENGINES = ('ply', 'fast')
+
+# Construye un lexer nuevo del motor indicado.
+def build_lexer(engine='ply'):
+    if engine == 'fast':
+        from fast_lexer import FastLexer
+        return FastLexer()
+    if engine != 'ply':
+        raise ValueError(f"Motor de lexer desconocido: {engine}")
+    return _build_ply_lexer()
+
+_shared_lexers = {}
+_shared_lexers_lock = threading.Lock()
+
+# Devuelve el lexer compartido de cada motor, construyéndolo la primera vez
+# que se pide (una sola vez aunque lo pidan varios hilos).
+def get_lexer(engine='ply'):
+    if engine not in _shared_lexers:
+        with _shared_lexers_lock:
+            if engine not in _shared_lexers:
+                _shared_lexers[engine] = build_lexer(engine)
+    return _shared_lexers[engine]
+
+# Compatibilidad con `from lexer import lexer`: el lexer se construye
+# cuando alguien lo pide y no al importar el módulo.
+def __getattr__(name):
+    if name == 'lexer':
+        return get_lexer()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-lexer = lex.lex()
 # Función principal
 def main():
+    # Con --mmap el archivo se mapea en memoria y se lexea por ventanas
+    args = sys.argv[1:]
+    mapped = '--mmap' in args
+    if mapped:
+        args.remove('--mmap')
+    # Con --fast-lexer se usa el motor de fast_lexer.py
+    engine = 'fast' if '--fast-lexer' in args else 'ply'
+    if engine == 'fast':
+        args.remove('--fast-lexer')
+
     # Verificar si se pasó un argumento
-    if len(sys.argv) != 2:
-        print("Uso: python lexer.py archivo.imperat")
+    if len(args) != 1:
+        print("Uso: python lexer.py [--mmap] [--fast-lexer] archivo.imperat")
         sys.exit(1)
     # Verificar si el archivo tiene la extensión correcta
-    filename = sys.argv[1]
+    filename = args[0]
     if not filename.endswith('.imperat'):
         print("Error: El archivo debe tener extensión .imperat")
         sys.exit(1)
 
     # Crear el lexer
+    lexer = MappedLexer(lexer=get_lexer(engine)) if mapped else get_lexer(engine)
     try:
-        with open(filename, 'r') as file:
-            data = file.read()
+        if mapped:
+            data = filename
+        else:
+            with open(filename, 'r') as file:
+                data = file.read()
 
         lexer.input(data)
         lexer.lineno = 1
@@ -214,26 +458,28 @@ def main():
     # Verificar si hay errores en el lexer
         if hasattr(lexer, 'errors'):
             del lexer.errors
+        if mapped:
+            lexer.errors = []
 
-        while lexer.token(): pass
+        # Se lexea una sola vez: los tokens quedan en un buffer compacto
+        from token_buffer import buffer_tokens
+        buffer = buffer_tokens(lexer, None if mapped else data)
 
         if hasattr(lexer, 'errors') and lexer.errors:
             for l, c, msg in sorted(set(lexer.errors), key=lambda x: (x[0], x[1])):
                 print(f'Error: {msg} in row {l}, column {c}')
             sys.exit(1)
     # Si no hay errores, imprimir los tokens
-        lexer.input(data)
-        lexer.lineno = 1
-
-        # Imprimir los tokens
-        for token in lexer:
-            col = find_column(data, token.lexpos)
-            if token.type == 'TkNum':
-                print(f'{token.type}({token.value}) {token.lineno} {col}')
-            elif token.type in ['TkId', 'TkString']:
-                print(f'{token.type}("{token.value}") {token.lineno} {col}')
+        for i in range(len(buffer)):
+            kind = buffer.kind(i)
+            line = buffer.lines[i]
+            col = buffer.find_column(buffer.starts[i])
+            if kind == 'TkNum':
+                print(f'{kind}({buffer.value(i)}) {line} {col}')
+            elif kind in ['TkId', 'TkString']:
+                print(f'{kind}("{buffer.value(i)}") {line} {col}')
             else:
-                print(f'{token.type} {token.lineno} {col}')
+                print(f'{kind} {line} {col}')
 
 # Si hay errores en el lexer, imprimirlos
     except FileNotFoundError:
@@ -1,66 +1,285 @@
-# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036 
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+import argparse
+import io
+import json
+import os
+import signal
 import sys
-from lexer import lexer
-from parser import parser, parser_input_text
-from type_checker import TypeChecker
+import time
+from concurrent.futures import ProcessPoolExecutor
+from lexer import get_lexer, MappedLexer
+from parser import get_parser
+from compiler import compile_with
+from diagnostics import FAIL_FAST, POLICIES
+from ast_nodes import write_ast, iter_ast_lines
+from ast_arena import ArenaBuilder
+from result_cache import ResultCache, DEFAULT_MAX_BYTES
 from symbol_table import SymbolTable
+from evaluator import run_program, ExecutionError
+
+# Analiza un programa completo y devuelve (estado, salida).
+# El estado es 'ok', 'lexical', 'syntax', 'context' o 'error'. Si es 'ok' la
+# salida es el AST decorado (se imprime con write_ast); si no, es el mensaje
+# exacto que el programa imprime para ese archivo.
+# Con un MappedLexer, `data` es la ruta del archivo en vez de su contenido.
+# Con `arena`, el AST se guarda en arreglos (ast_arena) en lugar de objetos.
+# `errors` es la política del type checker (diagnostics.py). Por defecto se
+# detiene en el primer error, que es el único que se imprime; con 'all' el
+# mensaje tiene todos los errores, uno por línea.
+# Con `recover`, el parser se recupera de los errores de sintaxis y el mensaje
+# los tiene todos, uno por línea (por defecto se detiene en el primero).
+# Usa `lexer` y `parser` tal cual (ver compiler.compile_source para compilar
+# desde varios hilos).
+def analyze(data, lexer, parser, arena=False, errors=FAIL_FAST, recover=False):
+    result = compile_with(data, lexer, parser, ArenaBuilder() if arena else None, errors, recover)
+    return result.status, (result.ast if result.ok else result.message)
+
+# Como analyze, pero antes consulta la caché de resultados (result_cache.py)
+# con el contenido `raw` (bytes) del archivo. La salida siempre es texto (el
+# AST ya impreso) y en un acierto no se lexea, parsea ni chequea nada; el
+# lexer y el parser recién se piden si hay que analizar. La clave incluye el
+# lexer (`engine`), la política de errores y `recover`; `arena` no, porque el
+# AST impreso es el mismo.
+def analyze_cached(raw, cache, engine='ply', arena=False, errors=FAIL_FAST, recover=False):
+    key = cache.key(raw, engine=engine, errors=errors, recover=recover)
+    hit = cache.get(key)
+    if hit is not None:
+        return hit
+    # Misma decodificación que open(filename, 'r')
+    data = io.TextIOWrapper(io.BytesIO(raw)).read()
+    status, output = analyze(data, get_lexer(engine), get_parser(), arena, errors, recover)
+    if status == 'ok':
+        output = ''.join(iter_ast_lines(output))
+    cache.put(key, status, output)
+    return status, output
+
+# Ejecuta un programa chequeado (--run) con el backend `backend`: 'closures'
+# (evaluator.py), 'vm' (bytecode de vm.py) o 'python' (código de Python
+# generado por codegen.py).
+BACKENDS = ('closures', 'vm', 'python')
+
+def run_checked(ast, backend='closures'):
+    if backend == 'vm':
+        import vm
+        vm.execute(vm.compile_ast(ast))
+    elif backend == 'python':
+        import codegen
+        codegen.run_program(ast)
+    else:
+        run_program(ast)
+
+# --- Modo batch -----------------------------------------------------------
+
+# Excepción usada por el temporizador de cada archivo. Hereda de
+# BaseException para que no la atrape el `except Exception` de analyze.
+class _Timeout(BaseException):
+    pass
+
+def _on_timeout(signum, frame):
+    raise _Timeout()
+
+_worker_lexer = None
+_worker_parser = None
+_worker_timeout = None
+_worker_arena = False
+_worker_errors = FAIL_FAST
+_worker_recover = False
+_worker_engine = 'ply'
+_worker_cache = None
+
+# Cada proceso del pool construye su lexer y su parser una sola vez.
+# `cache` es (directorio, tamaño máximo) de la caché de resultados, o None.
+def _init_worker(timeout, engine='ply', arena=False, errors=FAIL_FAST, recover=False, cache=None):
+    global _worker_lexer, _worker_parser, _worker_timeout, _worker_arena, _worker_errors, _worker_recover
+    global _worker_engine, _worker_cache
+    _worker_lexer = get_lexer(engine)
+    _worker_parser = get_parser()
+    _worker_timeout = timeout
+    _worker_arena = arena
+    _worker_errors = errors
+    _worker_recover = recover
+    _worker_engine = engine
+    _worker_cache = ResultCache(*cache) if cache is not None else None
+    if timeout:
+        signal.signal(signal.SIGALRM, _on_timeout)
+
+# Analiza un archivo dentro de un worker y devuelve su resultado.
+def _check_file(filename):
+    start = time.perf_counter()
+    try:
+        if _worker_timeout:
+            signal.setitimer(signal.ITIMER_REAL, _worker_timeout)
+        try:
+            if _worker_cache is not None:
+                with open(filename, 'rb') as file:
+                    raw = file.read()
+                status, output = analyze_cached(raw, _worker_cache, _worker_engine, _worker_arena,
+                                                _worker_errors, _worker_recover)
+            else:
+                with open(filename, 'r') as file:
+                    data = file.read()
+                status, output = analyze(data, _worker_lexer, _worker_parser, _worker_arena,
+                                         _worker_errors, _worker_recover)
+        except OSError:
+            status, output = 'error', f"Error: No se pudo abrir el archivo {filename}"
+        finally:
+            if _worker_timeout:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except _Timeout:
+        status, output = 'timeout', f"Error: Se excedió el tiempo límite de {_worker_timeout}s"
+
+    result = {'file': filename, 'status': status}
+    if status != 'ok':
+        result['message'] = output
+    result['time'] = round(time.perf_counter() - start, 6)
+    return result
+
+# Busca recursivamente los archivos .imperat. El orden es determinista.
+def _collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, names in os.walk(path):
+                dirs.sort()
+                files.extend(os.path.join(root, name) for name in sorted(names)
+                             if name.endswith('.imperat'))
+        else:
+            files.append(path)
+    return files
+
+# Analiza muchos archivos repartidos en un pool de procesos. Los resultados
+# se escriben como NDJSON (una línea por archivo) en el mismo orden de
+# los archivos, a medida que van estando listos.
+def run_batch(paths, jobs=None, timeout=None, engine='ply', out=sys.stdout, arena=False,
+              errors=FAIL_FAST, recover=False, cache=None):
+    files = _collect_files(paths)
+    jobs = jobs or os.cpu_count() or 1
+    failures = 0
+
+    if jobs == 1:
+        _init_worker(timeout, engine, arena, errors, recover, cache)
+        results = map(_check_file, files)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                       initargs=(timeout, engine, arena, errors, recover, cache))
+        chunksize = max(1, len(files) // (jobs * 4))
+        results = executor.map(_check_file, files, chunksize=chunksize)
+
+    try:
+        for result in results:
+            if result['status'] != 'ok':
+                failures += 1
+            out.write(json.dumps(result, ensure_ascii=False) + '\n')
+            out.flush()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    return failures
 
 def main():
+    arg_parser = argparse.ArgumentParser(
+        usage="python parse.py <filename.imperat>\n"
+              "       python parse.py --batch <dir|file>... [-j N] [--timeout SEG]")
+    arg_parser.add_argument('files', nargs='*')
+    arg_parser.add_argument('--batch', action='store_true',
+                            help='analiza muchos archivos y reporta NDJSON')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+                            help='procesos del pool (por defecto, uno por CPU)')
+    arg_parser.add_argument('--timeout', type=float, default=None,
+                            help='tiempo máximo por archivo, en segundos')
+    arg_parser.add_argument('--mmap', action='store_true',
+                            help='mapea el archivo en memoria y lo lexea por ventanas')
+    arg_parser.add_argument('--fast-lexer', action='store_true',
+                            help='usa el lexer de fast_lexer.py en lugar del de PLY')
+    arg_parser.add_argument('--arena', action='store_true',
+                            help='guarda el AST en arreglos paralelos (ast_arena.py)')
+    arg_parser.add_argument('--errors', choices=POLICIES, default=FAIL_FAST,
+                            help="errores de contexto: 'all' los reporta todos, uno por línea "
+                                 "(por defecto solo el primero)")
+    arg_parser.add_argument('--recover', action='store_true',
+                            help='se recupera de los errores de sintaxis y los reporta todos, '
+                                 'uno por línea')
+    arg_parser.add_argument('--cache', action='store_true',
+                            help='consulta y guarda los resultados en la caché en disco '
+                                 '(no se usa con --mmap)')
+    arg_parser.add_argument('--cache-dir', default=None,
+                            help='directorio de la caché (por defecto __pycache__/results)')
+    arg_parser.add_argument('--cache-size', type=float, default=DEFAULT_MAX_BYTES / (1 << 20),
+                            help='tamaño máximo de la caché, en MB')
+    arg_parser.add_argument('--cache-stats', action='store_true',
+                            help='muestra los contadores de la caché y termina')
+    arg_parser.add_argument('--run', action='store_true',
+                            help='ejecuta el programa en lugar de imprimir el AST')
+    arg_parser.add_argument('--backend', choices=BACKENDS, default='closures',
+                            help="con --run: 'closures' (evaluator.py), 'vm' (vm.py) o 'python' (codegen.py)")
+    args = arg_parser.parse_args()
+
+    cache = None
+    if args.cache or args.cache_stats:
+        cache = ResultCache(args.cache_dir, int(args.cache_size * (1 << 20)))
+    if args.cache_stats:
+        print(json.dumps(cache.stats()))
+        sys.exit(0)
+
+    engine = 'fast' if args.fast_lexer else 'ply'
+    if args.run and (args.batch or cache is not None):
+        arg_parser.error("--run no se usa con --batch ni con --cache")
+    if args.batch:
+        if not args.files:
+            arg_parser.error("--batch requiere al menos un directorio o archivo")
+        failures = run_batch(args.files, args.jobs, args.timeout, engine, arena=args.arena,
+                             errors=args.errors, recover=args.recover,
+                             cache=(cache.directory, cache.max_bytes) if cache else None)
+        sys.exit(1 if failures else 0)
+
     # Verificar que se ha pasado un argumento de línea de comandos
-    if len(sys.argv) != 2:
+    if len(args.files) != 1:
         print("Usage: python parse.py <filename.imperat>")
         sys.exit(1)
-    
-    filename = sys.argv[1]
+
+    filename = args.files[0]
     if not filename.endswith('.imperat'):
         print("Error: El archivo debe tener extensión .imperat")
         sys.exit(1)
-    
+
     # Verificar que el archivo existe y no está vacío
     try:
-        with open(filename, 'r') as file:
-            data = file.read()
-        
-        if not data:
-            print("Error: El archivo está vacío")
-            sys.exit(1)
-        
-        # Análisis léxico
-        lexer.input(data)
-        lexer.lineno = 1
-        
-        # Verificar errores léxicos
-        if hasattr(lexer, 'errors') and lexer.errors:
-            for error in sorted(set(lexer.errors), key=lambda x: (x[0], x[1]))[:1]:
-                print(f"Lexical Error: {error[2]} in row {error[0]}, column {error[1]}")
-            sys.exit(1)
-        
-        # Análisis sintáctico
-        globals()['parser_input_text'] = data
-        ast = parser.parse(lexer=lexer)
-        
-        if ast is None:
-            print("Error: No se pudo generar el AST (posible error de sintaxis)")
-            sys.exit(1)
-        
-        # Análisis de contexto
-        type_checker = TypeChecker()
-        errors = type_checker.check_program(ast)
-        
-        if errors:
-    # Si el enunciado pide el error sin prefijo:
-            print(errors[0]) 
-    # Si el prefijo "Context Error:" es correcto, mantenlo como está:
-    # print(f"Context Error: {errors[0]}")
-            sys.exit(1)
-        else:
-            # Imprimir AST decorado
-            ast_output = str(ast).strip()
-            if ast_output:
-                print(ast_output)
+        if args.mmap:
+            # El archivo no se lee completo: el lexer lo recorre por ventanas
+            if os.path.getsize(filename) == 0:
+                status, output = analyze('', None, None)
             else:
-                print("Warning: El AST generado está vacío")
-            
+                status, output = analyze(filename, MappedLexer(lexer=get_lexer(engine)), get_parser(),
+                                         args.arena, args.errors, args.recover)
+        elif cache is not None:
+            with open(filename, 'rb') as file:
+                raw = file.read()
+            status, output = analyze_cached(raw, cache, engine, args.arena, args.errors,
+                                            args.recover)
+            if status == 'ok':
+                sys.stdout.write(output)
+                return
+        else:
+            with open(filename, 'r') as file:
+                data = file.read()
+
+            status, output = analyze(data, get_lexer(engine), get_parser(), args.arena, args.errors,
+                                     args.recover)
+        if status == 'ok' and args.run:
+            try:
+                run_checked(output, args.backend)
+            except ExecutionError as e:
+                sys.stdout.flush()
+                print(e.args[0])
+                sys.exit(1)
+        elif status == 'ok':
+            # El AST se escribe a medida que se recorre, sin armar el string
+            write_ast(output, sys.stdout)
+        else:
+            print(output)
+            sys.exit(1)
+
     except FileNotFoundError:
         print(f"Error: No se pudo abrir el archivo {filename}")
         sys.exit(1)
@@ -69,4 +288,4 @@ def main():
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
\ No newline at end of file
+    main()
@@ -1,8 +1,13 @@
+import copy
 import os
 import ply.yacc as yacc
 from lexer import tokens
 from ast_nodes import *
+from gcl_types import INT, BOOL, FunctionType
 import sys
+import threading
+import table_cache
+from diagnostics import Diagnostic
 
 
 precedence = (
@@ -21,34 +26,32 @@ def p_program(p):
     '''program : block'''
     p[0] = p[1]
 
+# Los nodos se crean con el builder del parser (ver NodeBuilder en ast_nodes),
+# que puede construir objetos o guardarlos en un arena (ast_arena).
 def p_block(p):
     '''block : TkOBlock opt_stmt_list TkCBlock'''
-    block_node = Block()
+    b = p.parser.builder
+    block_node = b.node(Block)
     all_items = p[2] if p[2] is not None else []
     
-    declarations = [item for item in all_items if isinstance(item, Declare)]
-    statements = [item for item in all_items if not isinstance(item, Declare)]
+    declarations = [item for item in all_items if b.kind(item) is Declare]
+    statements = [item for item in all_items if b.kind(item) is not Declare]
 
     for decl in declarations:
-        block_node.add_child(decl)
+        b.add_child(block_node, decl)
     
     # Construir secuencia anidada
     if len(statements) > 1:
         # Empezar con las dos primeras sentencias
-        sequence_tree = Sequencing()
-        sequence_tree.add_child(statements[0])
-        sequence_tree.add_child(statements[1])
+        sequence_tree = b.node(Sequencing, None, None, statements[0], statements[1])
 
         # Agregar el resto de las sentencias una por una
         for i in range(2, len(statements)):
-            new_root = Sequencing()
-            new_root.add_child(sequence_tree)
-            new_root.add_child(statements[i])
-            sequence_tree = new_root
+            sequence_tree = b.node(Sequencing, None, None, sequence_tree, statements[i])
         
-        block_node.add_child(sequence_tree)
+        b.add_child(block_node, sequence_tree)
     elif len(statements) == 1:
-        block_node.add_child(statements[0])
+        b.add_child(block_node, statements[0])
     
     p[0] = block_node
 
@@ -57,13 +60,20 @@ def p_opt_stmt_list(p):
                      | empty'''
     p[0] = p[1] if p[1] else []
 
+# Las listas son recursivas por la izquierda: cada reducción agrega un
+# elemento al final de la misma lista, así que construirlas es lineal y la
+# pila del parser no crece con el largo de la lista.
+# Las sentencias con error de sintaxis (None, ver p_statement_error) no
+# entran en la lista.
 def p_stmt_list(p):
     '''stmt_list : statement
-                 | statement TkSemicolon stmt_list'''
+                 | stmt_list TkSemicolon statement'''
     if len(p) == 2:
-        p[0] = [p[1]]
+        p[0] = [p[1]] if p[1] is not None else []
     else:
-        p[0] = [p[1]] + p[3]
+        if p[3] is not None:
+            p[1].append(p[3])
+        p[0] = p[1]
 
 def p_statement(p):
     '''statement : declaration_stmt
@@ -75,6 +85,14 @@ def p_statement(p):
                  | while_stmt
                  | block'''
     p[0] = p[1]
+    p.parser.builder.statement(p[1], p)
+
+# Recuperación de errores (solo con parse_program(..., recover=True)): una
+# sentencia mal escrita se descarta hasta el próximo ';' o '}' y el parser
+# sigue con la siguiente. La sentencia queda como None (p_stmt_list la saca).
+def p_statement_error(p):
+    '''statement : error'''
+    p[0] = None
 
 def p_declaration_stmt(p):
     '''declaration_stmt : TkInt declare_id_list
@@ -82,130 +100,123 @@ def p_declaration_stmt(p):
                         | TkFunction TkOBracket TkSoForth TkNum TkCBracket declare_id_list'''
     #Creamos el nodo guardando la ubicación del primer token (int, bool, etc.)
     lineno = p.lineno(1)
-    col_offset = find_column(p.lexer.lexdata, p.lexpos(1))
+    col_offset = p.lexer.find_column(p.lexpos(1))
     
     end_lineno = None
     end_col_offset = None
     bound_lineno = None      
     bound_col_offset = None 
     if p[1] == 'int':
-        decl_str = f"{p[2]}:int"
+        names, var_type = p[2], INT
     elif p[1] == 'bool':
-        decl_str = f"{p[2]}:bool"
+        names, var_type = p[2], BOOL
     else:
-        num_val = p[4]
-        decl_str = f"{p[6]}:function[..{num_val}]"
+        names, var_type = p[6], FunctionType(p[4])
         end_lineno = p.lineno(5)
-        end_col_offset = find_column(p.lexer.lexdata, p.lexpos(5))
+        end_col_offset = p.lexer.find_column(p.lexpos(5))
         bound_lineno = p.lineno(3)
-        bound_col_offset = find_column(p.lexer.lexdata, p.lexpos(3))
+        bound_col_offset = p.lexer.find_column(p.lexpos(3))
     
-    declare_node = Declare(lineno=lineno, 
-        col_offset=col_offset,
+    p[0] = p.parser.builder.declare(names, var_type, lineno, col_offset,
         end_lineno=end_lineno,
         end_col_offset=end_col_offset,
         bound_lineno=bound_lineno,         
         bound_col_offset=bound_col_offset)
-    
-    declare_node.add_child(decl_str)
-    p[0] = declare_node
 
+# Lista de nombres declarados en una misma declaración.
 def p_declare_id_list(p):
     '''declare_id_list : TkId
-                       | TkId TkComma declare_id_list'''
+                       | declare_id_list TkComma TkId'''
     if len(p) == 2:
-        p[0] = p[1]
+        p[0] = [p[1]]
     else:
-        p[0] = f"{p[1]},{p[3]}"
+        p[1].append(p[3])
+        p[0] = p[1]
 
 def p_assignment_stmt(p):
     '''assignment_stmt : TkId TkAsig expr'''
-    node = Asig()
+    b = p.parser.builder
     #Guardar la ubicación del operador de asignación (token 2)
     start_pos = p.lexspan(2)[0]
-    node.lineno = p.lineno(2)
-    node.col_offset = find_column(p.lexer.lexdata, start_pos)
-
     lineno_id = p.lineno(1)
-    col_offset_id = find_column(p.lexer.lexdata, p.lexpos(1))
-    node.add_child(Ident(p[1], lineno_id, col_offset_id))
-    node.add_child(p[3])
-    p[0] = node
+    col_offset_id = p.lexer.find_column(p.lexpos(1))
+    p[0] = b.node(Asig, p.lineno(2), p.lexer.find_column(start_pos),
+                  b.ident(p[1], lineno_id, col_offset_id), p[3])
 
 def p_print_stmt(p):
     '''print_stmt : TkPrint expr'''
-    node = Print()
-    node.add_child(p[2])
-    p[0] = node
+    p[0] = p.parser.builder.node(Print, None, None, p[2])
 
 def p_skip_stmt(p):
     '''skip_stmt : TkSkip'''
-    p[0] = skip()
+    p[0] = p.parser.builder.node(skip)
 
 def p_return_stmt(p):
     '''return_stmt : TkReturn expr'''
-    node = Return()
-    node.add_child(p[2])
-    p[0] = node
+    p[0] = p.parser.builder.node(Return, None, None, p[2])
 
 def p_while_stmt(p):
     '''while_stmt : TkWhile expr TkArrow body_sequencing TkEnd'''
-    while_node = While()
-    then_node = Then()
-    then_node.lineno = p.lineno(3)
-    then_node.col_offset = find_column(p.lexer.lexdata, p.lexpos(3))
-    then_node.add_child(p[2])
-    then_node.add_child(p[4])
-    while_node.add_child(then_node)
-    p[0] = while_node
+    b = p.parser.builder
+    then_node = b.node(Then, p.lineno(3), p.lexer.find_column(p.lexpos(3)), p[2], p[4])
+    p[0] = b.node(While, None, None, then_node)
+
+# Recuperación dentro de un while o un if: un cuerpo con errores se descarta
+# hasta el 'end' del while, o hasta el próximo '[]' o 'fi' del if, y queda
+# como una secuencia vacía. No se recupera por sentencia como en los bloques
+# porque el estado "error" sería el mismo en los dos cuerpos y en LALR
+# aceptaría 'fi' dentro de un while (y viceversa): el parser quedaría
+# reduciendo y fallando sobre el mismo token para siempre.
+def p_while_stmt_error(p):
+    '''while_stmt : TkWhile expr TkArrow error TkEnd'''
+    b = p.parser.builder
+    then_node = b.node(Then, p.lineno(3), p.lexer.find_column(p.lexpos(3)), p[2], b.node(Sequencing))
+    p[0] = b.node(While, None, None, then_node)
 
 def p_if_stmt(p):
     '''if_stmt : TkIf if_guards_list TkFi'''
-    if_node = If()
     # p[2] es una lista de nodos Guard
-    for guard_node in p[2]:
-        if_node.add_child(guard_node)
-    p[0] = if_node
+    p[0] = p.parser.builder.node(If, None, None, *p[2])
 
 def p_if_guards_list(p):
     '''if_guards_list : if_guard_clause
-                     | if_guard_clause TkGuard if_guards_list'''
+                     | if_guards_list TkGuard if_guard_clause'''
     if len(p) == 2:
         p[0] = [p[1]]
     else:
-        p[0] = [p[1]] + p[3]
+        p[1].append(p[3])
+        p[0] = p[1]
 
 def p_if_guard_clause(p):
     '''if_guard_clause : expr TkArrow body_sequencing'''
-    guard_node = Guard()
-    guard_node.lineno = p.lineno(2)
-    guard_node.col_offset = find_column(p.lexer.lexdata, p.lexpos(2))
-    guard_node.add_child(p[1]) # Condición
-    guard_node.add_child(p[3]) # Cuerpo
-    p[0] = guard_node
+    # Hijos: la condición y el cuerpo
+    p[0] = p.parser.builder.node(Guard, p.lineno(2), p.lexer.find_column(p.lexpos(2)),
+                                 p[1], p[3])
+
+
+def p_if_guard_clause_error(p):
+    '''if_guard_clause : expr TkArrow error'''
+    b = p.parser.builder
+    p[0] = b.node(Guard, p.lineno(2), p.lexer.find_column(p.lexpos(2)), p[1], b.node(Sequencing))
 
 
 def p_body_sequencing(p):
     '''body_sequencing : body_stmt_item
-                       | body_stmt_item TkSemicolon body_sequencing'''
+                       | body_sequencing TkSemicolon body_stmt_item'''
+    b = p.parser.builder
     if len(p) == 2:
         # Si es un solo item, no se necesita secuenciador
-        if isinstance(p[1], (Block, Asig, Print, skip, Return, If, While)):
+        if issubclass(b.kind(p[1]), (Block, Asig, Print, skip, Return, If, While)):
             p[0] = p[1]
         else:
-            seq_node = Sequencing()
-            seq_node.add_child(p[1])
-            p[0] = seq_node
+            p[0] = b.node(Sequencing, None, None, p[1])
     else:
-        #Si el lado derecho ya es una secuencia, agregar al inicio
-        if isinstance(p[3], Sequencing):
-            p[3].children.insert(0, p[1])
-            p[0] = p[3]
+        #Si el lado izquierdo ya es una secuencia, agregar al final
+        if issubclass(b.kind(p[1]), Sequencing):
+            b.add_child(p[1], p[3])
+            p[0] = p[1]
         else: #Si no, crear una nueva secuencia
-            seq_node = Sequencing()
-            seq_node.add_child(p[1])
-            seq_node.add_child(p[3])
-            p[0] = seq_node
+            p[0] = b.node(Sequencing, None, None, p[1], p[3])
 
 def p_body_stmt_item(p):
     '''body_stmt_item : assignment_stmt
@@ -216,6 +227,7 @@ def p_body_stmt_item(p):
                       | while_stmt
                       | block'''
     p[0] = p[1]
+    p.parser.builder.statement(p[1], p)
 
 def p_expr_binop(p):
     '''expr : expr TkPlus expr
@@ -231,44 +243,36 @@ def p_expr_binop(p):
             | expr TkGeq expr
             | expr TkComma expr
             | expr TkTwoPoints expr'''
-    if p[2] == '+': node = Plus()
-    elif p[2] == '-': node = Minus()
-    elif p[2] == '*': node = Mult()
-    elif p[2] == 'and': node = And()
-    elif p[2] == 'or': node = Or()
-    elif p[2] == '==': node = Equal()
-    elif p[2] == '<>': node = NotEqual()
-    elif p[2] == '<': node = Less()
-    elif p[2] == '>': node = Greater()
-    elif p[2] == '<=': node = Leq()
-    elif p[2] == '>=': node = Geq()
-    elif p[2] == ',': node = Comma()
-    elif p[2] == ':': node = TwoPoints()
+    if p[2] == '+': cls = Plus
+    elif p[2] == '-': cls = Minus
+    elif p[2] == '*': cls = Mult
+    elif p[2] == 'and': cls = And
+    elif p[2] == 'or': cls = Or
+    elif p[2] == '==': cls = Equal
+    elif p[2] == '<>': cls = NotEqual
+    elif p[2] == '<': cls = Less
+    elif p[2] == '>': cls = Greater
+    elif p[2] == '<=': cls = Leq
+    elif p[2] == '>=': cls = Geq
+    elif p[2] == ',': cls = Comma
+    elif p[2] == ':': cls = TwoPoints
     else: raise ValueError(f"Operador binario desconocido: {p[2]}")
     start_pos = p.lexspan(2)[0]
-    node.lineno = p.lineno(2)
-    node.col_offset = find_column(p.lexer.lexdata, start_pos)
-    node.add_child(p[1])
-    node.add_child(p[3])
-    p[0] = node
+    if cls is Comma:
+        # Las listas a, b, c, ... se acumulan en un solo nodo Comma
+        p[0] = p.parser.builder.comma(p[1], p[3], p.lineno(2), p.lexer.find_column(start_pos))
+    else:
+        p[0] = p.parser.builder.node(cls, p.lineno(2), p.lexer.find_column(start_pos), p[1], p[3])
 
 def p_expr_uminus(p):
     'expr : TkMinus expr %prec UMINUS'
-    node = Minus()
     start_pos = p.lexspan(1)[0]
-    node.lineno = p.lineno(1)
-    node.col_offset = find_column(p.lexer.lexdata, start_pos)
-    node.add_child(p[2])
-    p[0] = node
+    p[0] = p.parser.builder.node(Minus, p.lineno(1), p.lexer.find_column(start_pos), p[2])
 
 def p_expr_not(p):
     'expr : TkNot expr'
-    node = Not()
     start_pos = p.lexspan(1)[0]
-    node.lineno = p.lineno(1)
-    node.col_offset = find_column(p.lexer.lexdata, start_pos)
-    node.add_child(p[2])
-    p[0] = node
+    p[0] = p.parser.builder.node(Not, p.lineno(1), p.lexer.find_column(start_pos), p[2])
 
 def p_expr_atom(p):
     '''expr : atom'''
@@ -282,26 +286,14 @@ def p_atom(p):
     if len(p) == 2:
         p[0] = p[1]
     elif p.slice[2].type == 'TkApp':
-        node = ReadFunction()
-        
         # Usamos lexspan para obtener la posición de inicio garantizada
         start_pos = p.lexspan(2)[0]
-        node.lineno = p.lineno(2)
-        node.col_offset = find_column(p.lexer.lexdata, start_pos)
-
-        node.add_child(p[1])
-        node.add_child(p[3])
-        p[0] = node
+        p[0] = p.parser.builder.node(ReadFunction, p.lineno(2), p.lexer.find_column(start_pos),
+                                     p[1], p[3])
     elif p.slice[2].type == 'TkOpenPar':
-        node = App()
-        
         start_pos = p.lexspan(2)[0]
-        node.lineno = p.lineno(2)
-        node.col_offset = find_column(p.lexer.lexdata, start_pos)
-
-        node.add_child(p[1])
-        node.add_child(p[3])
-        p[0] = node
+        p[0] = p.parser.builder.node(App, p.lineno(2), p.lexer.find_column(start_pos),
+                                     p[1], p[3])
 
 def p_simple_atom(p):
     '''simple_atom : TkId
@@ -310,26 +302,25 @@ def p_simple_atom(p):
                    | TkFalse
                    | TkString
                    | TkOpenPar expr TkClosePar'''
+    b = p.parser.builder
     if p.slice[1].type == 'TkId':
         lineno = p.lineno(1)
-        col_offset = find_column(p.lexer.lexdata, p.lexpos(1))
-        p[0] = Ident(p[1], lineno, col_offset)
+        col_offset = p.lexer.find_column(p.lexpos(1))
+        p[0] = b.ident(p[1], lineno, col_offset)
     elif p.slice[1].type == 'TkNum':
         lineno = p.lineno(1)
-        col_offset = find_column(p.lexer.lexdata, p.lexpos(1))
-        p[0] = Literal(p[1], lineno, col_offset) # Pasamos la ubicación
+        col_offset = p.lexer.find_column(p.lexpos(1))
+        p[0] = b.literal(p[1], lineno, col_offset) # Pasamos la ubicación
     elif p.slice[1].type in ['TkTrue', 'TkFalse']:
         lineno = p.lineno(1)
-        col_offset = find_column(p.lexer.lexdata, p.lexpos(1))
-        p[0] = Literal(p[1], lineno, col_offset) # Pasamos la ubicación
+        col_offset = p.lexer.find_column(p.lexpos(1))
+        p[0] = b.literal(p[1], lineno, col_offset) # Pasamos la ubicación
     elif p.slice[1].type == 'TkString':
         # Los strings también necesitan ubicación si quieres reportar errores sobre ellos
         lineno = p.lineno(1)
-        col_offset = find_column(p.lexer.lexdata, p.lexpos(1))
+        col_offset = p.lexer.find_column(p.lexpos(1))
         valor_con_comillas = f'"{p[1]}"'
-        p[0] = String(valor_con_comillas)
-        p[0].lineno = lineno
-        p[0].col_offset = col_offset
+        p[0] = b.string(valor_con_comillas, lineno, col_offset)
     elif p.slice[1].type == 'TkOpenPar': 
         p[0] = p[2]
 
@@ -337,18 +328,103 @@ def p_empty(p):
     '''empty :'''
     p[0] = None
 
-def find_column(input_str, token_lexpos):
-    last_cr = input_str.rfind('\n', 0, token_lexpos)
-    return (token_lexpos - last_cr) if last_cr >= 0 else token_lexpos + 1
+# Error sintáctico. Se lanza desde p_error en lugar de terminar el
+# proceso, para que quien llama al parser decida qué hacer con él. Su
+# argumento es el Diagnostic del error (str(e) es el mensaje).
+class ParseError(Exception):
+    pass
 
-parser_input_text = ""
-def p_error(p):
+_UNEXPECTED_TOKEN = "Sintax error in row {line}, column {col}: unexpected token '{value}'."
+_UNEXPECTED_EOF = "Syntax error at EOF."
+
+# Error de sintaxis en el token `p` (None al final de la entrada).
+def syntax_error(p):
     if p:
-        col = find_column(p.lexer.lexdata, p.lexpos)
-        print(f"Sintax error in row {p.lineno}, column {col}: unexpected token '{p.value}'.")
-    else:
-        print("Syntax error at EOF.")
-    sys.exit(1)
+        return Diagnostic(_UNEXPECTED_TOKEN, p.lineno, p.lexer.find_column(p.lexpos), value=p.value)
+    return Diagnostic(_UNEXPECTED_EOF)
 
-# Construcción del parser
-parser = yacc.yacc(debug=False, write_tables=False)
\ No newline at end of file
+def p_error(p):
+    raise ParseError(syntax_error(p))
+
+# Parsea la entrada de `lexer` y devuelve (raíz, errores de sintaxis).
+# Sin `recover`, el primer error lanza ParseError. Con `recover`, cada error se
+# guarda y el parser se resincroniza en el próximo ';' o '}' de un bloque,
+# '[]' o 'fi' de un if, o 'end' de un while (las producciones con `error`):
+# la raíz es el AST sin las partes erróneas, o None si la entrada terminó
+# antes de poder cerrarlo.
+# PLY no reporta otro error hasta haber avanzado tres tokens desde el último,
+# así que los errores en cascada no se repiten.
+# `builder` reemplaza al del parser (por ejemplo un ast_arena.ArenaBuilder);
+# el parser compartido no se modifica. `tokenfunc`, si se pasa, reemplaza a
+# lexer.token como fuente de tokens. Con `tracking` PLY guarda dónde empieza y
+# termina cada símbolo (p.lexspan), a costa de parsear algo más lento.
+def parse_program(lexer, parser=None, recover=False, builder=None, tokenfunc=None,
+                  tracking=False):
+    if parser is None:
+        parser = get_parser()
+    errors = []
+    if recover or builder is not None:
+        parser = copy.copy(parser)
+        if builder is not None:
+            parser.builder = builder
+        if recover:
+            parser.errorfunc = lambda p: errors.append(syntax_error(p))
+    root = parser.parse(lexer=lexer, tokenfunc=tokenfunc, tracking=tracking)
+    return root, errors
+
+# Hash de la gramática: tokens, precedencias y el docstring de cada p_
+# en orden de definición. Si cambia algo la tabla vieja deja de usarse.
+def _grammar_hash():
+    rules = sorted(
+        (value.__code__.co_firstlineno, name, value.__doc__)
+        for name, value in globals().items()
+        if name.startswith('p_') and callable(value)
+    )
+    return table_cache.definitions_hash(yacc.__version__, tokens, precedence, rules)
+
+# Construcción del parser. La tabla LALR se guarda en disco (pickle) y se
+# reutiliza mientras la gramática no cambie. Por defecto el parser construye
+# objetos ASTNode (ver ast_arena.parse_to_arena para la otra opción).
+def build_parser():
+    new_parser = _build_tables()
+    new_parser.builder = NodeBuilder()
+    return new_parser
+
+def _build_tables():
+    directory = table_cache.cache_dir()
+    if directory is None:
+        return yacc.yacc(debug=False, write_tables=False)
+
+    path = os.path.join(directory, f'parsetab_{_grammar_hash()}.pickle')
+    if os.path.exists(path):
+        try:
+            return yacc.yacc(debug=False, write_tables=False, picklefile=path)
+        except Exception:
+            pass # Tabla ilegible: se regenera abajo
+
+    tmp_path = table_cache.temp_path(directory, '.pickle')
+    new_parser = yacc.yacc(debug=False, write_tables=False, picklefile=tmp_path)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+    return new_parser
+
+_shared_parser = None
+_shared_parser_lock = threading.Lock()
+
+# Devuelve el parser compartido, construyéndolo en el primer uso (una sola
+# vez aunque lo pidan varios hilos).
+def get_parser():
+    global _shared_parser
+    if _shared_parser is None:
+        with _shared_parser_lock:
+            if _shared_parser is None:
+                _shared_parser = build_parser()
+    return _shared_parser
+
+# Compatibilidad con `from parser import parser`.
+def __getattr__(name):
+    if name == 'parser':
+        return get_parser()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -0,0 +1,69 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Resolución de nombres. Después del type checker, asigna a cada variable
+# declarada un lugar (nivel del bloque, posición en su marco) y lo guarda en
+# cada Ident que la usa, para que un evaluador acceda a las variables por
+# índice en lugar de buscarlas por nombre.
+#
+# Cada Block tiene un marco con una posición por variable declarada, en orden
+# de declaración: `frame_size` es su tamaño y `depth` su nivel (0 para el
+# bloque del programa). Los marcos también se pueden aplanar en uno solo por
+# programa: el de un bloque empieza donde termina el de su padre
+# (`frame_offset`), y los bloques hermanos reusan las mismas posiciones.
+from ast_nodes import Block, Declare, Ident
+
+# Marca en la pila: se terminó de recorrer un bloque.
+_EXIT_BLOCK = object()
+
+
+def resolve(root, flatten=False):
+    """
+    Resuelve los Ident del AST `root` y devuelve el tamaño del marco
+    aplanado del programa. Con flatten=True, `slot` de cada Ident es la
+    posición en ese marco único; si no, la posición en el marco de su bloque.
+    Los Ident que no corresponden a ninguna declaración quedan con None.
+    """
+    bindings = {}  # nombre -> pila de (nivel, slot), la más interna al final
+    frames = []  # bloques abiertos, con los nombres que declaró cada uno
+    program_size = 0
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if node is _EXIT_BLOCK:
+            for name in frames.pop()[1]:
+                binding = bindings[name]
+                binding.pop()
+                if not binding:
+                    del bindings[name]
+            continue
+
+        if isinstance(node, Ident):
+            binding = bindings.get(node.name)
+            if binding:
+                node.depth, node.slot = binding[-1]
+            continue
+
+        if isinstance(node, Block):
+            if frames:
+                parent = frames[-1][0]
+                offset = parent.frame_offset + parent.frame_size
+            else:
+                offset = 0
+            # nombre -> posición en el marco, en orden de declaración
+            names = {}
+            for child in node.children:
+                if isinstance(child, Declare):
+                    for name in child.names:
+                        names.setdefault(name, len(names))
+            level = len(frames)
+            for name, index in names.items():
+                slot = offset + index if flatten else index
+                bindings.setdefault(name, []).append((level, slot))
+            node.depth = level
+            node.frame_size = len(names)
+            node.frame_offset = offset
+            program_size = max(program_size, offset + len(names))
+            frames.append((node, names))
+            stack.append(_EXIT_BLOCK)
+
+        stack.extend(reversed(node.children))
+    return program_size
@@ -0,0 +1,203 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Caché en disco de resultados del front-end. La clave es un hash del
+# contenido del archivo, de la versión del front-end (el código de los
+# módulos que determinan la salida) y de las opciones que cambian la salida,
+# así que un archivo que no cambió se responde sin lexear, parsear ni
+# chequear. Se guarda el estado y la salida exacta de parse.py: el mensaje
+# de error o el AST decorado.
+#
+# Cada entrada es un archivo <dir>/<2 primeros dígitos>/<clave>, escrito en un
+# temporal y publicado con os.replace: varios procesos pueden leer y escribir
+# la misma caché a la vez. El tamaño total está acotado: cuando se pasa del
+# límite se borran las entradas usadas hace más tiempo (cada acierto
+# actualiza la fecha de modificación de la entrada). Los contadores (aciertos,
+# fallos, bytes) están en stats.json y se actualizan con un flock.
+import fcntl
+import hashlib
+import json
+import os
+import ply
+import table_cache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Módulos cuyo código determina la salida de parse.py.
+FRONT_END_MODULES = ('lexer.py', 'fast_lexer.py', 'parser.py', 'ast_nodes.py', 'ast_arena.py',
+                     'gcl_types.py', 'symbol_table.py', 'type_checker.py', 'diagnostics.py',
+                     'compiler.py')
+
+DEFAULT_MAX_BYTES = 256 << 20
+
+# Al desalojar se baja hasta esta fracción del límite, para no tener que
+# recorrer el directorio en cada escritura.
+_LOW_WATERMARK = 0.8
+
+# Estados que se guardan: 'error' puede depender del entorno (un archivo que
+# no se pudo leer, falta de memoria), así que no se guarda.
+CACHED_STATUSES = ('ok', 'lexical', 'syntax', 'context')
+
+_fingerprint = None
+
+def fingerprint():
+    """Hash del código de los módulos del front-end y de la versión de PLY."""
+    global _fingerprint
+    if _fingerprint is None:
+        digest = hashlib.sha256(ply.__version__.encode('utf-8'))
+        for name in FRONT_END_MODULES:
+            with open(os.path.join(HERE, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0' + file.read() + b'\0')
+        _fingerprint = digest.hexdigest()
+    return _fingerprint
+
+def default_directory():
+    base = table_cache.cache_dir()
+    return os.path.join(base, 'results') if base is not None else None
+
+
+class ResultCache:
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory if directory is not None else default_directory()
+        if self.directory is None:
+            raise OSError('No hay un directorio para la caché de resultados')
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self._stats_path = os.path.join(self.directory, 'stats.json')
+        self._lock_path = os.path.join(self.directory, 'lock')
+
+    def key(self, source, **options):
+        """Clave de `source` (bytes) compilado con `options`."""
+        digest = hashlib.sha256(fingerprint().encode('ascii'))
+        digest.update(json.dumps(options, sort_keys=True).encode('utf-8'))
+        digest.update(b'\0')
+        digest.update(source)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key):
+        """Devuelve (estado, salida) o None si la clave no está."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8', newline='') as file:
+                status = file.readline()[:-1]
+                output = file.read()
+            os.utime(path) # La entrada pasa a ser la usada más recientemente
+        except OSError:
+            self._update_stats(misses=1)
+            return None
+        self._update_stats(hits=1)
+        return status, output
+
+    def put(self, key, status, output):
+        """Guarda (estado, salida). Los estados que no se guardan se ignoran."""
+        if status not in CACHED_STATUSES:
+            return
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = table_cache.temp_path(directory, '.tmp')
+        try:
+            with open(tmp_path, 'w', encoding='utf-8', newline='') as file:
+                file.write(status + '\n')
+                file.write(output)
+            size = os.path.getsize(tmp_path)
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            return
+        if not existed:
+            self._update_stats(stores=1, bytes=size, entries=1, evict=True)
+
+    def stats(self):
+        with self._locked():
+            return self._read_stats()
+
+    def clear(self):
+        with self._locked():
+            for path, _, _ in self._entries():
+                os.unlink(path)
+            self._write_stats(_empty_stats())
+
+    # --- Contadores y desalojo ---
+
+    def _locked(self):
+        return _FileLock(self._lock_path)
+
+    def _read_stats(self):
+        try:
+            with open(self._stats_path) as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return _empty_stats()
+
+    def _write_stats(self, stats):
+        tmp_path = table_cache.temp_path(self.directory, '.json')
+        with open(tmp_path, 'w') as file:
+            json.dump(stats, file)
+        os.replace(tmp_path, self._stats_path)
+
+    def _update_stats(self, evict=False, **deltas):
+        with self._locked():
+            stats = self._read_stats()
+            for name, delta in deltas.items():
+                stats[name] = stats.get(name, 0) + delta
+            if evict and stats['bytes'] > self.max_bytes:
+                self._evict(stats)
+            self._write_stats(stats)
+
+    def _entries(self):
+        """Genera (ruta, tamaño, fecha de uso) de cada entrada."""
+        for subdir in os.scandir(self.directory):
+            if not subdir.is_dir():
+                continue
+            for entry in os.scandir(subdir.path):
+                if entry.name.startswith('tmp_'):
+                    continue
+                try:
+                    info = entry.stat()
+                except OSError:
+                    continue # La borró otro proceso
+                yield entry.path, info.st_size, info.st_mtime
+
+    def _evict(self, stats):
+        # Se recorren las entradas reales: así los contadores se corrigen si
+        # quedaron desfasados (por ejemplo, si alguien borró archivos).
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * _LOW_WATERMARK
+        evicted = 0
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+            evicted += 1
+        stats['evictions'] = stats.get('evictions', 0) + evicted
+        stats['bytes'] = total
+        stats['entries'] = len(entries) - evicted
+
+
+def _empty_stats():
+    return {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'bytes': 0, 'entries': 0}
+
+
+# flock exclusivo sobre un archivo, como administrador de contexto.
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        self.file = open(self.path, 'a')
+        fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc):
+        fcntl.flock(self.file, fcntl.LOCK_UN)
+        self.file.close()
@@ -0,0 +1,303 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Servidor de compilación: un proceso que queda corriendo con el lexer, el
+# parser y el type checker ya cargados, para no pagar el arranque de Python y
+# de PLY en cada chequeo.
+#
+# Escucha en un socket Unix (asyncio). El protocolo es NDJSON: cada línea es
+# un pedido y cada respuesta es una línea con el mismo "id".
+#   {"id": 1, "source": "{ int a; a := 1 }"}   compila el texto
+#   {"id": 2, "path": "prog.imperat"}          compila el archivo
+#   {"id": 3, "op": "metrics"}                 devuelve los contadores
+# Opciones de cada pedido: "errors" (política del type checker), "recover"
+# (recuperación de errores de sintaxis) y "ast" (incluir el AST decorado).
+# La respuesta tiene "status" y, si hubo errores, "message" y "diagnostics"
+# ([{"line", "col", "message"}]); con "ast": true y status 'ok', "ast".
+#
+# La compilación corre en un pool de procesos (uno por CPU por defecto), cada
+# uno con su lexer y su parser; a lo sumo 2 pedidos por proceso esperan en el
+# pool y el resto espera en el servidor. Los pedidos de una misma conexión se
+# atienden en paralelo y se responden a medida que terminan.
+import argparse
+import asyncio
+import json
+import math
+import os
+import signal
+import socket
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from diagnostics import FAIL_FAST, POLICIES
+import table_cache
+
+DEFAULT_SOCKET = os.path.join(table_cache.cache_dir() or '/tmp', 'gcl-server.sock')
+
+
+# --- Trabajo de cada proceso del pool ---------------------------------------
+
+_worker_lexer = None
+_worker_parser = None
+
+def _init_worker():
+    global _worker_lexer, _worker_parser
+    # Ctrl+C lo maneja el servidor, que cierra el pool; los procesos del pool
+    # no deben morir por su cuenta a mitad de un pedido.
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from lexer import get_lexer
+    from parser import get_parser
+    _worker_lexer = get_lexer()
+    _worker_parser = get_parser()
+
+# Compila un pedido y devuelve la respuesta (sin "id") y el tiempo de CPU.
+def _compile(request):
+    from compiler import compile_with, ERROR
+    from ast_nodes import iter_ast_lines
+    start = time.perf_counter()
+    source = request.get('source')
+    if source is None:
+        try:
+            with open(request['path'], 'r') as file:
+                source = file.read()
+        except OSError:
+            return {'status': ERROR,
+                    'message': f"Error: No se pudo abrir el archivo {request['path']}"}, 0, 0.0
+    result = compile_with(source, _worker_lexer, _worker_parser,
+                          errors=request.get('errors', FAIL_FAST),
+                          recover=bool(request.get('recover')), count_tokens=True)
+    response = {'status': result.status}
+    if result.ok:
+        if request.get('ast'):
+            response['ast'] = ''.join(iter_ast_lines(result.ast))
+    else:
+        response['message'] = result.message
+        response['diagnostics'] = [
+            {'line': d.lineno, 'col': d.col_offset, 'message': str(d)} for d in result.diagnostics]
+    return response, result.tokens or 0, time.perf_counter() - start
+
+
+# --- Métricas ---------------------------------------------------------------
+
+# Contadores del servidor. Las latencias (desde que llega el pedido hasta que
+# se escribe la respuesta, incluida la espera por un lugar en el pool) se
+# guardan en una ventana de los últimos `window` pedidos, de donde salen p50
+# y p99. tokens_per_sec es sobre el tiempo de compilación en los workers.
+class Metrics:
+    def __init__(self, window=10000):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.by_status = {}
+        self.in_flight = 0
+        self.latencies = deque(maxlen=window)
+        self.tokens = 0
+        self.compile_time = 0.0
+
+    def record(self, status, latency, tokens=0, compile_time=0.0):
+        self.requests += 1
+        self.by_status[status] = self.by_status.get(status, 0) + 1
+        self.latencies.append(latency)
+        self.tokens += tokens
+        self.compile_time += compile_time
+
+    def snapshot(self):
+        uptime = time.monotonic() - self.started
+        latencies = sorted(self.latencies)
+        return {
+            'requests': self.requests,
+            'by_status': dict(self.by_status),
+            'in_flight': self.in_flight,
+            'uptime': round(uptime, 3),
+            'requests_per_sec': round(self.requests / uptime, 3) if uptime else 0.0,
+            'latency_ms': {'p50': _percentile(latencies, 0.50), 'p99': _percentile(latencies, 0.99)},
+            'tokens': self.tokens,
+            'tokens_per_sec': round(self.tokens / self.compile_time) if self.compile_time else 0,
+        }
+
+# Percentil por rango más cercano de una lista ordenada, en milisegundos.
+def _percentile(values, q):
+    if not values:
+        return None
+    return round(values[max(0, math.ceil(q * len(values)) - 1)] * 1000, 3)
+
+# Escribe `data` como JSON en `path` de forma atómica (quien lo lea nunca ve
+# un archivo a medio escribir).
+def _write_json(path, data):
+    tmp_path = table_cache.temp_path(os.path.dirname(os.path.abspath(path)), '.json')
+    with open(tmp_path, 'w') as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
+
+
+# --- Servidor ---------------------------------------------------------------
+
+class CompileServer:
+    def __init__(self, socket_path=DEFAULT_SOCKET, jobs=None, metrics_path=None,
+                 metrics_interval=1.0):
+        self.socket_path = socket_path
+        self.jobs = jobs or os.cpu_count() or 1
+        self.metrics_path = metrics_path
+        self.metrics_interval = metrics_interval
+        self.metrics = Metrics()
+        self.executor = None
+        self.slots = None
+        self.connections = set()
+
+    async def serve(self):
+        loop = asyncio.get_running_loop()
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs, initializer=_init_worker)
+        self.slots = asyncio.Semaphore(self.jobs * 2)
+        # Se calientan todos los workers antes de aceptar conexiones.
+        await asyncio.gather(*(loop.run_in_executor(self.executor, _init_worker)
+                               for _ in range(self.jobs)))
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        server = await asyncio.start_unix_server(self._handle_connection, path=self.socket_path,
+                                                 limit=1 << 26)
+        stop = asyncio.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, stop.set)
+        writer_task = asyncio.create_task(self._write_metrics_forever())
+        try:
+            async with server:
+                await stop.wait()
+                server.close()
+                # Las conexiones abiertas se cierran sin esperar sus pedidos.
+                for task in list(self.connections):
+                    task.cancel()
+                await asyncio.gather(*self.connections, return_exceptions=True)
+        finally:
+            writer_task.cancel()
+            self.executor.shutdown(cancel_futures=True)
+            if self.metrics_path:
+                _write_json(self.metrics_path, self.metrics.snapshot())
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    async def _write_metrics_forever(self):
+        if not self.metrics_path:
+            return
+        while True:
+            _write_json(self.metrics_path, self.metrics.snapshot())
+            await asyncio.sleep(self.metrics_interval)
+
+    async def _handle_connection(self, reader, writer):
+        connection = asyncio.current_task()
+        self.connections.add(connection)
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self._answer(line, writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending)
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            # El servidor se está cerrando
+            for task in pending:
+                task.cancel()
+        finally:
+            self.connections.discard(connection)
+            writer.close()
+
+    async def _answer(self, line, writer):
+        start = time.perf_counter()
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('el pedido debe ser un objeto JSON')
+        except ValueError as e:
+            request, response = {}, {'status': 'error', 'message': f'Pedido inválido: {e}'}
+            self.metrics.record('invalid', time.perf_counter() - start)
+        else:
+            response = await self._respond(request, start)
+        if 'id' in request:
+            response = {'id': request['id'], **response}
+        writer.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b'\n')
+        await writer.drain()
+
+    async def _respond(self, request, start):
+        if request.get('op') == 'metrics':
+            return {'status': 'ok', 'metrics': self.metrics.snapshot()}
+        problem = _validate(request)
+        if problem:
+            self.metrics.record('invalid', time.perf_counter() - start)
+            return {'status': 'error', 'message': f'Pedido inválido: {problem}'}
+        loop = asyncio.get_running_loop()
+        self.metrics.in_flight += 1
+        try:
+            async with self.slots:
+                response, tokens, compile_time = await loop.run_in_executor(
+                    self.executor, _compile, request)
+        except Exception as e:
+            # Por ejemplo, un worker que murió (BrokenProcessPool)
+            response, tokens, compile_time = {'status': 'error',
+                                              'message': f'Error inesperado: {e}'}, 0, 0.0
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record(response['status'], time.perf_counter() - start, tokens, compile_time)
+        return response
+
+def _validate(request):
+    if 'op' in request:
+        return f"operación desconocida: {request['op']!r}"
+    if not isinstance(request.get('source', request.get('path')), str):
+        return 'falta "source" o "path"'
+    if request.get('errors', FAIL_FAST) not in POLICIES:
+        return f"política de errores desconocida: {request['errors']!r}"
+    return None
+
+
+# --- Cliente ----------------------------------------------------------------
+
+# Cliente bloqueante mínimo: envía los pedidos por una conexión y devuelve
+# las respuestas ordenadas como los pedidos.
+def send_requests(requests, socket_path=DEFAULT_SOCKET):
+    requests = [dict(req, id=i) for i, req in enumerate(requests)]
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(socket_path)
+        conn.sendall(b''.join(json.dumps(req).encode('utf-8') + b'\n' for req in requests))
+        conn.shutdown(socket.SHUT_WR)
+        with conn.makefile('rb') as replies:
+            responses = [json.loads(line) for line in replies]
+    responses.sort(key=lambda response: response['id'])
+    for response in responses:
+        del response['id']
+    return responses
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        usage="python server.py [--socket RUTA] [-j N] [--metrics ARCHIVO]\n"
+              "       python server.py --check <filename.imperat>... [--socket RUTA]")
+    arg_parser.add_argument('--socket', default=DEFAULT_SOCKET, help='ruta del socket Unix')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None,
+                            help='procesos del pool (por defecto, uno por CPU)')
+    arg_parser.add_argument('--metrics', default=None,
+                            help='archivo JSON donde se escriben las métricas')
+    arg_parser.add_argument('--metrics-interval', type=float, default=1.0,
+                            help='cada cuántos segundos se escriben las métricas')
+    arg_parser.add_argument('--check', nargs='+', metavar='FILE',
+                            help='en lugar de servir, pide al servidor que chequee los archivos')
+    args = arg_parser.parse_args()
+
+    if args.check:
+        paths = [os.path.abspath(path) for path in args.check]
+        failures = 0
+        for path, response in zip(paths, send_requests([{'path': path} for path in paths], args.socket)):
+            if response['status'] != 'ok':
+                failures += 1
+                print(f"{path}: {response['message']}")
+        sys.exit(1 if failures else 0)
+
+    server = CompileServer(args.socket, args.jobs, args.metrics, args.metrics_interval)
+    asyncio.run(server.serve())
+
+if __name__ == '__main__':
+    main()
@@ -21,16 +21,59 @@ class SymbolTable:
         """
         Busca un símbolo y devuelve solo su tipo.
         """
-        if name in self.symbols:
-            return self.symbols[name][0]  # Devuelve solo el tipo (el primer elemento de la tupla)
-        
-        if self.parent:
-            return self.parent.lookup(name)
-        
+        # Se recorren los ámbitos hacia afuera con un ciclo: con bloques muy
+        # anidados la recursión excedería el límite de Python.
+        table = self
+        while table is not None:
+            if name in table.symbols:
+                return table.symbols[name][0]  # Devuelve solo el tipo (el primer elemento de la tupla)
+            table = table.parent
         return None
 
     def enter_scope(self):
         return SymbolTable(parent=self)
 
     def exit_scope(self):
-        return self.parent
\ No newline at end of file
+        return self.parent
+
+# Tabla con búsqueda en tiempo constante. Todos los ámbitos comparten
+# `bindings`: para cada nombre, la pila de sus declaraciones visibles, la más
+# interna al final. declare apila y exit_scope desapila lo que declaró el
+# ámbito, así que lookup solo mira el tope de la pila del nombre, sin
+# recorrer los ámbitos. `symbols` sigue teniendo lo declarado en el ámbito,
+# que es lo que se imprime en la tabla de cada Block.
+# lookup responde por los ámbitos abiertos en ese momento, así que se llama
+# sobre el ámbito más interno (como hace el type checker).
+class ScopedSymbolTable(SymbolTable):
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.bindings = {} if parent is None else parent.bindings
+
+    def declare(self, name, type_info, lineno, col_offset):
+        previous = self.symbols.get(name)
+        if previous is not None:
+            return previous
+        info = (type_info, lineno, col_offset)
+        self.symbols[name] = info
+        stack = self.bindings.get(name)
+        if stack is None:
+            self.bindings[name] = [info]
+        else:
+            stack.append(info)
+        return None
+
+    def lookup(self, name):
+        stack = self.bindings.get(name)
+        return stack[-1][0] if stack else None
+
+    def enter_scope(self):
+        return ScopedSymbolTable(parent=self)
+
+    def exit_scope(self):
+        bindings = self.bindings
+        for name in self.symbols:
+            stack = bindings[name]
+            stack.pop()
+            if not stack:
+                del bindings[name]
+        return self.parent
@@ -0,0 +1,41 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Utilidades para guardar en disco las tablas generadas por PLY
+# (tabla LALR del parser y expresión maestra del lexer).
+import hashlib
+import os
+import uuid
+
+# Directorio por defecto: el __pycache__ junto a los módulos del proyecto.
+# Se puede cambiar con la variable de entorno IMPERAT_CACHE_DIR.
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '__pycache__')
+
+
+def cache_dir():
+    """
+    Devuelve el directorio de caché, creándolo si hace falta.
+    Si no se puede crear devuelve None y las tablas se construyen en memoria.
+    """
+    path = os.environ.get('IMPERAT_CACHE_DIR', DEFAULT_CACHE_DIR)
+    try:
+        os.makedirs(path, exist_ok=True)
+    except OSError:
+        return None
+    return path
+
+
+def definitions_hash(*parts):
+    """Calcula un hash corto de las definiciones que determinan una tabla."""
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(repr(part).encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()[:16]
+
+
+def temp_path(directory, suffix):
+    """
+    Genera un nombre temporal único (que todavía no existe) en `directory`.
+    Las tablas se escriben ahí y luego se publican con os.replace, que es
+    atómico: otro proceso nunca lee un archivo a medio escribir.
+    """
+    return os.path.join(directory, f'tmp_{uuid.uuid4().hex}{suffix}')
@@ -0,0 +1,18 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Los módulos del proyecto están en el directorio de arriba (no es un
+# paquete). Uso: python -m pytest -q tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+
+@pytest.fixture
+def fast_switching():
+    # Cambios de hilo lo más seguidos posible, para que se intercalen.
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
@@ -0,0 +1,113 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Backends de ejecución contra el intérprete de referencia: misma salida y
+# mismos errores de ejecución en programas aleatorios, con el AST de objetos
+# y con el del arena.
+import io
+import random
+import subprocess
+import sys
+import pytest
+import benchmark
+import codegen
+import vm
+from compiler import compile_source
+from evaluator import compile_program, Interpreter, ExecutionError
+
+SEEDS = range(150)
+
+
+def _bytecode(ast):
+    code = vm.compile_ast(ast)
+    return lambda out: vm.execute(code, out)
+
+# El bytecode después de escribirlo y leerlo como un .imperatc.
+def _bytecode_file(ast):
+    code = vm.loads(vm.dumps(vm.compile_ast(ast), b'source'), b'source')
+    return lambda out: vm.execute(code, out)
+
+# Nombre -> función que prepara el AST chequeado y devuelve run(out).
+BACKENDS = {
+    'closures': lambda ast: compile_program(ast).run,
+    'vm': _bytecode,
+    'vm-imperatc': _bytecode_file,
+    'python': lambda ast: codegen.compile_ast(ast).run,
+}
+
+
+# Salida y error de ejecución (o None) de correr `run`, que recibe la salida.
+def _run_outcome(run):
+    out = io.StringIO()
+    try:
+        run(out)
+    except ExecutionError as e:
+        return out.getvalue(), str(e.args[0])
+    return out.getvalue(), None
+
+def _interpreter(ast):
+    return lambda out: Interpreter(out).run(ast)
+
+# (semilla, AST) de los programas aleatorios que chequean.
+def _checked_programs(arena=False):
+    for seed in SEEDS:
+        result = compile_source(benchmark.gen_random_program(random.Random(seed)), arena=arena)
+        if result.ok:
+            yield seed, result.ast
+
+@pytest.fixture(scope='module')
+def expected():
+    return {seed: _run_outcome(_interpreter(ast)) for seed, ast in _checked_programs()}
+
+
+def test_interpreter_on_arena(expected):
+    outcomes = {seed: _run_outcome(_interpreter(ast)) for seed, ast in _checked_programs(True)}
+    assert outcomes == expected
+
+@pytest.mark.parametrize('arena', [False, True], ids=['objects', 'arena'])
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_backend_matches_interpreter(expected, backend, arena):
+    for seed, ast in _checked_programs(arena):
+        run = BACKENDS[backend](ast)
+        # Un programa compilado se puede correr más de una vez.
+        for _ in range(2):
+            assert _run_outcome(run) == expected[seed], f'semilla {seed}'
+
+@pytest.mark.parametrize('backend', list(BACKENDS))
+def test_loops(backend):
+    for text in (benchmark.gen_loops(2), benchmark.gen_sieve(200)):
+        ast = compile_source(text).ast
+        assert _run_outcome(BACKENDS[backend](ast)) == _run_outcome(_interpreter(ast))
+
+# Programas anidados `n` niveles que llegan a ejecutar el nivel más interno.
+def _deep(shape, n):
+    if shape == 'blocks':
+        body = '{\n' * n + 'a := 1; print a\n' + '}\n' * n
+    elif shape == 'if':
+        body = 'if a == 0 --> ' * n + 'print a' + ' fi' * n
+    elif shape == 'while':
+        body = ''.join(f'while a < {i} --> a := a + 1;\n' for i in range(1, n + 1))
+        body += 'print a\n' + 'end\n' * n
+    else:
+        body = 'print ' + '(1 - ' * n + 'a' + ')' * n
+    return '{\n  int a;\n' + body + '\n}\n'
+
+# Más anidamiento del que admiten la pila de Python (clausuras) o su
+# compilador (python): esos backends usan el bytecode y todos dan lo mismo.
+@pytest.mark.parametrize('shape', ['blocks', 'if', 'while', 'parens'])
+def test_deep_programs(shape):
+    for n in (10, 100, 300, 3000):
+        expected = {'blocks': 1, 'if': 0, 'while': n, 'parens': n % 2}[shape]
+        ast = compile_source(_deep(shape, n)).ast
+        for backend in BACKENDS:
+            assert _run_outcome(BACKENDS[backend](ast)) == (f'{expected}\n', None), (backend, n)
+
+
+# parse.py --run con cada backend, con y sin --arena.
+@pytest.mark.parametrize('arena', [[], ['--arena']], ids=['objects', 'arena'])
+@pytest.mark.parametrize('backend', ['closures', 'vm', 'python'])
+def test_parse_run(tmp_path, backend, arena):
+    path = tmp_path / 'loops.imperat'
+    path.write_text(benchmark.gen_loops(2))
+    done = subprocess.run([sys.executable, 'parse.py', '--run', '--backend', backend, *arena,
+                           str(path)], cwd=benchmark.HERE, capture_output=True, text=True)
+    expected = _run_outcome(_interpreter(compile_source(path.read_text()).ast))
+    assert (done.stdout, done.returncode) == (expected[0], 0)
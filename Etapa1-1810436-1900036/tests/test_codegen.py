@@ -0,0 +1,51 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Código de Python generado: posiciones del .imperat en el código volcado y
+# programas más anidados de lo que compila Python.
+import io
+import codegen
+import evaluator
+import vm
+from compiler import compile_source
+
+PROGRAM = '''{
+  int i; function[..3] f;
+  while i < 3 -->
+    f := f(i:i * 2);
+    i := i + 1
+  end;
+  if i == 3 --> print f.i [] i <> 3 --> skip fi
+}
+'''
+
+
+def _run(program):
+    out = io.StringIO()
+    try:
+        program.run(out)
+    except evaluator.ExecutionError as e:
+        return out.getvalue(), str(e.args[0])
+    return out.getvalue(), None
+
+def test_dump_has_source_positions():
+    source = codegen.generate(compile_source(PROGRAM).ast)
+    assert 'while (i_0 < 3):' in source
+    assert '# 5:7' in source  # i := i + 1
+    assert 'raise _no_true_guard(7, 13)' in source
+
+def test_runtime_error_position():
+    ast = compile_source(PROGRAM.replace('f.i', 'f.(i + 1)')).ast
+    program = codegen.compile_ast(ast)
+    assert isinstance(program, codegen.Program)
+    outcome = _run(program)
+    assert outcome == ('', 'Runtime error: index 4 is out of the domain 0..3 at line 7 '
+                           'and column 24')
+    assert outcome == _run(evaluator.compile_program(ast))
+
+# Más anidamiento del que compila Python: se ejecuta con el bytecode.
+def test_deep_program_falls_back_to_vm():
+    depth = 30
+    text = ('{ int i; ' + 'while i < 1 --> ' * depth + 'i := i + 1' + ' end' * depth
+            + '; print i }')
+    program = codegen.compile_ast(compile_source(text).ast)
+    assert isinstance(program, vm.Code)
+    assert _run(program) == ('1\n', None)
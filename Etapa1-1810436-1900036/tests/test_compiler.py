@@ -0,0 +1,26 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# compile_source desde varios hilos a la vez da lo mismo que una por una.
+import random
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+import benchmark
+from compiler import compile_source
+
+
+def _outcome(result):
+    return result.status, result.message, str(result.ast) if result.ok else None
+
+@pytest.mark.parametrize('threads', [2, 8])
+def test_threads_match_sequential(fast_switching, threads):
+    programs = benchmark.thread_jobs()
+    expected = [_outcome(compile_source(text, **options)) for text, options in programs]
+    jobs = list(range(len(programs))) * 10
+    random.Random(threads).shuffle(jobs)
+
+    def run(i):
+        text, options = programs[i]
+        return _outcome(compile_source(text, **options))
+
+    with ThreadPoolExecutor(threads) as pool:
+        outcomes = list(pool.map(run, jobs))
+    assert outcomes == [expected[i] for i in jobs]
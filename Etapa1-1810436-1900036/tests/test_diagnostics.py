@@ -0,0 +1,48 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Políticas de errores: con 'all' se reportan los errores independientes y no
+# los que son consecuencia de otro; 'first' y 'fail-fast' dan el primero.
+import pytest
+from diagnostics import POLICIES, COLLECT_ALL
+from lexer import build_lexer
+from parser import build_parser
+from type_checker import TypeChecker
+
+
+def _check(data, policy):
+    lexer = build_lexer()
+    lexer.input(data)
+    return TypeChecker(policy=policy).check_program(build_parser().parse(lexer=lexer))
+
+CASES = [
+    # Una variable no declarada se reporta una vez, aunque se use varias.
+    ('{\n  int x;\n  x := y + 1;\n  x := y * 2;\n  print y\n}',
+     ['Variable not declared at line 3 and column 8']),
+    # Una guarda que no es booleana y un error en su cuerpo.
+    ('{\n  int x;\n  if x --> x := true [] x > 0 --> skip fi\n}',
+     ['No boolean guard at line 3 and column 8',
+      'Type error. Variable x has different type than expression at line 3 and column 12']),
+    ('{\n  int x;\n  while x + 1 --> x := z end\n}',
+     ['No boolean guard at line 3 and column 15',
+      'Variable not declared at line 3 and column 24']),
+    # Una variable que no se puede indexar: el índice inválido y la suma no
+    # se reportan, una variable no declarada en el índice sí.
+    ('{\n  int x; bool b;\n  x := b.true + 1;\n  x := x.1\n}',
+     ['Error. b is not indexable at line 3 and column 8',
+      'Error. x is not indexable at line 4 and column 8']),
+    ('{\n  int x; bool b;\n  x := b.y;\n  print y\n}',
+     ['Error. b is not indexable at line 3 and column 8',
+      'Variable not declared at line 3 and column 10']),
+    # Dos operandos con errores propios: el producto no agrega otro.
+    ('{\n  int x;\n  x := (y + 1) * (true + 2)\n}',
+     ['Variable not declared at line 3 and column 9',
+      'Type error in line 3 and column 24']),
+]
+
+@pytest.mark.parametrize('data, errors', CASES)
+def test_collect_all(data, errors):
+    assert _check(data, COLLECT_ALL) == errors
+
+@pytest.mark.parametrize('policy', [policy for policy in POLICIES if policy != COLLECT_ALL])
+@pytest.mark.parametrize('data, errors', CASES)
+def test_first_error(data, errors, policy):
+    assert _check(data, policy) == errors[:1]
@@ -0,0 +1,27 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Un único objeto por tipo, también si varios hilos lo crean a la vez.
+import threading
+import pytest
+from gcl_types import FunctionType, ListType
+
+
+@pytest.mark.parametrize('type_class', [FunctionType, ListType])
+def test_concurrent_interning(fast_switching, type_class):
+    threads = 8
+    # Tamaños que ningún otro test usa, para que el primer pedido cree el tipo.
+    sizes = range(10**9, 10**9 + 2000)
+    barrier = threading.Barrier(threads)
+    results = [None] * threads
+
+    def intern(i):
+        barrier.wait()
+        results[i] = [type_class(size) for size in sizes]
+
+    workers = [threading.Thread(target=intern, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    for types in results:
+        assert all(a is b for a, b in zip(types, results[0]))
+    assert all(type_class(size) is t for size, t in zip(sizes, results[0]))
@@ -0,0 +1,92 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Ediciones al azar en una incremental.Session: después de cada una el
+# resultado tiene que ser el mismo que el de compilar el texto completo.
+import random
+import string
+import pytest
+import benchmark
+from compiler import compile_source
+from diagnostics import FIRST, FAIL_FAST, COLLECT_ALL
+from incremental import Session
+from ast_nodes import ASTNode, Declare, Comma, iter_ast_lines
+
+EDITS = 300
+
+
+# Con la política 'all' el type checker recorre todo el programa, así que
+# también el AST de un resultado con errores es el de una corrida completa.
+def _outcome(result, policy):
+    positions = [(d.lineno, d.col_offset) for d in result.diagnostics]
+    with_ast = result.ok or (policy == COLLECT_ALL and result.ast is not None)
+    return (result.status, result.message, positions,
+            ''.join(iter_ast_lines(result.ast)) if with_ast else None)
+
+# Posiciones de todos los nodos del AST, en preorden.
+def _node_positions(ast):
+    positions = []
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        positions.append((node.__class__.__name__, node.lineno, node.col_offset))
+        if isinstance(node, Declare):
+            positions.append((node.end_lineno, node.end_col_offset,
+                              node.bound_lineno, node.bound_col_offset))
+        elif isinstance(node, Comma):
+            positions.append(tuple(node.separators))
+        stack.extend(child for child in reversed(node.children) if isinstance(child, ASTNode))
+    return positions
+
+
+# Cambios de una letra o un dígito por otro y espacios o saltos de línea
+# nuevos (que se quedan si el programa sigue parseando), y un carácter
+# cualquiera insertado, borrado o reemplazado (que después se deshace).
+@pytest.mark.parametrize('policy', [FAIL_FAST, FIRST, COLLECT_ALL])
+def test_random_edits_match_full_compile(policy):
+    rng = random.Random(policy)
+    words = string.ascii_lowercase[:6] + '0123456789'
+    alphabet = 'abcdeuxz0123456789+-*<>=:;,.!(){}[]" \n'
+    session = Session(benchmark.gen_editing(6), policy)
+
+    def check(start, end, new):
+        result = session.edit(start, end, new)
+        expected = compile_source(session.text, policy)
+        assert _outcome(result, policy) == _outcome(expected, policy), \
+            f'editar {start}..{end} por {new!r}:\n{session.text}'
+        return result, expected
+
+    for step in range(EDITS):
+        current = session.text
+        start = rng.randrange(len(current))
+        if rng.random() < 0.5:
+            if current[start].isalnum():
+                end, new = start + 1, rng.choice(words)
+            elif current[start] in ' \n':
+                end, new = start, rng.choice(' \n')
+            else:
+                continue
+            keep = True
+        else:
+            end = start if rng.random() < 0.3 else start + 1
+            new = rng.choice(alphabet) if rng.random() < 0.7 else ''
+            keep = False
+        result, expected = check(start, end, new)
+        if not keep or result.ast is None:
+            result, expected = check(start, start + len(new), current[start:end])
+        if step % 5 == 4 and (result.ok or policy == COLLECT_ALL and result.ast is not None):
+            session.update_positions()
+            assert _node_positions(result.ast) == _node_positions(expected.ast), session.text
+    assert session.partial_runs > 0
+
+# Los errores propios de una sentencia (el if) van antes que los de la
+# sentencia de su cuerpo que se chequea después, también cuando una edición
+# chequea de nuevo solo el if.
+@pytest.mark.parametrize('policy', [FAIL_FAST, FIRST, COLLECT_ALL])
+def test_statement_errors_before_child_errors(policy):
+    text = '{\n  bool c;\n  if true --> skip [] (c.0 == 1) --> c := c.3, 1, 2, 3 fi\n}'
+    session = Session(text, policy)
+    position = text.index('true') + 2
+    result = session.edit(position, position, '9')
+    expected = compile_source(session.text, policy)
+    assert _outcome(result, policy) == _outcome(expected, policy)
+    if policy == COLLECT_ALL:
+        assert [d.col_offset for d in result.diagnostics] == [6, 25, 44]
@@ -0,0 +1,77 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Listas largas en la gramática: sentencias de un bloque, nombres de una
+# declaración, cuerpo de un while y guardias de un if se construyen en tiempo
+# lineal y sin agotar la pila del parser.
+import pytest
+import benchmark
+from compiler import compile_source
+from ast_nodes import Declare, Sequencing, While, If
+from lexer import build_lexer
+from parser import build_parser
+
+N = 20000
+
+
+def _body(ast):
+    return [child for child in ast.children if child.__class__ is not Declare]
+
+# Sentencias de una secuencia, con las Sequencing aplanadas.
+def flat_statements(nodes):
+    items = []
+    stack = list(reversed(nodes))
+    while stack:
+        node = stack.pop()
+        if node.__class__ is Sequencing:
+            stack.extend(reversed(node.children))
+        else:
+            items.append(node)
+    return items
+
+def test_block_statements():
+    result = compile_source(benchmark.gen_block_statements(N))
+    assert result.ok
+    assert len(flat_statements(_body(result.ast))) == N + 1  # y el skip del final
+
+def test_declaration_names():
+    result = compile_source(benchmark.gen_declaration_names(N))
+    assert result.ok
+    declare, = [child for child in result.ast.children if child.__class__ is Declare]
+    assert list(declare.names) == [f'v{i}' for i in range(N)]
+
+def test_while_body():
+    result = compile_source(benchmark.gen_while_body(N))
+    assert result.ok
+    loop, = _body(result.ast)
+    assert loop.__class__ is While
+    assert len(flat_statements(list(loop.children[0].children)[1:])) == N + 1
+
+def test_if_guards():
+    result = compile_source(benchmark.gen_if_guards(N))
+    assert result.ok
+    conditional, = _body(result.ast)
+    assert conditional.__class__ is If
+    assert len(conditional.children) == N
+
+
+# Altura máxima de la pila del parser al parsear generator(n). Con las
+# listas recursivas a la izquierda cada elemento se reduce apenas se lee, así
+# que la pila no crece con la cantidad de elementos (con recursión a la
+# derecha, todos esperan en la pila hasta el final de la lista).
+def _max_stack(generator, n):
+    parser = build_parser()
+    lexer = build_lexer()
+    lexer.input(generator(n))
+    height = 0
+
+    def token():
+        nonlocal height
+        height = max(height, len(parser.symstack))
+        return lexer.token()
+    parser.parse(lexer=lexer, tokenfunc=token)
+    return height
+
+@pytest.mark.parametrize('generator', [benchmark.gen_block_statements,
+                                       benchmark.gen_declaration_names,
+                                       benchmark.gen_while_body, benchmark.gen_if_guards])
+def test_parser_stack_does_not_grow(generator):
+    assert _max_stack(generator, 10) == _max_stack(generator, 5000)
@@ -0,0 +1,119 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Recuperación de errores de sintaxis: dónde se resincroniza el parser, qué
+# errores reporta y qué AST queda.
+import pytest
+import benchmark
+from ast_nodes import Asig, Guard, Sequencing, Then
+from lexer import build_lexer
+from parser import build_parser, parse_program, ParseError
+
+
+def _recover(data):
+    lexer = build_lexer()
+    lexer.input(data)
+    ast, errors = parse_program(lexer, recover=True)
+    return ast, [str(error) for error in errors]
+
+def _parse(data):
+    lexer = build_lexer()
+    lexer.input(data)
+    return build_parser().parse(lexer=lexer)
+
+# (programa con un error, error, mismo programa sin la parte errónea). En un
+# bloque se descarta la sentencia hasta ';' o '}'.
+BLOCK_CASES = {
+    ';': ('{\n  int a;\n  a := a + ;\n  a := 1\n}',
+          "Sintax error in row 3, column 12: unexpected token ';'.",
+          '{\n  int a;\n  a := 1\n}'),
+    '}': ('{\n  int a;\n  a := 1;\n  a := * 2\n}',
+          "Sintax error in row 4, column 8: unexpected token '*'.",
+          '{\n  int a;\n  a := 1\n}'),
+}
+
+@pytest.mark.parametrize('token', list(BLOCK_CASES))
+def test_block_resynchronization(token):
+    data, error, clean = BLOCK_CASES[token]
+    ast, errors = _recover(data)
+    assert errors == [error]
+    assert str(ast) == str(_parse(clean))
+
+# En un if o un while el cuerpo erróneo queda como una secuencia vacía y la
+# guarda se conserva.
+GUARD_CASES = {
+    '[]': ('{\n  int a;\n  if a < 1 --> a := * [] a > 2 --> skip fi\n}',
+           "Sintax error in row 3, column 21: unexpected token '*'.",
+           '{\n  int a;\n  if a < 1 --> a := 0 [] a > 2 --> skip fi\n}'),
+    'fi': ('{\n  int a;\n  if a < 1 --> skip [] a > 2 --> a := ( fi;\n  print a\n}',
+           "Sintax error in row 3, column 41: unexpected token 'fi'.",
+           '{\n  int a;\n  if a < 1 --> skip [] a > 2 --> a := 0 fi;\n  print a\n}'),
+    'end': ('{\n  int a;\n  while a < 3 --> a := ) end;\n  print a\n}',
+            "Sintax error in row 3, column 24: unexpected token ')'.",
+            '{\n  int a;\n  while a < 3 --> a := 0 end;\n  print a\n}'),
+}
+
+# El AST del programa limpio con el cuerpo `a := 0` cambiado por una
+# secuencia vacía, como lo deja la recuperación.
+def _with_empty_body(clean):
+    ast = _parse(clean)
+    stack = [ast]
+    while stack:
+        node = stack.pop()
+        if node.__class__ in (Guard, Then) and node.children[1].__class__ is Asig:
+            node.children[1] = Sequencing()
+        stack.extend(node.children)
+    return ast
+
+@pytest.mark.parametrize('token', list(GUARD_CASES))
+def test_guard_resynchronization(token):
+    data, error, clean = GUARD_CASES[token]
+    ast, errors = _recover(data)
+    assert errors == [error]
+    assert str(ast) == str(_with_empty_body(clean))
+
+def test_eof():
+    data = '{\n  int a;\n  a := ;\n  print a\n'
+    assert _recover(data) == (None, ["Sintax error in row 3, column 8: unexpected token ';'.",
+                                     'Syntax error at EOF.'])
+    with pytest.raises(ParseError) as info:
+        _parse(data)
+    assert str(info.value) == "Sintax error in row 3, column 8: unexpected token ';'."
+    with pytest.raises(ParseError) as info:
+        _parse('{\n  int a;\n  a := a +')
+    assert str(info.value) == 'Syntax error at EOF.'
+
+# Errores en if y while anidados: el cuerpo se descarta hasta 'end', '[]' o
+# 'fi'; los errores del bloque, hasta ';' o '}'.
+SAMPLE = '''{
+  int a;
+  while a < 3 --> a := ) end;
+  if a < 1 --> a := * [] a > 2 --> a := ( fi;
+  while a > 0 --> if a a --> skip fi end;
+  a := a + (1;
+  print a +
+}
+'''
+SAMPLE_ERRORS = [
+    "Sintax error in row 3, column 24: unexpected token ')'.",
+    "Sintax error in row 4, column 21: unexpected token '*'.",
+    "Sintax error in row 4, column 43: unexpected token 'fi'.",
+    "Sintax error in row 5, column 24: unexpected token 'a'.",
+    "Sintax error in row 6, column 14: unexpected token ';'.",
+    "Sintax error in row 8, column 1: unexpected token '}'.",
+]
+
+def test_nested_sample():
+    ast, errors = _recover(SAMPLE)
+    assert ast is not None
+    assert errors == SAMPLE_ERRORS
+
+# Muchos errores, en el bloque principal y en bloques dentro de un while: el
+# AST recuperado es el del programa sin las sentencias erróneas, y el primer
+# error es el mismo que sin recuperación.
+def test_partial_ast():
+    n = 2000
+    ast, errors = _recover(benchmark.gen_syntax_errors(n))
+    assert len(errors) == len(range(0, n, 10))
+    with pytest.raises(ParseError) as info:
+        _parse(benchmark.gen_syntax_errors(n))
+    assert errors[0] == str(info.value)
+    assert str(ast) == str(_parse(benchmark.gen_syntax_errors(n, skip_bad=True)))
@@ -0,0 +1,77 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Caché de resultados: mismas salidas que sin caché, desalojo de las entradas
+# usadas hace más tiempo y contadores con varios procesos a la vez.
+import os
+import pytest
+import benchmark
+from parse import analyze_cached
+from result_cache import ResultCache
+
+
+@pytest.fixture
+def programs(tmp_path):
+    directory = tmp_path / 'programs'
+    directory.mkdir()
+    for i in range(24):
+        if i % 4 == 0:
+            text = benchmark.gen_context_errors(20 + i)
+        elif i % 4 == 1:
+            text = benchmark.gen_syntax_errors(20 + i)
+        else:
+            text = benchmark.gen_expressions(5 + i % 40)
+        (directory / f'p{i:04d}.imperat').write_text(text)
+    return str(directory)
+
+def _batch(paths, **options):
+    return benchmark._batch_results(paths, **options)[0]
+
+def test_hit_and_miss_match_uncached(tmp_path, programs):
+    expected = _batch([programs], jobs=1)
+    cache = ResultCache(str(tmp_path / 'cache'))
+    for _ in ('fallos', 'aciertos'):
+        assert _batch([programs], jobs=1, cache=(cache.directory, cache.max_bytes)) == expected
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits'], stats['stores']) == (len(expected), len(expected),
+                                                                   len(expected))
+    assert stats['entries'] == sum(1 for _ in cache._entries())
+
+def test_eviction_order(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'), max_bytes=10**6)
+    keys = [cache.key(str(i).encode()) for i in range(5)]
+    for i, key in enumerate(keys):
+        cache.put(key, 'ok', 'x' * 1000)
+        # Fechas de uso distintas y en orden, sin depender del reloj.
+        os.utime(cache._path(key), (i, i))
+    assert cache.get(keys[0]) is not None # Pasa a ser la más reciente
+    # Con el límite en cuatro entradas, la sexta obliga a bajar a 0.8 del
+    # límite: se borran las tres usadas hace más tiempo.
+    cache.max_bytes = 4 * os.path.getsize(cache._path(keys[0]))
+    cache.put(cache.key(b'5'), 'ok', 'x' * 1000)
+    assert [cache.get(key) is not None for key in keys] == [True, False, False, False, True]
+    stats = cache.stats()
+    assert (stats['evictions'], stats['entries']) == (3, 3)
+
+def test_processes_share_stats(tmp_path, programs):
+    expected = _batch([programs], jobs=1)
+    sizing = ResultCache(str(tmp_path / 'sizing'))
+    _batch([programs], jobs=1, cache=(sizing.directory, sizing.max_bytes))
+    # Entra un tercio de los resultados: la pasada por todos desaloja y
+    # después un grupo chico que entra se repite y acierta.
+    small = ResultCache(str(tmp_path / 'small'), max_bytes=sizing.stats()['bytes'] // 3)
+    hot = sorted(os.path.join(programs, name) for name in os.listdir(programs))[:3]
+    for paths in ([programs], hot, hot):
+        results = _batch(paths, jobs=4, cache=(small.directory, small.max_bytes))
+        assert results == expected[:len(results)]
+    stats = small.stats()
+    assert stats['hits'] + stats['misses'] == len(expected) + 2 * len(hot)
+    assert stats['hits'] >= len(hot)
+    assert stats['evictions'] > 0
+    assert stats['entries'] == sum(1 for _ in small._entries())
+
+def test_engine_in_key(tmp_path):
+    cache = ResultCache(str(tmp_path / 'cache'))
+    raw = benchmark.gen_expressions(5).encode()
+    outputs = {analyze_cached(raw, cache, engine) for engine in ('ply', 'fast', 'ply')}
+    assert len(outputs) == 1
+    stats = cache.stats()
+    assert (stats['misses'], stats['hits']) == (2, 1)
@@ -0,0 +1,60 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Listas literales como un solo nodo Comma y chequeo sin recursión.
+import pytest
+import benchmark
+from compiler import compile_source
+from ast_nodes import Asig, Comma
+from lexer import build_lexer
+from parser import build_parser
+from type_checker import TypeChecker
+
+
+def _check(data):
+    lexer = build_lexer()
+    lexer.input(data)
+    return TypeChecker().check_program(build_parser().parse(lexer=lexer))
+
+# Un elemento que no es entero se reporta en la misma posición que con la
+# cadena de Comma binarios: el primer elemento o la coma anterior.
+@pytest.mark.parametrize('bad', [0, 1, 7, 499])
+def test_list_literal_error_position(bad):
+    data = benchmark.gen_list_literal(500, bad)
+    line_start = data.index('  f := ')
+    position = data.index('true', line_start)
+    if bad > 0:
+        position = data.rindex(',', line_start, position)
+    assert _check(data) == [f'There is no integer list at line 3 and column {position - line_start + 1}']
+
+# Como en la cadena binaria, los errores del segundo elemento se reportan antes
+# que el primer elemento inválido.
+@pytest.mark.parametrize('data, error', [
+    ('{\n  int x;\n  x := true, y\n}', 'Variable not declared at line 3 and column 14'),
+    ('{\n  function[..3] a;\n  a := a((3):0, p.7:3)\n}', 'Variable not declared at line 3 and column 17'),
+])
+def test_list_literal_second_element_first(data, error):
+    assert _check(data)[0] == error
+
+def test_list_literal_is_one_node():
+    n = 100000
+    result = compile_source(benchmark.gen_list_literal(n))
+    assert result.ok
+    assignment = next(child for child in result.ast.children if child.__class__ is Asig)
+    literal = assignment.children[1]
+    assert literal.__class__ is Comma
+    assert len(literal.children) == n
+
+
+# Anidamiento mucho mayor que el límite de recursión de Python: el chequeo
+# usa una pila propia.
+DEPTH = 20000
+
+@pytest.mark.parametrize('shape', ['blocks', 'while', 'if', 'not', 'plus', 'parens', 'statements'])
+def test_deep_programs(shape):
+    assert _check(benchmark.gen_nested(shape, DEPTH)) == []
+
+def test_deep_error_position():
+    data = benchmark.gen_nested('blocks', DEPTH).replace('a := 1', 'a := true')
+    line = data[:data.index('a := true')].count('\n') + 1
+    errors = _check(data)
+    assert len(errors) == 1
+    assert errors[0].lineno == line
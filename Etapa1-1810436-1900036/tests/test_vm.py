@@ -0,0 +1,59 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Archivos .imperatc: se escriben al compilar, se usan mientras el fuente no
+# cambie y se ignoran si están dañados.
+import io
+import vm
+
+PROGRAM = '{\n  int i;\n  while i < 3 --> i := i + 1 end;\n  print i\n}\n'
+
+
+def _write(path, text):
+    with open(path, 'w') as file:
+        file.write(text)
+
+def _output(program):
+    out = io.StringIO()
+    vm.execute(program, out)
+    return out.getvalue()
+
+def test_cache_is_written_and_used(tmp_path, monkeypatch):
+    path = str(tmp_path / 'prog.imperat')
+    _write(path, PROGRAM)
+    program, failure = vm.compile_file(path)
+    assert failure is None and _output(program) == '3\n'
+    assert (tmp_path / 'prog.imperatc').exists()
+
+    # El segundo compile_file no vuelve a compilar el fuente.
+    def fail(*args, **kwargs):
+        raise AssertionError('se recompiló el programa')
+    monkeypatch.setattr(vm, 'compile_ast', fail)
+    program, failure = vm.compile_file(path)
+    assert failure is None and _output(program) == '3\n'
+
+def test_edited_source_invalidates_cache(tmp_path):
+    path = str(tmp_path / 'prog.imperat')
+    _write(path, PROGRAM)
+    vm.compile_file(path)
+    _write(path, PROGRAM.replace('i < 3', 'i < 5'))
+    program, failure = vm.compile_file(path)
+    assert failure is None and _output(program) == '5\n'
+
+def test_corrupt_cache_is_recompiled(tmp_path):
+    path = str(tmp_path / 'prog.imperat')
+    _write(path, PROGRAM)
+    vm.compile_file(path)
+    with open(vm.cache_path(path), 'r+b') as file:
+        file.seek(len(vm.MAGIC) + 40)
+        file.write(b'garbage')
+    program, failure = vm.compile_file(path)
+    assert failure is None and _output(program) == '3\n'
+    (tmp_path / 'prog.imperatc').write_bytes(b'x')
+    program, failure = vm.compile_file(path)
+    assert failure is None and _output(program) == '3\n'
+
+def test_program_with_errors_is_not_cached(tmp_path):
+    path = str(tmp_path / 'prog.imperat')
+    _write(path, PROGRAM.replace('i := i + 1', 'i := true'))
+    program, failure = vm.compile_file(path)
+    assert program is None and not failure.ok
+    assert not (tmp_path / 'prog.imperatc').exists()
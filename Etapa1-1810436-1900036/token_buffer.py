@@ -0,0 +1,123 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Buffer compacto de tokens. En lugar de guardar un objeto LexToken por token,
+# guarda el tipo, el inicio, el fin y la línea de cada uno en arreglos
+# paralelos (array), y construye el valor solo cuando alguien lo pide.
+from array import array
+from bisect import bisect_right
+from lexer import tokens
+from fast_lexer import Token
+
+# Código numérico (un byte) de cada tipo de token.
+KINDS = tuple(tokens)
+CODES = {kind: code for code, kind in enumerate(KINDS)}
+
+# Tipos cuyo valor depende del texto; el resto siempre tiene el mismo valor.
+_NUM = CODES['TkNum']
+_STRING = CODES['TkString']
+_VARIABLE = {CODES['TkId'], _NUM, _STRING}
+
+
+class TokenBuffer:
+    def __init__(self, text=None):
+        self.kinds = array('B')
+        self.starts = array('q')
+        self.ends = array('q')
+        self.lines = array('q')
+        self.line_starts = array('q', [0])
+        # Con el texto fuente los valores se sacan de él; sin texto (archivo
+        # mapeado en memoria) se guardan los valores de Id, Num y String.
+        self.text = text
+        self._values = {}
+        self._lexemes = {}
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def append(self, kind, start, end, lineno, value):
+        code = CODES[kind]
+        if code in _VARIABLE:
+            if self.text is None:
+                self._values[len(self.kinds)] = value
+        elif code not in self._lexemes:
+            self._lexemes[code] = value
+        self.kinds.append(code)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.lines.append(lineno)
+
+    def kind(self, i):
+        return KINDS[self.kinds[i]]
+
+    def value(self, i):
+        """Valor del token `i`, igual al que tendría el LexToken."""
+        code = self.kinds[i]
+        if code not in _VARIABLE:
+            return self._lexemes[code]
+        if self.text is None:
+            return self._values[i]
+        if code == _NUM:
+            return int(self.text[self.starts[i]:self.ends[i]])
+        if code == _STRING:
+            return self.text[self.starts[i] + 1:self.ends[i] - 1]
+        return self.text[self.starts[i]:self.ends[i]]
+
+    def find_line(self, lexpos):
+        """Número de línea (desde 1) de la posición `lexpos`."""
+        return bisect_right(self.line_starts, lexpos)
+
+    def find_column(self, lexpos):
+        """Columna (desde 1) de la posición `lexpos`."""
+        return lexpos - self.line_starts[bisect_right(self.line_starts, lexpos) - 1] + 1
+
+    # Token `i` como objeto, con los mismos atributos que un LexToken.
+    def token_at(self, i, lexer=None):
+        return Token(KINDS[self.kinds[i]], self.value(i), self.lines[i],
+                     self.starts[i], lexer or self)
+
+    def __getitem__(self, i):
+        return self.token_at(i)
+
+    def __iter__(self):
+        for i in range(len(self.kinds)):
+            yield self.token_at(i)
+
+    def reader(self):
+        """Lector que se le puede pasar a parser.parse(lexer=...)."""
+        return TokenReader(self)
+
+
+# Recorre un TokenBuffer con la interfaz que usa yacc: token(), lineno y
+# find_column. Los tokens se crean uno a uno, a medida que el parser los pide.
+class TokenReader:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        self.index = 0
+        self.lineno = 1
+        self.find_line = buffer.find_line
+        self.find_column = buffer.find_column
+
+    def token(self):
+        i = self.index
+        if i >= len(self.buffer):
+            return None
+        self.index = i + 1
+        self.lineno = self.buffer.lines[i]
+        return self.buffer.token_at(i, self)
+
+    def __iter__(self):
+        return iter(self.token, None)
+
+
+# Lexea toda la entrada de `lexer` (ya se llamó a input()) y guarda los
+# tokens en un TokenBuffer. `text` es el texto fuente, si está en memoria.
+def buffer_tokens(lexer, text=None):
+    buffer = TokenBuffer(text)
+    append = buffer.append
+    token = lexer.token
+    while True:
+        tok = token()
+        if tok is None:
+            break
+        append(tok.type, tok.lexpos, lexer.lexpos, tok.lineno, tok.value)
+    buffer.line_starts = lexer.line_starts
+    return buffer
@@ -1,86 +1,155 @@
-import re
+from types import GeneratorType
 from ast_nodes import *
-from symbol_table import SymbolTable
+from symbol_table import ScopedSymbolTable
+from gcl_types import INT, BOOL, STRING, TYPE_ERROR, FunctionType, ListType, FUNCTION_TYPES
+from diagnostics import Diagnostic, FIRST, FAIL_FAST, COLLECT_ALL, POLICIES
 
 # TypeChecker es una clase que recorre el AST y verifica los tipos de las expresiones.
 # Utiliza una tabla de símbolos para verificar declaraciones y asignaciones.
 # Si encuentra un error de tipo, lo registra y devuelve un mensaje de error.
+# Qué errores se guardan depende de la política (ver diagnostics.py).
 class TypeChecker:
-    def __init__(self):
-        self.errors = []
-        self.current_table = SymbolTable()
+    # Tabla clase de nodo -> método de chequeo, llenada a medida que aparecen
+    # clases nuevas (ver _resolve_handler).
+    _handlers = {}
+
+    def __init__(self, symbol_table=None, policy=FIRST):
+        # Cada subclase tiene su propia tabla (puede redefinir métodos)
+        if '_handlers' not in type(self).__dict__:
+            type(self)._handlers = {}
+        if policy not in POLICIES:
+            raise ValueError(f"Política de errores desconocida: {policy}")
+        self.policy = policy
+        self.errors = []  # Diagnostic, en el orden en que se encontraron
+        # Ámbito global. Por defecto una ScopedSymbolTable (búsqueda O(1));
+        # también se puede pasar una SymbolTable(), que busca recorriendo los
+        # ámbitos padre.
+        self.current_table = symbol_table if symbol_table is not None else ScopedSymbolTable()
 
     def check_program(self, ast_node):
+        """
+        Chequea el programa y devuelve sus errores: todos con la política
+        'all', y si no solo el primero (o una lista vacía).
+        """
         if isinstance(ast_node, ASTNode):
-            self.check_node(ast_node)
-        return self.errors[:1]  # Solo devolvemos el primer error encontrado, si hay alguno.
-
-    def add_error(self, message, node=None):
-        if not self.errors:
-        # El que llama (como check_asig) 
-            self.errors.append(message)
-        return "TYPE_ERROR"
+            try:
+                self.check_node(ast_node)
+            except _StopChecking:
+                pass
+        if self.policy == COLLECT_ALL:
+            return list(self.errors)
+        return self.errors[:1]
+
+    def add_error(self, template, lineno=None, col_offset=None, **fields):
+        """
+        Registra un error en (lineno, col_offset) y devuelve TYPE_ERROR. El
+        mensaje no se arma aquí: Diagnostic lo formatea cuando se lee.
+        Con 'first' solo se guarda el primero y el resto se descarta; con
+        'fail-fast' el chequeo se detiene en el primero.
+        """
+        if self.errors and self.policy != COLLECT_ALL:
+            return TYPE_ERROR
+        self.errors.append(Diagnostic(template, lineno, col_offset, **fields))
+        if self.policy == FAIL_FAST:
+            raise _StopChecking()
+        return TYPE_ERROR
+
+    def _declare_undeclared(self, name, lineno, col_offset):
+        # Una variable no declarada se reporta una vez: después se declara
+        # con TYPE_ERROR en el ámbito actual y sus otros usos solo propagan
+        # el error.
+        self.current_table.declare(name, TYPE_ERROR, lineno, col_offset)
 
           
     def _find_error_node(self, start_node):
-        """Busca recursivamente el primer nodo marcado con type='TYPE_ERROR'."""
-        if getattr(start_node, 'type', None) == "TYPE_ERROR":
-            return start_node
-        
-        #Usamos el getattr es para evitar errores en nodos sin 'children'
-        for child in getattr(start_node, 'children', []):
-            found_node = self._find_error_node(child)
-            if found_node:
-                return found_node
+        """Busca en preorden el primer nodo marcado con type=TYPE_ERROR."""
+        stack = [start_node]
+        while stack:
+            node = stack.pop()
+            if getattr(node, 'type', None) is TYPE_ERROR:
+                return node
+            #Usamos el getattr es para evitar errores en nodos sin 'children'
+            stack.extend(reversed(getattr(node, 'children', ())))
         return None
 
-    def _is_integer_list(self, node):
+    def check_node(self, node):
         """
-        Función auxiliar recursiva.
-        Verifica que todos los elementos de una expresión de comas sean 'int'.
-        ASUME que los hijos ya han sido procesados por check_node.
+        Chequea `node` y devuelve su tipo. Los métodos check_* que tienen
+        hijos son generadores: `tipo = yield hijo` pide el chequeo del hijo y
+        recibe su tipo. Aquí se ejecutan con una pila explícita de
+        generadores en lugar de la pila de Python, así que la profundidad del
+        AST solo está limitada por la memoria. Un método también puede
+        devolver el tipo directamente (hojas) o ceder otro generador (una
+        función auxiliar), que se ejecuta como un paso más de la pila.
         """
-        if not isinstance(node, Comma):
-            # En el caso base, el tipo ya debería estar establecido.
-            if node.type != "int":
-                return (False, node)
-            return (True, None)
-    
-        # Si es una coma, sus hijos ya tienen su tipo (o son comas anidadas).
-        # Simplemente validamos recursivamente.
-        left_child = node.children[0]
-        right_child = node.children[1]
-
-        # Verificamos la rama izquierda. Si falla, el error está mas abajo
-        is_left_valid, offending_node_left = self._is_integer_list(left_child)
-        if not is_left_valid:
-            return (False, offending_node_left)
-    
-        # Verificamos la rama derecha.
-        is_right_valid, offending_node_right = self._is_integer_list(right_child)
-        if not is_right_valid:
-            # Si la rama derecha es inválida, el nodo actual (la coma) es el culpable.
-            return (False, node) 
-        
-        return (True, None)
-
-    def check_node(self, node):
-        class_name = type(node).__name__
-        if class_name == "ReadFunction":
-            method_name = "check_readfunction"
-        elif class_name == "WriteFunction":
-            method_name = "check_writefunction"
-        elif class_name == "App":  
-            method_name = "check_app"
-        else:
-            method_name = f'check_{class_name.lower()}'
-            
-        checker = getattr(self, method_name, self.generic_check)
-        return checker(node)
+        value = self._dispatch(node)
+        if value.__class__ is not GeneratorType:
+            return value
+        handlers = self._handlers
+        # `send` es el generador en curso; `stack`, los que esperan el
+        # resultado de su hijo.
+        stack = []
+        send = value.send
+        value = None
+        while True:
+            try:
+                item = send(value)
+            except StopIteration as stop:
+                value = stop.value
+                if not stack:
+                    return value
+                send = stack.pop()
+                continue
+            if item.__class__ is GeneratorType:
+                value = item
+            else:
+                # __class__ y no type(): los nodos de ast_arena son vistas que
+                # reportan la clase del nodo que representan.
+                handler = handlers.get(item.__class__)
+                if handler is None:
+                    handler = self._resolve_handler(item.__class__)
+                value = handler(self, item)
+            if value.__class__ is GeneratorType:
+                stack.append(send)
+                send = value.send
+                value = None
+
+    def _dispatch(self, node):
+        # Se busca en cada visita porque check_plus/check_app le cambian la
+        # clase a algunos nodos.
+        handler = self._handlers.get(node.__class__)
+        if handler is None:
+            handler = self._resolve_handler(node.__class__)
+        return handler(self, node)
+
+    # Envoltorios que solo llaman a otro método: la tabla apunta directo al
+    # método final y se ahorra una llamada por nodo.
+    _ALIASES = {
+        'check_minus': 'check_arithmetic', 'check_mult': 'check_arithmetic',
+        'check_equal': 'check_comparison', 'check_notequal': 'check_comparison',
+        'check_less': 'check_comparison_int', 'check_greater': 'check_comparison_int',
+        'check_leq': 'check_comparison_int', 'check_geq': 'check_comparison_int',
+        'check_and': 'check_logical', 'check_or': 'check_logical',
+    }
+
+    def _resolve_handler(self, node_class):
+        """
+        Busca el método de chequeo de una clase de nodo (check_<clase> o
+        generic_check) y lo guarda en la tabla de la clase del checker.
+        """
+        checker_class = type(self)
+        method_name = f'check_{node_class.__name__.lower()}'
+        handler = getattr(checker_class, method_name, checker_class.generic_check)
+        alias = self._ALIASES.get(method_name)
+        # Solo si el envoltorio no fue redefinido en una subclase
+        if alias and handler is TypeChecker.__dict__[method_name]:
+            handler = getattr(checker_class, alias)
+        checker_class._handlers[node_class] = handler
+        return handler
 
     def generic_check(self, node):
         for child in node.children:
-            self.check_node(child)
+            yield child
         return node.type
 
     def check_block(self, node):
@@ -91,34 +160,31 @@ class TypeChecker:
         # Procesar declaraciones primero para poblar la tabla de símbolos
         for child in node.children:
             if isinstance(child, Declare):
-                self.check_node(child)
+                yield child
         
         # Luego procesar el resto de las sentencias
         for child in node.children:
             if not isinstance(child, Declare):
-                self.check_node(child)
+                yield child
         
         # Salir del ámbito
         self.current_table = self.current_table.exit_scope()
         return None
 
     def check_declare(self, node):
-        decl_str = node.children[0]
-        if "function" in decl_str:
-            match = re.search(r'function\[\.\.(-?\d+)\]', decl_str)
-            if match:
-                upper_bound = int(match.group(1))
-                if upper_bound < 0:
-                    error_line = node.bound_lineno if node.bound_lineno is not None else node.lineno
-                    error_col = node.bound_col_offset if node.bound_col_offset is not None else node.col_offset
-                    error_message = f"Error: lower bound of the interval greater than the upper bound at line {error_line} and column {error_col}"
-                    return self.add_error(error_message, node)
-                
-        vars_part, type_part = decl_str.split(":", 1)
-        var_names = [name.strip() for name in vars_part.split(",")]
-        var_type = type_part.strip()
+        var_type = node.var_type
+        if isinstance(var_type, FunctionType):
+            upper_bound = var_type.bound
+            if upper_bound < 0:
+                error_line = node.bound_lineno if node.bound_lineno is not None else node.lineno
+                error_col = node.bound_col_offset if node.bound_col_offset is not None else node.col_offset
+                self.add_error("Error: lower bound of the interval greater than the upper bound at line {line} and column {col}",
+                               error_line, error_col)
+                # Las variables se declaran igual, con TYPE_ERROR, para que
+                # sus usos no se reporten como no declarados.
+                var_type = TYPE_ERROR
     
-        for var_name in var_names:
+        for var_name in node.names:
         # La ubicación (línea/columna) es la del nodo 'Declare',
         # que corresponde al inicio de la declaración (ej: 'int').
             lineno = node.lineno
@@ -133,23 +199,24 @@ class TypeChecker:
                 original_lineno = previous_declaration[1]
             
                 # Construimos el mensaje de error apuntando a la línea ORIGINAL.
-                error_message = f"Variable {var_name} is already declared in the block at line {original_lineno}"
-                self.add_error(error_message)
-                return # Detenemos el proceso para esta línea de declaración.
+                self.add_error("Variable {name} is already declared in the block at line {original_line}",
+                               lineno, col_offset, name=var_name, original_line=original_lineno)
+                # Se sigue con los demás nombres de la declaración.
     
     def check_writefunction(self, node):
         func_node = node.children[0]
         arg_node = node.children[1]
 
-        func_type = self.check_node(func_node)
+        func_type = (yield func_node)
 
-        if func_type == "TYPE_ERROR":
-            return "TYPE_ERROR"
+        if func_type is TYPE_ERROR:
+            return TYPE_ERROR
 
-        if not (isinstance(func_type, str) and "function" in func_type):
-            return self.add_error(f"Intento de llamar a un tipo no función ({func_type})", func_node)
+        if not isinstance(func_type, FUNCTION_TYPES):
+            return self.add_error("Intento de llamar a un tipo no función ({func_type})",
+                                  func_node.lineno, func_node.col_offset, func_type=func_type)
     
-        self.check_node(arg_node)
+        yield arg_node
     
         node.type = func_type
         return func_type
@@ -161,18 +228,25 @@ class TypeChecker:
         # Obtener el tipo de la variable (lado izquierdo)
         var_type = self.current_table.lookup(ident_node.name)
         if var_type is None:
-            error_message = f"Variable {ident_node.name} not declared at line {ident_node.lineno} and column {ident_node.col_offset}"
-            return self.add_error(error_message, ident_node)
+            self.add_error("Variable {name} not declared at line {line} and column {col}",
+                           ident_node.lineno, ident_node.col_offset, name=ident_node.name)
+            self._declare_undeclared(ident_node.name, ident_node.lineno, ident_node.col_offset)
+            var_type = TYPE_ERROR
 
         # Chequear el tipo de la expresión (lado derecho)
-        expr_type = self.check_node(expr_node)
+        expr_type = (yield expr_node)
+
+        # La variable ya tuvo un error (no declarada): solo se chequea la
+        # expresión, por si tiene errores propios.
+        if var_type is TYPE_ERROR:
+            return TYPE_ERROR
 
-        # Si expr_type es "TYPE_ERROR", significa que hubo un error en la expresión.
-        if expr_type == "TYPE_ERROR":
-            node.type = "TYPE_ERROR" # Marcar el nodo de asignación como erróneo
-            return "TYPE_ERROR"
+        # Si expr_type es TYPE_ERROR, significa que hubo un error en la expresión.
+        if expr_type is TYPE_ERROR:
+            node.type = TYPE_ERROR # Marcar el nodo de asignación como erróneo
+            return TYPE_ERROR
 
-        #A partir de aquí, sabemos que expr_type es un tipo válido, no "TYPE_ERROR"
+        #A partir de aquí, sabemos que expr_type es un tipo válido, no TYPE_ERROR
         #Ahora Comprobamos si los tipos coinciden.
         if var_type == expr_type:
             ident_node.type = var_type
@@ -180,8 +254,8 @@ class TypeChecker:
             return var_type
 
         # CHEQUEOS ESPECÍFICOS:
-        is_var_function = isinstance(var_type, str) and var_type.startswith("function[..")
-        is_expr_a_list = isinstance(expr_type, str) and expr_type.startswith("function with length=")
+        is_var_function = isinstance(var_type, FunctionType)
+        is_expr_a_list = isinstance(expr_type, ListType)
 
         # Asignando una llamada de función a una variable no-función
       
@@ -189,26 +263,23 @@ class TypeChecker:
             variable_name = ident_node.name
             error_line = ident_node.lineno
             error_col = ident_node.col_offset
-            error_message = f"Variable {variable_name} is expected to be a function at line {error_line} and column {error_col}"
-            node.type = "TYPE_ERROR"
-            return self.add_error(error_message)
+            node.type = TYPE_ERROR
+            return self.add_error("Variable {name} is expected to be a function at line {line} and column {col}",
+                                  error_line, error_col, name=variable_name)
 
         # Asignando una lista a una función (compara longitudes)
         if is_var_function and is_expr_a_list:
-            match_var = re.search(r'function\[\.\.(\d+)\]', var_type)
-            match_expr = re.search(r'function with length=(\d+)', expr_type)
-
-            if match_var and match_expr:
-                expected_len = int(match_var.group(1)) + 1
-                actual_len = int(match_expr.group(1))
+            if var_type.bound >= 0:
+                expected_len = var_type.bound + 1
+                actual_len = expr_type.length
 
                 if expected_len != actual_len:
                     error_line = node.lineno
                     error_col = node.col_offset
                     
-                    error_message = f"It is expected a list of length {expected_len} at line {error_line} and column {error_col + 1}"
-                    node.type = "TYPE_ERROR"
-                    return self.add_error(error_message)
+                    node.type = TYPE_ERROR
+                    return self.add_error("It is expected a list of length {length} at line {line} and column {col}",
+                                          error_line, error_col + 1, length=expected_len)
                 else:
                     # Si las longitudes coinciden, la asignación es válida.
                     ident_node.type = var_type
@@ -217,7 +288,7 @@ class TypeChecker:
 
         #Asignando un entero a una función
         
-        if is_var_function and isinstance(expr_node, Literal) and expr_type == "int":
+        if is_var_function and isinstance(expr_node, Literal) and expr_type is INT:
             ident_node.type = var_type
             node.type = var_type
             return var_type
@@ -226,54 +297,71 @@ class TypeChecker:
         variable_name = ident_node.name
         error_line = ident_node.lineno
         error_col = ident_node.col_offset
-        error_message = f"Type error. Variable {variable_name} has different type than expression at line {error_line} and column {error_col}"
-        node.type = "TYPE_ERROR"
-        return self.add_error(error_message)
+        node.type = TYPE_ERROR
+        return self.add_error("Type error. Variable {name} has different type than expression at line {line} and column {col}",
+                              error_line, error_col, name=variable_name)
     
 
-    def _count_comma_elements(self, node):
-        if isinstance(node, Comma):
-            # Una coma une dos sub-expresiones, contamos los elementos de ambas.
-            return self._count_comma_elements(node.children[0]) + self._count_comma_elements(node.children[1])
-        return 1 # Cualquier otro nodo es un solo elemento.
-
     def check_comma(self, node):
-        # Aseguramos un recorrido post-orden llamando a check_node en los hijos PRIMERO.
-        # Esto garantiza que cuando lleguemos a la validación, los hijos ya tengan su tipo.
-        self.check_node(node.children[0])
-        self.check_node(node.children[1])
-
-        # Ahora, realizar la validación con la función auxiliar.
-        is_valid, offending_node = self._is_integer_list(node)
-
-        if not is_valid:
-            error_message = f"There is no integer list at line {offending_node.lineno} and column {offending_node.col_offset}"
-            node.type = "TYPE_ERROR"
-            return self.add_error(error_message, offending_node)
-
-        #Contar los elementos y asignar el tipo al nodo actual.
-        count = self._count_comma_elements(node)
-        node.type = f"function with length={count}"
+        # Una sola pasada sobre los elementos, en orden. El primer elemento
+        # que no es entero (o una lista de enteros entre paréntesis) es el
+        # error; el nodo que se reporta es el mismo que en la cadena de Comma
+        # binarios: el propio elemento si es el primero, o si no la coma que
+        # lo precede. Como en la cadena, cuyo par más interno tiene los dos
+        # primeros elementos, el primero se valida después de chequear el
+        # segundo (los errores del segundo se reportan antes).
+        count = 0
+        error_index = None
+        children = node.children
+        for index, element in enumerate(children):
+            yield element
+            if index == 0 or error_index is not None:
+                continue
+            for position in ((0, index) if index == 1 else (index,)):
+                element = children[position]
+                if isinstance(element, Comma):
+                    if element.type is not TYPE_ERROR:
+                        count += element.type.length
+                        continue
+                elif element.type is INT:
+                    count += 1
+                    continue
+                error_index = position
+                # Un elemento con TYPE_ERROR ya reportó su error: no se repite.
+                if element.type is not TYPE_ERROR:
+                    if position == 0:
+                        error_line, error_col = element.lineno, element.col_offset
+                    else:
+                        error_line = node.separators[2 * position - 2]
+                        error_col = node.separators[2 * position - 1]
+                    self.add_error("There is no integer list at line {line} and column {col}",
+                                   error_line, error_col)
+                break
+
+        node.error_index = error_index
+        if error_index is not None:
+            node.type = TYPE_ERROR
+            return TYPE_ERROR
+        node.type = ListType(count)
         return node.type
     
     def check_twopoints(self, node):
         # Asume que ':' combina dos elementos en una "función" de longitud 2.
-        self.check_node(node.children[0])
-        self.check_node(node.children[1])
-        node.type = "function with length=2" 
+        yield node.children[0]
+        yield node.children[1]
+        node.type = ListType(2)
         return node.type
 
     def check_ident(self, node):
         var_type = self.current_table.lookup(node.name)
         if var_type is None:
-            #Construir el mensaje de error con la ubicación del nodo Ident
-            error_message = f"Variable not declared at line {node.lineno} and column {node.col_offset}"
-        
             #Marcar el nodo como error para que _find_error_node pueda encontrarlo si es necesario
-            node.type = "TYPE_ERROR"
+            node.type = TYPE_ERROR
+            self._declare_undeclared(node.name, node.lineno, node.col_offset)
 
-            #Añadir el mensaje formateado y devolver la señal de error
-            return self.add_error(error_message, node)
+            #Añadir el error con la ubicación del nodo Ident y devolver la señal de error
+            return self.add_error("Variable not declared at line {line} and column {col}",
+                                  node.lineno, node.col_offset)
         
         node.type = var_type
         return var_type
@@ -282,61 +370,58 @@ class TypeChecker:
         return node.type
 
     def check_plus(self, node):
-        left_type = self.check_node(node.children[0])
-        right_type = self.check_node(node.children[1])
+        left_type = (yield node.children[0])
+        right_type = (yield node.children[1])
 
         # Propagar errores existentes de los hijos
-        if left_type == "TYPE_ERROR" or right_type == "TYPE_ERROR":
-            return "TYPE_ERROR"
+        if left_type is TYPE_ERROR or right_type is TYPE_ERROR:
+            return TYPE_ERROR
 
         #Si los hijos están bien, verificamos las operaciones válidas:
     
         # Caso 1: Suma de enteros
-        if left_type == "int" and right_type == "int":
-            node.type = "int"
-            return "int"
+        if left_type is INT and right_type is INT:
+            node.type = INT
+            return INT
     
         # Caso 2: Concatenación de strings
-        valid_concat_types = ["String", "int", "bool"]
-        if (left_type == "String" and right_type in valid_concat_types) or \
-            (right_type == "String" and left_type in valid_concat_types):
+        valid_concat_types = (STRING, INT, BOOL)
+        if (left_type is STRING and right_type in valid_concat_types) or \
+            (right_type is STRING and left_type in valid_concat_types):
             node.__class__ = Concat
-            node.type = "String"
-            return "String"
+            node.type = STRING
+            return STRING
 
         # Si ninguna operación es válida, ESTE nodo es la fuente del error
-        node.type = "TYPE_ERROR"
-        error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-        return self.add_error(error_message, node)
+        node.type = TYPE_ERROR
+        return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
     
     def check_minus(self, node): return self.check_arithmetic(node)
     def check_mult(self, node): return self.check_arithmetic(node)
 
     def check_arithmetic(self, node):
         if len(node.children) == 2: # Operador Binario
-            left_type = self.check_node(node.children[0])
-            right_type = self.check_node(node.children[1])
+            left_type = (yield node.children[0])
+            right_type = (yield node.children[1])
 
-            if left_type == "TYPE_ERROR" or right_type == "TYPE_ERROR":
-                return "TYPE_ERROR" # Propagar error de hijos
+            if left_type is TYPE_ERROR or right_type is TYPE_ERROR:
+                return TYPE_ERROR # Propagar error de hijos
 
-            if left_type != "int" or right_type != "int":
-                node.type = "TYPE_ERROR" # Error en este nodo
-                error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-                return self.add_error(error_message)
+            if left_type is not INT or right_type is not INT:
+                node.type = TYPE_ERROR # Error en este nodo
+                return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
         else: # Operador Unario
-            child_type = self.check_node(node.children[0])
+            child_type = (yield node.children[0])
 
-            if child_type == "TYPE_ERROR":
-                return "TYPE_ERROR" # Propagar error de hijo
+            if child_type is TYPE_ERROR:
+                return TYPE_ERROR # Propagar error de hijo
 
-            if child_type != "int":
-                node.type = "TYPE_ERROR"
-                error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-                return self.add_error(error_message, node)
+            if child_type is not INT:
+                node.type = TYPE_ERROR
+                return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
     
-        node.type = "int"
-        return "int"
+        node.type = INT
+        return INT
 
     # Comprobaciones de comparación
     def check_equal(self, node): return self.check_comparison(node)
@@ -347,147 +432,143 @@ class TypeChecker:
     def check_geq(self, node): return self.check_comparison_int(node)
     
     def check_comparison(self, node): # Para == y <>
-        left_type = self.check_node(node.children[0])
-        right_type = self.check_node(node.children[1])
+        left_type = (yield node.children[0])
+        right_type = (yield node.children[1])
 
         # Propagamos errores existentes
-        if left_type == "TYPE_ERROR" or right_type == "TYPE_ERROR":
-            node.type = "TYPE_ERROR"
-            return "TYPE_ERROR"
+        if left_type is TYPE_ERROR or right_type is TYPE_ERROR:
+            node.type = TYPE_ERROR
+            return TYPE_ERROR
 
         # Generamos un nuevo error si los tipos no coinciden
         if left_type != right_type:
-            node.type = "TYPE_ERROR" 
-            error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-            return self.add_error(error_message, node)
+            node.type = TYPE_ERROR 
+            return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
     
-        node.type = "bool"
-        return "bool"
+        node.type = BOOL
+        return BOOL
     
     # Comprobación específica para comparaciones con enteros
     def check_comparison_int(self, node): # Para <, >, <=, >=
-        left_type = self.check_node(node.children[0])
-        right_type = self.check_node(node.children[1])
+        left_type = (yield node.children[0])
+        right_type = (yield node.children[1])
     
-        if left_type == "TYPE_ERROR" or right_type == "TYPE_ERROR":
-            node.type = "TYPE_ERROR"
-            return "TYPE_ERROR"
+        if left_type is TYPE_ERROR or right_type is TYPE_ERROR:
+            node.type = TYPE_ERROR
+            return TYPE_ERROR
 
-        if left_type != "int" or right_type != "int":
-            node.type = "TYPE_ERROR" 
-            error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-            return self.add_error(error_message, node)
+        if left_type is not INT or right_type is not INT:
+            node.type = TYPE_ERROR 
+            return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
 
-        node.type = "bool"
-        return "bool"
+        node.type = BOOL
+        return BOOL
     
     def check_and(self, node): return self.check_logical(node)
     def check_or(self, node): return self.check_logical(node)
 
     # Comprobación lógica para 'and' y 'or'
     def check_logical(self, node):
-        left_type = self.check_node(node.children[0])
-        right_type = self.check_node(node.children[1])
+        left_type = (yield node.children[0])
+        right_type = (yield node.children[1])
     
         #Comprobamos si el error viene de abajo
-        if left_type == "TYPE_ERROR" or right_type == "TYPE_ERROR":
-            return "TYPE_ERROR"
+        if left_type is TYPE_ERROR or right_type is TYPE_ERROR:
+            return TYPE_ERROR
         
         #Comprobamos si este nodo causa un nuevo error
-        if left_type != "bool" or right_type != "bool":
-            node.type = "TYPE_ERROR"
+        if left_type is not BOOL or right_type is not BOOL:
+            node.type = TYPE_ERROR
             # Creamos el mensaje usando la ubicación del operador 'and'/'or'
-            error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
             # Añadimos el error y retornamos la señal
-            return self.add_error(error_message, node)
+            return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
         
-        node.type = "bool"
-        return "bool"
+        node.type = BOOL
+        return BOOL
 
     
 
     def check_not(self, node):
-        child_type = self.check_node(node.children[0])
+        child_type = (yield node.children[0])
     
         # Si el hijo ya tuvo un error (ej. variable no declarada), propagamos
-        if child_type == "TYPE_ERROR":
-            node.type = "TYPE_ERROR"
-            return "TYPE_ERROR"
+        if child_type is TYPE_ERROR:
+            node.type = TYPE_ERROR
+            return TYPE_ERROR
 
         # Si el hijo es de tipo incorrecto, ESTE nodo es la fuente del error
-        if child_type != "bool":
-            node.type = "TYPE_ERROR"
-            error_message = f"Type error in line {node.lineno} and column {node.col_offset}"
-            return self.add_error(error_message, node)
+        if child_type is not BOOL:
+            node.type = TYPE_ERROR
+            return self.add_error("Type error in line {line} and column {col}", node.lineno, node.col_offset)
     
-        node.type = "bool"
-        return "bool"
+        node.type = BOOL
+        return BOOL
 
     def check_if(self, node):
+        result = None
         for guard_clause in node.children:
             # Cada hijo es un nodo Guard
             cond_node = guard_clause.children[0]
             body_node = guard_clause.children[1]
             
-            cond_type = self.check_node(cond_node)
-            if cond_type != "bool":
+            cond_type = (yield cond_node)
+            if cond_type is not BOOL:
                 # Si la guarda no es booleana, este es el error.
-                # Propagamos el error si ya venía de la expresión (Variable not declared)
-                if cond_type == "TYPE_ERROR":
-                    return "TYPE_ERROR"
-
-                # Si la expresión es válida pero de tipo incorrecto (ej: int) creamos el error aquí.
-                error_message = f"No boolean guard at line {guard_clause.lineno} and column {guard_clause.col_offset}"
-                node.type = "TYPE_ERROR" # Marcar el nodo 'If' como erróneo
-                # Añadimos el error y retornamos la señal para detener el chequeo.
-                return self.add_error(error_message, cond_node)     # Propagamos el error
-            
-            self.check_node(body_node)
-        return None
+                # Si ya venía de la expresión (Variable not declared) solo se propaga.
+                if cond_type is not TYPE_ERROR:
+                    # Si la expresión es válida pero de tipo incorrecto (ej: int) creamos el error aquí.
+                    node.type = TYPE_ERROR # Marcar el nodo 'If' como erróneo
+                    self.add_error("No boolean guard at line {line} and column {col}",
+                                   guard_clause.lineno, guard_clause.col_offset)
+                result = TYPE_ERROR
+            # Los cuerpos y las demás guardas se chequean igual: sus errores
+            # son independientes de este.
+            yield body_node
+        return result
 
     # Función auxiliar para validar los argumentos de las funciones de modificación
     # (como WriteFunction o App) que esperan pares clave:valor.
     def _check_function_modification_args(self, arg_node):
         """
         Función auxiliar recursiva para validar los argumentos.
-        Devuelve None si es válido, o el NODO que causa el error en caso contrario.
+        Devuelve None si es válido, el NODO que causa el error en caso contrario,
+        o TYPE_ERROR si el error ya se reportó en una subexpresión.
      """
         if isinstance(arg_node, TwoPoints):
             key_node = arg_node.children[0]
             val_node = arg_node.children[1]
 
-            key_type = self.check_node(key_node)
-            val_type = self.check_node(val_node)
+            key_type = (yield key_node)
+            val_type = (yield val_node)
 
-        # Si la clave no es un entero, devolvemos el nodo de la clave.
-            if key_type != "int":
-                if key_type != "TYPE_ERROR": key_node.type = "TYPE_ERROR"
+        # Si la clave o el valor ya tenían un error (reportado), solo se propaga.
+        # Si no es un entero, devolvemos el nodo de la clave.
+            if key_type is not INT:
+                if key_type is TYPE_ERROR: return TYPE_ERROR
+                key_node.type = TYPE_ERROR
                 return key_node # Devolver el nodo erróneo
 
         # Si el valor no es un entero, devolvemos el nodo del valor.
-            if val_type != "int":
-                if val_type != "TYPE_ERROR": val_node.type = "TYPE_ERROR"
+            if val_type is not INT:
+                if val_type is TYPE_ERROR: return TYPE_ERROR
+                val_node.type = TYPE_ERROR
                 return val_node #Devolver el nodo erróneo
         
         # Si todo está bien para este par, no hay error.
             return None
 
         elif isinstance(arg_node, Comma):
-        # Si es una coma, chequear ambas ramas y devolver el primer error que se encuentre.
-            left_error_node = self._check_function_modification_args(arg_node.children[0])
-            if left_error_node:
-                return left_error_node
-        
-            right_error_node = self._check_function_modification_args(arg_node.children[1])
-            if right_error_node:
-                return right_error_node
-            
+        # Si es una lista, chequear los elementos en orden y devolver el primer error que se encuentre.
+            for element in arg_node.children:
+                error_node = yield self._check_function_modification_args(element)
+                if error_node:
+                    return error_node
             return None
 
         else:
             # Cualquier otra cosa es un error estructural (p.ej. A(3) en lugar de A(clave:valor))
-            self.check_node(arg_node) # Chequeamos para propagar errores internos.
-            arg_node.type = "TYPE_ERROR"
+            yield arg_node # Chequeamos para propagar errores internos.
+            arg_node.type = TYPE_ERROR
             return arg_node # Devolvemos el nodo del argumento completo
     
     # Chequeo específico para nodos 'While'
@@ -497,64 +578,57 @@ class TypeChecker:
         cond_node = then_node.children[0]
         body_node = then_node.children[1]
 
-        cond_type = self.check_node(cond_node)
+        cond_type = (yield cond_node)
+        result = None
         
-        if cond_type != "bool":
-            if cond_type == "TYPE_ERROR":
-                return "TYPE_ERROR"
-
-            error_message = f"No boolean guard at line {then_node.lineno} and column {then_node.col_offset}"
-            node.type = "TYPE_ERROR"
-            return self.add_error(error_message, cond_node)
-
-        self.check_node(body_node)
-        return None
+        if cond_type is not BOOL:
+            if cond_type is not TYPE_ERROR:
+                node.type = TYPE_ERROR
+                self.add_error("No boolean guard at line {line} and column {col}",
+                               then_node.lineno, then_node.col_offset)
+            result = TYPE_ERROR
+
+        # El cuerpo se chequea aunque la guarda tenga un error
+        yield body_node
+        return result
     
-    # Esta es una función auxiliar para contar recursivamente
-    def _count_comma_elements(self, node):
-        
-        if not isinstance(node, Comma):
-            # Si no es una coma, es 1 elemento (e.g., un Literal)
-            return 1
-        
-        # Si es una coma, suma los elementos de la izquierda y la derecha
-        return self._count_comma_elements(node.children[0]) + self._count_comma_elements(node.children[1])
-          
     def check_readfunction(self, node): 
         func_node = node.children[0]
         arg_node = node.children[1]
 
-        func_type = self.check_node(func_node)
+        func_type = (yield func_node)
     
         # Propagamos errores que vengan de la "función" (ej: variable no declarada)
-        if func_type == "TYPE_ERROR":
-            return "TYPE_ERROR"
+        if func_type is TYPE_ERROR:
+            yield arg_node # El índice puede tener errores propios
+            return TYPE_ERROR
 
         #El chequeo específico de indexación
-        if not (isinstance(func_type, str) and func_type.startswith("function[..")):
-            #Construimos el mensaje de error 
+        if not isinstance(func_type, FunctionType):
             var_name = func_node.name if isinstance(func_node, Ident) else 'expression'
-            error_message = f"Error. {var_name} is not indexable at line {func_node.lineno} and column {func_node.col_offset}"
         
             #Marcar el nodo como la fuente del error
-            node.type = "TYPE_ERROR" 
+            node.type = TYPE_ERROR 
 
             #Añadir el error y propagarlo
-            return self.add_error(error_message, node)
+            self.add_error("Error. {name} is not indexable at line {line} and column {col}",
+                           func_node.lineno, func_node.col_offset, name=var_name)
+            yield arg_node
+            return TYPE_ERROR
 
         # El resto de la lógica para una indexación válida
-        arg_type = self.check_node(arg_node)
+        arg_type = (yield arg_node)
 
-        if arg_type == "TYPE_ERROR":
-            return "TYPE_ERROR" # Propagar error del argumento
+        if arg_type is TYPE_ERROR:
+            return TYPE_ERROR # Propagar error del argumento
 
-        if arg_type != "int":
-            error_message = f"Error. Not integer index for function at line {arg_node.lineno} and column {arg_node.col_offset}"
-            node.type = "TYPE_ERROR"
-            return self.add_error(error_message, arg_node)
+        if arg_type is not INT:
+            node.type = TYPE_ERROR
+            return self.add_error("Error. Not integer index for function at line {line} and column {col}",
+                                  arg_node.lineno, arg_node.col_offset)
     
-        node.type = "int" # La indexación de una función siempre devuelve un int
-        return "int"
+        node.type = INT # La indexación de una función siempre devuelve un int
+        return INT
     
 
     # Chequeo específico para nodos 'App' (llamadas a funciones)
@@ -564,29 +638,34 @@ class TypeChecker:
         func_node = node.children[0]
         arg_node = node.children[1]
 
-        func_type = self.check_node(func_node)
+        func_type = (yield func_node)
 
-        if func_type == "TYPE_ERROR":
-            return "TYPE_ERROR"
+        if func_type is TYPE_ERROR:
+            return TYPE_ERROR
 
-        if not (isinstance(func_type, str) and "function" in func_type):
-            error_message = f"The function modification operator is use in not function variable at line {func_node.lineno} and column {func_node.col_offset}"
-            node.type = "TYPE_ERROR"
-            return self.add_error(error_message, node)
+        if not isinstance(func_type, FUNCTION_TYPES):
+            node.type = TYPE_ERROR
+            return self.add_error("The function modification operator is use in not function variable at line {line} and column {col}",
+                                  func_node.lineno, func_node.col_offset)
     
         # Llamamos a la función auxiliar y guardamos el resultado
-        error_node = self._check_function_modification_args(arg_node)
+        error_node = yield self._check_function_modification_args(arg_node)
+
+        # El error ya se reportó en un argumento
+        if error_node is TYPE_ERROR:
+            node.type = TYPE_ERROR
+            return TYPE_ERROR
 
         # Si nos devolvió un nodo, significa que hubo un error
         if error_node:
             # Usamos la ubicación del nodo erróneo para el mensaje
-            error_message = f"Expected expression of type int at line {error_node.lineno} and column {error_node.col_offset}"
-            node.type = "TYPE_ERROR" 
-            return self.add_error(error_message)
+            node.type = TYPE_ERROR 
+            return self.add_error("Expected expression of type int at line {line} and column {col}",
+                                  error_node.lineno, error_node.col_offset)
     
         # Si todo está bien, continuamos como antes
         node.__class__ = WriteFunction
-        self.check_node(arg_node)
+        yield arg_node
         node.type = func_type
         return func_type
 
@@ -594,8 +673,8 @@ class TypeChecker:
         expr_node = node.children[0]
 
         # Chequeamos los tipos de la expresión normalmente.
-        expr_type = self.check_node(expr_node)
-        if expr_type == "TYPE_ERROR":
+        expr_type = (yield expr_node)
+        if expr_type is TYPE_ERROR:
             return expr_type # Propagar el error
 
         # El tipo del nodo 'print' es el tipo final de la expresión.
@@ -610,5 +689,10 @@ class TypeChecker:
     # Simplemente recorre los hijos y aplica el chequeo genérico.
     def check_sequencing(self, node):
         for child in node.children:
-            self.check_node(child)
-        return None
\ No newline at end of file
+            yield child
+        return None
+
+
+# La lanza add_error con la política 'fail-fast' para cortar el recorrido.
+class _StopChecking(Exception):
+    pass
@@ -0,0 +1,794 @@
+# Autores: Angel Valero 18-10436 y Gabriel Seijas 19-00036
+# Segundo backend de ejecución: el AST chequeado se compila a bytecode para
+# una máquina de pila, con la misma semántica que evaluator.py (los errores
+# de ejecución son los mismos ExecutionError).
+#
+# Un Code tiene las instrucciones en un array('q') (cada una es el código de
+# operación seguido de sus operandos), la tabla de constantes, la tabla de
+# posiciones (línea, columna) para los errores de ejecución y el tamaño del
+# marco de variables (resolver.resolve con flatten=True). Hay
+# superinstrucciones para las formas más comunes: x := x + c (INC),
+# comparaciones de enteros como guardias de while e if (comparan y saltan
+# en una sola instrucción), f.i y f := f(i:v) sobre una variable.
+#
+# El compilador recorre el AST con una pila de trabajo explícita (nodos por
+# compilar y pasos pendientes, como parchar un salto), así que la
+# profundidad del AST solo está limitada por la memoria; la máquina tampoco
+# usa la pila de Python.
+#
+# El bytecode se guarda junto al archivo fuente (prog.imperat ->
+# prog.imperatc), como los .pyc: la cabecera tiene un hash del fuente y del
+# código del compilador, y si coincide el programa se ejecuta sin lexear,
+# parsear ni chequear. Uso: python vm.py [--no-cache] [--dis] <archivo.imperat>
+import argparse
+import hashlib
+import marshal
+import os
+import sys
+from array import array
+from itertools import islice
+from operator import eq, ne, lt, le, gt, ge
+import table_cache
+from ast_nodes import (Declare, Ident, Literal, String, Plus, Minus, Mult, Equal, NotEqual, Less,
+                       Greater, Leq, Geq, Comma, Concat, WriteFunction)
+from gcl_types import FunctionType
+from resolver import resolve
+from evaluator import (ExecutionError, out_of_domain, no_true_guard, string_value, text,
+                       block_defaults, function_pairs, flat_statements)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# --- Instrucciones ------------------------------------------------------------
+
+(LOAD, LOAD_CONST, STORE, INC, JUMP_IF_LESS_VC, JUMP_IF_LESS_VV, JUMP_IF_LEQ_VC,
+ JUMP_IF_LEQ_VV, JUMP_IF_VC, JUMP_IF_VV, JUMP_IF_VAR, JUMP, POP_JUMP_IF_TRUE,
+ ADD, SUB, MUL, ADD_CONST, SUB_CONST, MUL_CONST, LESS, LEQ, GREATER, GEQ, EQUAL, NOT_EQUAL, NEG,
+ NOT, JUMP_IF_FALSE_OR_POP, JUMP_IF_TRUE_OR_POP, READ_ITEM, READ_VAR, READ, CHECK_INDEX, SET_ITEM,
+ STORE_ITEM, LOAD_COPY, LOAD_LIST, BUILD_LIST, FILL, CONCAT, PRINT, INIT, NEW_FUNCTION, NO_GUARD,
+ RETURN, HALT, LOAD2, LOAD_CHECK, READ_VAR_AT, POP_JUMP_IF) = range(50)
+
+# Nombre y operandos de cada instrucción, en orden de código. `slot` es una
+# posición del marco, `k` una constante, `pos` una posición de la tabla,
+# `target` un índice del código y `cmp` un índice de _COMPARISONS. Los saltos
+# condicionales saltan si la condición es cierta.
+INSTRUCTIONS = (
+    ('LOAD', ('slot',)),                         # apila frame[slot]
+    ('LOAD_CONST', ('k',)),
+    ('STORE', ('slot',)),                        # frame[slot] = desapila
+    ('INC', ('slot', 'k')),                      # frame[slot] += k
+    ('JUMP_IF_LESS_VC', ('slot', 'k', 'target')),
+    ('JUMP_IF_LESS_VV', ('slot', 'slot', 'target')),
+    ('JUMP_IF_LEQ_VC', ('slot', 'k', 'target')),
+    ('JUMP_IF_LEQ_VV', ('slot', 'slot', 'target')),
+    ('JUMP_IF_VC', ('cmp', 'slot', 'k', 'target')),
+    ('JUMP_IF_VV', ('cmp', 'slot', 'slot', 'target')),
+    ('JUMP_IF_VAR', ('slot', 'target')),
+    ('JUMP', ('target',)),
+    ('POP_JUMP_IF_TRUE', ('target',)),
+    ('ADD', ()), ('SUB', ()), ('MUL', ()),
+    ('ADD_CONST', ('k',)), ('SUB_CONST', ('k',)), ('MUL_CONST', ('k',)),
+    ('LESS', ()), ('LEQ', ()), ('GREATER', ()), ('GEQ', ()), ('EQUAL', ()), ('NOT_EQUAL', ()),
+    ('NEG', ()), ('NOT', ()),
+    ('JUMP_IF_FALSE_OR_POP', ('target',)),       # and: deja el false y salta
+    ('JUMP_IF_TRUE_OR_POP', ('target',)),        # or: deja el true y salta
+    ('READ_ITEM', ('slot', 'index')),            # frame[slot][index], índice ya chequeado
+    ('READ_VAR', ('slot', 'size', 'pos')),       # frame[slot][desapila]
+    ('READ', ('size', 'pos')),                   # función.índice, los dos en la pila
+    ('CHECK_INDEX', ('size', 'pos')),            # chequea la clave en el tope
+    ('SET_ITEM', ()),                            # función, clave, valor -> función
+    ('STORE_ITEM', ('slot',)),                   # frame[slot][clave] = valor
+    ('LOAD_COPY', ('slot',)),                    # apila una copia de frame[slot]
+    ('LOAD_LIST', ('k',)),                       # apila una lista nueva con la tupla k
+    ('BUILD_LIST', ('count',)),
+    ('FILL', ('slot', 'size')),                  # frame[slot] = [desapila] * size
+    ('CONCAT', ('count',)),
+    ('PRINT', ()),
+    ('INIT', ('slot', 'k')),                     # variables de un bloque desde slot
+    ('NEW_FUNCTION', ('slot', 'size')),
+    ('NO_GUARD', ('pos',)),
+    ('RETURN', ()),
+    ('HALT', ()),
+    ('LOAD2', ('slot', 'slot')),                 # apila las dos variables
+    ('LOAD_CHECK', ('slot', 'size', 'pos')),     # LOAD y CHECK_INDEX
+    ('READ_VAR_AT', ('slot', 'slot', 'size', 'pos')),  # frame[slot][frame[slot2]]
+    ('POP_JUMP_IF', ('cmp', 'target')),          # compara los dos del tope y salta si es cierto
+)
+
+# Comparaciones de JUMP_IF_VC/VV y POP_JUMP_IF.
+_COMPARISONS = (lt, le, gt, ge, eq, ne)
+_COMPARISON_INDEX = {Less: 0, Leq: 1, Greater: 2, Geq: 3, Equal: 4, NotEqual: 5}
+_COMPARISON_OPS = {Less: LESS, Leq: LEQ, Greater: GREATER, Geq: GEQ, Equal: EQUAL,
+                   NotEqual: NOT_EQUAL}
+# Operador -> (instrucción, instrucción con constante a la derecha).
+_ARITHMETIC = {Plus: (ADD, ADD_CONST), Minus: (SUB, SUB_CONST), Mult: (MUL, MUL_CONST)}
+
+
+# Programa compilado.
+class Code:
+    __slots__ = ('code', 'constants', 'positions', 'frame_size')
+
+    def __init__(self, code, constants, positions, frame_size):
+        self.code = code
+        self.constants = constants
+        self.positions = positions
+        self.frame_size = frame_size
+
+    def run(self, out=None):
+        """Como evaluator.Program.run: ejecuta el programa con execute."""
+        execute(self, out)
+
+
+# --- Compilador ----------------------------------------------------------------
+
+# Clave de una constante en la tabla: True y 1 (o (0,) y (False,)) son
+# iguales como claves de dict pero son constantes distintas.
+def _constant_key(value):
+    if value.__class__ is tuple:
+        return tuple, tuple((item.__class__, item) for item in value)
+    return value.__class__, value
+
+
+class _Compiler:
+    def __init__(self):
+        self.code = array('q')
+        self.constants = []
+        self.positions = []
+        self._constant_index = {}
+        self._position_index = {}
+        # Nodos por compilar y pasos pendientes (funciones sin argumentos),
+        # el próximo al final.
+        self.work = []
+
+    def compile(self, root):
+        work = self.work
+        work.append(root)
+        while work:
+            item = work.pop()
+            if callable(item):
+                item()
+            else:
+                getattr(self, f'compile_{item.__class__.__name__.lower()}')(item)
+        self.emit(HALT)
+
+    def schedule(self, *items):
+        """Agrega `items` para compilarlos (o ejecutarlos) en ese orden."""
+        self.work.extend(reversed(items))
+
+    def emit(self, op, *operands):
+        self.code.append(op)
+        self.code.extend(operands)
+
+    def emit_jump(self, op, *operands):
+        """Emite un salto con el destino por parchar; devuelve dónde está."""
+        self.emit(op, *operands, 0)
+        return len(self.code) - 1
+
+    def patch(self, jumps, target=None):
+        """Hace que los saltos de `jumps` lleguen a `target` (o a la posición actual)."""
+        if target is None:
+            target = len(self.code)
+        for index in jumps:
+            self.code[index] = target
+
+    def constant(self, value):
+        key = _constant_key(value)
+        index = self._constant_index.get(key)
+        if index is None:
+            index = self._constant_index[key] = len(self.constants)
+            self.constants.append(value)
+        return index
+
+    def position(self, node):
+        key = (node.lineno, node.col_offset)
+        index = self._position_index.get(key)
+        if index is None:
+            index = self._position_index[key] = len(self.positions)
+            self.positions.append(key)
+        return index
+
+    # Pasos que apilan los valores de `left` y `right`.
+    def operands(self, left, right):
+        if left.__class__ is Ident and right.__class__ is Ident:
+            return [lambda: self.emit(LOAD2, left.slot, right.slot)]
+        return [left, right]
+
+    # Pasos que apilan la clave `key` de f(key:v) después de chequear que está
+    # en el dominio 0..size-1.
+    def key(self, key, size, pos):
+        if key.__class__ is Ident:
+            return [lambda: self.emit(LOAD_CHECK, key.slot, size, pos)]
+        return [key, lambda: self.emit(CHECK_INDEX, size, pos)]
+
+    # Pasos que saltan si `cond` es cierta y anotan el salto en `jumps`.
+    def branch(self, cond, jumps):
+        cls = cond.__class__
+        if cls in _COMPARISON_INDEX:
+            left, right = cond.children
+            if left.__class__ is Ident and right.__class__ in (Literal, Ident):
+                if right.__class__ is Literal:
+                    operand = self.constant(right.value)
+                    special = {Less: JUMP_IF_LESS_VC, Leq: JUMP_IF_LEQ_VC}.get(cls)
+                    generic = JUMP_IF_VC
+                else:
+                    operand = right.slot
+                    special = {Less: JUMP_IF_LESS_VV, Leq: JUMP_IF_LEQ_VV}.get(cls)
+                    generic = JUMP_IF_VV
+                if special is not None:
+                    return [lambda: jumps.append(self.emit_jump(special, left.slot, operand))]
+                index = _COMPARISON_INDEX[cls]
+                return [lambda: jumps.append(self.emit_jump(generic, index, left.slot, operand))]
+            index = _COMPARISON_INDEX[cls]
+            return [*self.operands(left, right),
+                    lambda: jumps.append(self.emit_jump(POP_JUMP_IF, index))]
+        if cls is Ident:
+            return [lambda: jumps.append(self.emit_jump(JUMP_IF_VAR, cond.slot))]
+        return [cond, lambda: jumps.append(self.emit_jump(POP_JUMP_IF_TRUE))]
+
+    # --- Sentencias ---
+
+    def compile_block(self, node):
+        offset = node.frame_offset
+        values, functions = block_defaults(node, offset)
+        if values:
+            self.emit(INIT, offset, self.constant(tuple(values)))
+        for slot, size in functions:
+            self.emit(NEW_FUNCTION, slot, size)
+        self.schedule(*flat_statements([child for child in node.children
+                                         if child.__class__ is not Declare]))
+
+    def compile_sequencing(self, node):
+        self.schedule(*flat_statements([node]))
+
+    def compile_skip(self, node):
+        pass
+
+    def compile_asig(self, node):
+        target, expr = node.children
+        slot = target.slot
+        if isinstance(target.type, FunctionType):
+            size = target.type.bound + 1
+            cls = expr.__class__
+            if cls is Literal:
+                self.emit(LOAD_CONST, self.constant(expr.value))
+                self.emit(FILL, slot, size)
+                return
+            if cls is Ident:
+                self.emit(LOAD_COPY, expr.slot)
+                self.emit(STORE, slot)
+                return
+            if cls is WriteFunction:
+                func, args = expr.children
+                pairs = function_pairs(args)
+                if func.__class__ is Ident and func.slot == slot and len(pairs) == 1:
+                    key, value = pairs[0].children
+                    pos = self.position(pairs[0])
+                    self.schedule(*self.key(key, size, pos), value,
+                                  lambda: self.emit(STORE_ITEM, slot))
+                    return
+        elif expr.__class__ in (Plus, Minus) and len(expr.children) == 2:
+            left, right = expr.children
+            if left.__class__ is Ident and left.slot == slot and right.__class__ is Literal:
+                step = right.value if expr.__class__ is Plus else -right.value
+                self.emit(INC, slot, self.constant(step))
+                return
+        self.schedule(expr, lambda: self.emit(STORE, slot))
+
+    # La guardia va al final: cada vuelta ejecuta un solo salto.
+    def compile_while(self, node):
+        then = node.children[0]
+        test = self.emit_jump(JUMP)
+        body = len(self.code)
+        jumps = []
+        self.schedule(*flat_statements(islice(then.children, 1, None)), lambda: self.patch([test]),
+                      *self.branch(then.children[0], jumps), lambda: self.patch(jumps, body))
+
+    # Las guardias se prueban en orden y saltan al cuerpo de la primera
+    # cierta; si ninguna lo es, sigue NO_GUARD.
+    def compile_if(self, node):
+        guards = node.children
+        bodies = [[] for _ in guards]
+        items = []
+        for guard, jumps in zip(guards, bodies):
+            items.extend(self.branch(guard.children[0], jumps))
+        pos = self.position(guards[0])
+        items.append(lambda: self.emit(NO_GUARD, pos))
+        ends = []
+        for index, (guard, jumps) in enumerate(zip(guards, bodies)):
+            items.append(lambda jumps=jumps: self.patch(jumps))
+            items.extend(flat_statements(islice(guard.children, 1, None)))
+            if index < len(guards) - 1:
+                items.append(lambda: ends.append(self.emit_jump(JUMP)))
+        items.append(lambda: self.patch(ends))
+        self.schedule(*items)
+
+    def compile_print(self, node):
+        self.schedule(node.children[0], lambda: self.emit(PRINT))
+
+    def compile_return(self, node):
+        self.schedule(node.children[0], lambda: self.emit(RETURN))
+
+    # --- Expresiones ---
+
+    def compile_ident(self, node):
+        self.emit(LOAD, node.slot)
+
+    def compile_literal(self, node):
+        self.emit(LOAD_CONST, self.constant(node.value))
+
+    def compile_string(self, node):
+        self.emit(LOAD_CONST, self.constant(string_value(node.value)))
+
+    def _arithmetic(self, node):
+        if len(node.children) == 1:
+            self.schedule(node.children[0], lambda: self.emit(NEG))
+            return
+        left, right = node.children
+        op, constant_op = _ARITHMETIC[node.__class__]
+        if right.__class__ is Literal:
+            operand = self.constant(right.value)
+            self.schedule(left, lambda: self.emit(constant_op, operand))
+        else:
+            self.schedule(*self.operands(left, right), lambda: self.emit(op))
+
+    compile_plus = compile_minus = compile_mult = _arithmetic
+
+    def _comparison(self, node):
+        op = _COMPARISON_OPS[node.__class__]
+        self.schedule(*self.operands(*node.children), lambda: self.emit(op))
+
+    compile_less = compile_leq = compile_greater = compile_geq = _comparison
+    compile_equal = compile_notequal = _comparison
+
+    def compile_not(self, node):
+        self.schedule(node.children[0], lambda: self.emit(NOT))
+
+    def _logical(self, node, op):
+        jumps = []
+        left, right = node.children
+        self.schedule(left, lambda: jumps.append(self.emit_jump(op)), right,
+                      lambda: self.patch(jumps))
+
+    def compile_and(self, node):
+        self._logical(node, JUMP_IF_FALSE_OR_POP)
+
+    def compile_or(self, node):
+        self._logical(node, JUMP_IF_TRUE_OR_POP)
+
+    def compile_comma(self, node):
+        elements = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Comma:
+                stack.extend(reversed(item.children))
+            else:
+                elements.append(item)
+        if all(element.__class__ is Literal for element in elements):
+            self.emit(LOAD_LIST, self.constant(tuple(element.value for element in elements)))
+        else:
+            self.schedule(*elements, lambda: self.emit(BUILD_LIST, len(elements)))
+
+    def compile_twopoints(self, node):
+        self.schedule(*node.children, lambda: self.emit(BUILD_LIST, 2))
+
+    def compile_readfunction(self, node):
+        func, index = node.children
+        size = func.type.bound + 1
+        if func.__class__ is Ident:
+            if index.__class__ is Literal and 0 <= index.value < size:
+                self.emit(READ_ITEM, func.slot, index.value)
+                return
+            pos = self.position(node)
+            if index.__class__ is Ident:
+                self.emit(READ_VAR_AT, func.slot, index.slot, size, pos)
+            else:
+                self.schedule(index, lambda: self.emit(READ_VAR, func.slot, size, pos))
+            return
+        pos = self.position(node)
+        self.schedule(func, index, lambda: self.emit(READ, size, pos))
+
+    def compile_writefunction(self, node):
+        func, args = node.children
+        size = func.type.bound + 1 if isinstance(func.type, FunctionType) else func.type.length
+        if func.__class__ is Ident:
+            # Solo una variable hay que copiarla: las demás expresiones ya
+            # dejan una lista nueva.
+            items = [lambda: self.emit(LOAD_COPY, func.slot)]
+        else:
+            items = [func]
+        for pair in function_pairs(args):
+            pos = self.position(pair)
+            items.extend(self.key(pair.children[0], size, pos))
+            items.extend((pair.children[1], lambda: self.emit(SET_ITEM)))
+        self.schedule(*items)
+
+    def compile_concat(self, node):
+        # Como en evaluator: la cadena se une de una vez y las partes
+        # constantes se convierten a texto al compilar.
+        parts = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if item.__class__ is Concat:
+                stack.extend(reversed(item.children))
+            elif item.__class__ in (Literal, String):
+                constant = text(item.value) if item.__class__ is Literal else string_value(item.value)
+                if parts and isinstance(parts[-1], str):
+                    parts[-1] += constant
+                else:
+                    parts.append(constant)
+            else:
+                parts.append(item)
+        items = [(lambda part=part: self.emit(LOAD_CONST, self.constant(part)))
+                 if isinstance(part, str) else part for part in parts]
+        if len(parts) > 1 or not isinstance(parts[0], str):
+            items.append(lambda: self.emit(CONCAT, len(parts)))
+        self.schedule(*items)
+
+
+def compile_ast(ast):
+    """Compila el AST decorado de un programa sin errores a un Code."""
+    frame_size = resolve(ast, flatten=True)
+    compiler = _Compiler()
+    compiler.compile(ast)
+    return Code(compiler.code, compiler.constants, compiler.positions, frame_size)
+
+
+# --- Máquina -------------------------------------------------------------------
+
+def execute(program, out=None):
+    """Ejecuta el Code `program`; print escribe en `out` (por defecto sys.stdout)."""
+    write = (out if out is not None else sys.stdout).write
+    ops = program.code.tolist()
+    constants = program.constants
+    positions = program.positions
+    comparisons = _COMPARISONS
+    frame = [None] * program.frame_size
+    stack = []
+    push = stack.append
+    pop = stack.pop
+    pc = 0
+    # Las instrucciones más frecuentes van primero.
+    while True:
+        op = ops[pc]
+        if op == LOAD:
+            push(frame[ops[pc + 1]])
+            pc += 2
+        elif op == LOAD_CONST:
+            push(constants[ops[pc + 1]])
+            pc += 2
+        elif op == STORE:
+            frame[ops[pc + 1]] = pop()
+            pc += 2
+        elif op == INC:
+            frame[ops[pc + 1]] += constants[ops[pc + 2]]
+            pc += 3
+        elif op == JUMP_IF_LESS_VC:
+            pc = ops[pc + 3] if frame[ops[pc + 1]] < constants[ops[pc + 2]] else pc + 4
+        elif op == JUMP_IF_LESS_VV:
+            pc = ops[pc + 3] if frame[ops[pc + 1]] < frame[ops[pc + 2]] else pc + 4
+        elif op == JUMP:
+            pc = ops[pc + 1]
+        elif op == LOAD2:
+            push(frame[ops[pc + 1]])
+            push(frame[ops[pc + 2]])
+            pc += 3
+        elif op == JUMP_IF_LEQ_VC:
+            pc = ops[pc + 3] if frame[ops[pc + 1]] <= constants[ops[pc + 2]] else pc + 4
+        elif op == READ_VAR_AT:
+            index = frame[ops[pc + 2]]
+            if 0 <= index < ops[pc + 3]:
+                push(frame[ops[pc + 1]][index])
+                pc += 5
+            else:
+                raise out_of_domain(index, ops[pc + 3], *positions[ops[pc + 4]])
+        elif op == LOAD_CHECK:
+            index = frame[ops[pc + 1]]
+            if not 0 <= index < ops[pc + 2]:
+                raise out_of_domain(index, ops[pc + 2], *positions[ops[pc + 3]])
+            push(index)
+            pc += 4
+        elif op == POP_JUMP_IF:
+            right = pop()
+            pc = ops[pc + 2] if comparisons[ops[pc + 1]](pop(), right) else pc + 3
+        elif op == READ_VAR:
+            index = pop()
+            if 0 <= index < ops[pc + 2]:
+                push(frame[ops[pc + 1]][index])
+                pc += 4
+            else:
+                raise out_of_domain(index, ops[pc + 2], *positions[ops[pc + 3]])
+        elif op == READ_ITEM:
+            push(frame[ops[pc + 1]][ops[pc + 2]])
+            pc += 3
+        elif op == ADD:
+            right = pop()
+            stack[-1] += right
+            pc += 1
+        elif op == ADD_CONST:
+            stack[-1] += constants[ops[pc + 1]]
+            pc += 2
+        elif op == SUB:
+            right = pop()
+            stack[-1] -= right
+            pc += 1
+        elif op == MUL:
+            right = pop()
+            stack[-1] *= right
+            pc += 1
+        elif op == CHECK_INDEX:
+            index = stack[-1]
+            if not 0 <= index < ops[pc + 1]:
+                raise out_of_domain(index, ops[pc + 1], *positions[ops[pc + 2]])
+            pc += 3
+        elif op == STORE_ITEM:
+            value = pop()
+            frame[ops[pc + 1]][pop()] = value
+            pc += 2
+        elif op == JUMP_IF_LEQ_VV:
+            pc = ops[pc + 3] if frame[ops[pc + 1]] <= frame[ops[pc + 2]] else pc + 4
+        elif op == JUMP_IF_VC:
+            if comparisons[ops[pc + 1]](frame[ops[pc + 2]], constants[ops[pc + 3]]):
+                pc = ops[pc + 4]
+            else:
+                pc += 5
+        elif op == JUMP_IF_VV:
+            if comparisons[ops[pc + 1]](frame[ops[pc + 2]], frame[ops[pc + 3]]):
+                pc = ops[pc + 4]
+            else:
+                pc += 5
+        elif op == JUMP_IF_VAR:
+            pc = ops[pc + 2] if frame[ops[pc + 1]] else pc + 3
+        elif op == POP_JUMP_IF_TRUE:
+            pc = ops[pc + 1] if pop() else pc + 2
+        elif op == SUB_CONST:
+            stack[-1] -= constants[ops[pc + 1]]
+            pc += 2
+        elif op == MUL_CONST:
+            stack[-1] *= constants[ops[pc + 1]]
+            pc += 2
+        elif op == LESS:
+            right = pop()
+            stack[-1] = stack[-1] < right
+            pc += 1
+        elif op == LEQ:
+            right = pop()
+            stack[-1] = stack[-1] <= right
+            pc += 1
+        elif op == GREATER:
+            right = pop()
+            stack[-1] = stack[-1] > right
+            pc += 1
+        elif op == GEQ:
+            right = pop()
+            stack[-1] = stack[-1] >= right
+            pc += 1
+        elif op == EQUAL:
+            right = pop()
+            stack[-1] = stack[-1] == right
+            pc += 1
+        elif op == NOT_EQUAL:
+            right = pop()
+            stack[-1] = stack[-1] != right
+            pc += 1
+        elif op == NOT:
+            stack[-1] = not stack[-1]
+            pc += 1
+        elif op == NEG:
+            stack[-1] = -stack[-1]
+            pc += 1
+        elif op == JUMP_IF_FALSE_OR_POP:
+            if stack[-1]:
+                pop()
+                pc += 2
+            else:
+                pc = ops[pc + 1]
+        elif op == JUMP_IF_TRUE_OR_POP:
+            if stack[-1]:
+                pc = ops[pc + 1]
+            else:
+                pop()
+                pc += 2
+        elif op == SET_ITEM:
+            value = pop()
+            index = pop()
+            stack[-1][index] = value
+            pc += 1
+        elif op == READ:
+            index = pop()
+            function = pop()
+            if not 0 <= index < ops[pc + 1]:
+                raise out_of_domain(index, ops[pc + 1], *positions[ops[pc + 2]])
+            push(function[index])
+            pc += 3
+        elif op == LOAD_COPY:
+            push(frame[ops[pc + 1]][:])
+            pc += 2
+        elif op == LOAD_LIST:
+            push(list(constants[ops[pc + 1]]))
+            pc += 2
+        elif op == BUILD_LIST:
+            count = ops[pc + 1]
+            values = stack[-count:]
+            del stack[-count:]
+            push(values)
+            pc += 2
+        elif op == FILL:
+            frame[ops[pc + 1]] = [pop()] * ops[pc + 2]
+            pc += 3
+        elif op == CONCAT:
+            count = ops[pc + 1]
+            values = stack[-count:]
+            del stack[-count:]
+            push(''.join([text(value) for value in values]))
+            pc += 2
+        elif op == PRINT:
+            write(text(pop()) + '\n')
+            pc += 1
+        elif op == INIT:
+            values = constants[ops[pc + 2]]
+            start = ops[pc + 1]
+            frame[start:start + len(values)] = values
+            pc += 3
+        elif op == NEW_FUNCTION:
+            frame[ops[pc + 1]] = [0] * ops[pc + 2]
+            pc += 3
+        elif op == NO_GUARD:
+            raise no_true_guard(*positions[ops[pc + 1]])
+        elif op == RETURN:
+            pop()
+            return
+        elif op == HALT:
+            return
+        else:
+            raise ValueError(f'Instrucción desconocida {op} en {pc}')
+
+
+def disassemble(program):
+    """Genera las líneas del listado del bytecode de `program`."""
+    ops = program.code
+    pc = 0
+    while pc < len(ops):
+        name, operands = INSTRUCTIONS[ops[pc]]
+        values = ops[pc + 1:pc + 1 + len(operands)]
+        shown = []
+        for kind, value in zip(operands, values):
+            if kind == 'k':
+                shown.append(f'{value} ({program.constants[value]!r})')
+            elif kind == 'pos':
+                shown.append('line {} col {}'.format(*program.positions[value]))
+            elif kind == 'cmp':
+                shown.append(_COMPARISONS[value].__name__)
+            else:
+                shown.append(str(value))
+        yield f'{pc:6d}  {name:<22}{", ".join(shown)}\n'
+        pc += 1 + len(operands)
+    yield (f'frame {program.frame_size}, {len(program.constants)} constants, '
+           f'{len(program.positions)} positions\n')
+
+
+# --- Archivos .imperatc --------------------------------------------------------
+
+MAGIC = b'GCLC\x01\r\n'
+
+# Módulos cuyo código determina el bytecode, además de los del front-end.
+BACKEND_MODULES = ('vm.py', 'evaluator.py', 'resolver.py')
+
+_fingerprint = None
+
+def fingerprint():
+    """Hash del código del front-end (result_cache.fingerprint) y del compilador."""
+    global _fingerprint
+    if _fingerprint is None:
+        import result_cache
+        digest = hashlib.sha256(result_cache.fingerprint().encode('ascii'))
+        for name in BACKEND_MODULES:
+            with open(os.path.join(HERE, name), 'rb') as file:
+                digest.update(name.encode('utf-8') + b'\0' + file.read() + b'\0')
+        _fingerprint = digest.digest()
+    return _fingerprint
+
+def cache_path(source_path):
+    """Archivo de bytecode de `source_path`: prog.imperat -> prog.imperatc."""
+    return source_path + 'c'
+
+def _source_hash(source):
+    return hashlib.sha256(fingerprint() + source).digest()
+
+def dumps(program, source):
+    """Bytes del archivo .imperatc de `program`, compilado de `source` (bytes)."""
+    payload = (program.code.typecode, program.code.tobytes(), tuple(program.constants),
+               tuple(program.positions), program.frame_size)
+    return MAGIC + _source_hash(source) + marshal.dumps(payload)
+
+def loads(data, source):
+    """El Code guardado en `data`, o None si no es de `source` o está dañado."""
+    header = len(MAGIC) + 32
+    if data[:len(MAGIC)] != MAGIC or data[len(MAGIC):header] != _source_hash(source):
+        return None
+    try:
+        typecode, code, constants, positions, frame_size = marshal.loads(data[header:])
+        ops = array(typecode)
+        ops.frombytes(code)
+    except (ValueError, TypeError, EOFError):
+        return None
+    return Code(ops, list(constants), list(positions), frame_size)
+
+def load_cached(path, source):
+    try:
+        with open(cache_path(path), 'rb') as file:
+            return loads(file.read(), source)
+    except OSError:
+        return None
+
+def store_cached(path, source, program):
+    """Escribe el .imperatc de `path`; si no se puede (permisos), no hace nada."""
+    target = cache_path(path)
+    tmp_path = table_cache.temp_path(os.path.dirname(os.path.abspath(target)), '.imperatc')
+    try:
+        with open(tmp_path, 'wb') as file:
+            file.write(dumps(program, source))
+        os.replace(tmp_path, target)
+    except OSError:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+
+def compile_file(path, use_cache=True, engine='ply'):
+    """
+    Devuelve (Code, None) para el programa en `path` o (None, Result) si no
+    compila. Con `use_cache`, usa y actualiza el .imperatc de al lado.
+    """
+    with open(path, 'rb') as file:
+        source = file.read()
+    if use_cache:
+        program = load_cached(path, source)
+        if program is not None:
+            return program, None
+    import io
+    from compiler import compile_source
+    # Misma decodificación que open(path, 'r')
+    result = compile_source(io.TextIOWrapper(io.BytesIO(source)).read(), engine=engine)
+    if not result.ok:
+        return None, result
+    program = compile_ast(result.ast)
+    if use_cache:
+        store_cached(path, source, program)
+    return program, None
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        usage="python vm.py [--no-cache] [--dis] <filename.imperat>")
+    arg_parser.add_argument('file')
+    arg_parser.add_argument('--no-cache', action='store_true',
+                            help='no lee ni escribe el archivo .imperatc')
+    arg_parser.add_argument('--dis', action='store_true',
+                            help='imprime el bytecode en lugar de ejecutarlo')
+    arg_parser.add_argument('--fast-lexer', action='store_true',
+                            help='usa el lexer de fast_lexer.py en lugar del de PLY')
+    args = arg_parser.parse_args()
+
+    if not args.file.endswith('.imperat'):
+        print("Error: El archivo debe tener extensión .imperat")
+        sys.exit(1)
+    try:
+        program, failure = compile_file(args.file, not args.no_cache,
+                                        'fast' if args.fast_lexer else 'ply')
+    except OSError:
+        print(f"Error: No se pudo abrir el archivo {args.file}")
+        sys.exit(1)
+    if failure is not None:
+        print(failure.message)
+        sys.exit(1)
+    if args.dis:
+        sys.stdout.writelines(disassemble(program))
+        return
+    try:
+        execute(program)
+    except ExecutionError as e:
+        sys.stdout.flush()
+        print(e.args[0])
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()